@@ -9,5 +9,8 @@ default_area = "X01"
 # Default dataflow
 default_dataflow = "DF_UNE_2EAP_SEX_AGE_RT"
 
+# Number of dataflows suggested while searching
+SEARCH_LIMIT = 20
+
 # Setup ILOStat Client
 ilostat = ILOStat("en")
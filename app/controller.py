@@ -1,6 +1,6 @@
 import gradio as gr
 from ilostat.ilostat import ILOStat
-from . import ilostat, CHATBOT_MODEL
+from . import ilostat, CHATBOT_MODEL, SEARCH_LIMIT
 from ._dim_controller import DimensionController
 from predict.chat import ChatBot
 import pandas as pd
@@ -31,19 +31,24 @@ class AppController:
         self.dimension_controller = DimensionController
         self._chatbot = ChatBot(model=CHATBOT_MODEL)
 
-    def set_dataflows(self, area: str):
+    def set_dataflows(self, area: str, search: str = ""):
         """
         Set and populate the dataflow dropdown based on the selected area.
 
         Parameters:
         - area (str): The selected geographic area.
+        - search (str): What the user typed in the search box. If given, only the
+          best SEARCH_LIMIT matches are sent to the dropdown.
 
         Returns:
         - gr.Dropdown: A Gradio dropdown populated with dataflows for the selected area.
         - None: If no area is selected.
         """
         if area:
-            dataflows = self._ilostat.get_dataflows(area)
+            if search and search.strip():
+                dataflows = self._ilostat.search_dataflows(area, search, SEARCH_LIMIT)
+            else:
+                dataflows = self._ilostat.get_dataflows(area)
             return gr.Dropdown(choices=dataflows)
         return None
 
@@ -0,0 +1,103 @@
+"""Benchmark the two ways ILOStatQuery.data() can parse data: SDMX-ML through
+sdmx's object model and sdmx.to_pandas, or SDMX-CSV through pandas' C engine.
+
+Both representations of one query are downloaded once, then parsed into an
+ILOStatQueryResult several times over. The time and peak memory of the parse
+are reported, not those of the download.
+
+Run from the project root once the metadata has been downloaded, against the
+API or the replay server of benchmarks/replay.py:
+
+    python -m benchmarks.data_formats --area X01 --dataflow DF_UNE_2EAP_SEX_AGE_RT
+"""
+
+import io
+import time
+import argparse
+import statistics
+import tracemalloc
+import sdmx
+from ilostat._query import CSV_ACCEPT
+from ilostat._result import ILOStatQueryResult
+from ilostat.ilostat import ILOStat
+
+# Parses of each representation
+RUNS = 10
+
+# Don't refresh the metadata in the background while benchmarking
+ilostat = ILOStat("en", refresh_ttl=None)
+
+
+def download(query) -> tuple[bytes, bytes]:
+    """Download the SDMX-ML and the SDMX-CSV of a query."""
+    bodies = []
+    for accept in [None, CSV_ACCEPT]:
+        request = query._prepare()
+        if accept:
+            request.headers["Accept"] = accept
+        response = query._ilostat.session.send(request)
+        response.raise_for_status()
+        bodies.append(response.content)
+    return bodies[0], bodies[1]
+
+
+def parse_xml(query, body: bytes) -> ILOStatQueryResult:
+    message = sdmx.read_sdmx(io.BytesIO(body), dsd=query._dsd)
+    return ILOStatQueryResult(
+        data=message.data[0], codelist=query.codelist, language=query.language
+    )
+
+
+def parse_csv(query, body: bytes) -> ILOStatQueryResult:
+    return ILOStatQueryResult.from_csv(
+        io.BytesIO(body),
+        [dim.id for dim in query._dsd.dimensions.components],
+        codelist=query.codelist,
+        language=query.language,
+    )
+
+
+def run(parse, query, body: bytes) -> tuple[list[float], int, int]:
+    """Parse a body RUNS times. Returns the seconds of each parse, the peak of
+    memory allocated by a parse and the number of rows of the result."""
+    timings = []
+    for _ in range(RUNS):
+        started = time.perf_counter()
+        result = parse(query, body)
+        timings.append(time.perf_counter() - started)
+
+    tracemalloc.start()
+    result = parse(query, body)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return timings, peak, len(result.dataframe)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks.data_formats",
+        description="Compare the parse time and memory of SDMX-ML and SDMX-CSV.",
+    )
+    parser.add_argument("--area", default="X01+ITA+FRA+DEU+USA+BRA+IND+CHN")
+    parser.add_argument("--dataflow", default="DF_UNE_2EAP_SEX_AGE_RT")
+    args = parser.parse_args()
+
+    query = ilostat.query(args.dataflow, {"REF_AREA": args.area})
+    bodies = dict(zip(["SDMX-ML", "SDMX-CSV"], download(query)))
+    parsers = {"SDMX-ML": parse_xml, "SDMX-CSV": parse_csv}
+
+    print(f"{'format':<9} {'bytes':>12} {'rows':>8} {'median':>9} {'peak memory':>12}")
+    medians = {}
+    for name, parse in parsers.items():
+        timings, peak, rows = run(parse, query, bodies[name])
+        medians[name] = statistics.median(timings)
+        print(
+            f"{name:<9} {len(bodies[name]):>12,} {rows:>8,}"
+            f" {medians[name] * 1000:>7.1f}ms {peak / 1024 / 1024:>9.1f}MiB"
+        )
+    print(f"SDMX-CSV parses {medians['SDMX-ML'] / medians['SDMX-CSV']:.1f}x faster")
+
+
+if __name__ == "__main__":
+    main()
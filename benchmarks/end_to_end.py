@@ -0,0 +1,158 @@
+"""Benchmark the requests the app makes to ILOSTAT, end to end, against the
+replay server of benchmarks/replay.py instead of the live API.
+
+Times, for the default area and dataflow of the app:
+- ILOStat.get_area_dimensions, which fills the dimension dropdowns
+- ILOStatQuery.data, for the default dimensions
+- AppController.set_dataframe, which also labels the data
+- the full prompt build: the dimensions, the data frame and ChatBot.prompt
+
+The summary of the dataflow's metadata that ChatBot.prompt asks Hugging Face
+for is replaced by the description itself, since only the SDMX API is replayed.
+
+Each case is timed cold, with empty response caches and DSD registry, and then
+warm. Record the responses once, with access to ILOSTAT:
+
+    python -m benchmarks.end_to_end --record
+
+and then replay them, as many times as needed, with or without latency:
+
+    python -m benchmarks.end_to_end --latency 0.15 --jitter 0.1
+"""
+
+import os
+import time
+import shutil
+import argparse
+import tempfile
+import statistics
+from benchmarks.replay import CAPTURES_DIR, UPSTREAM_URL, ReplayServer
+
+# Don't check the metadata against ILOSTAT while benchmarking, and keep the
+# responses and structures of the runs apart from the app's
+os.environ.setdefault("ILO_PRISM_METADATA_TTL", "0")
+os.environ["ILO_PRISM_CACHE"] = ""
+os.environ["ILO_PRISM_DSD_DIR"] = tempfile.mkdtemp(prefix="ilo-prism-dsd-")
+
+# Timed runs of each case, cold and then warm
+RUNS = 5
+
+
+def get_cases(area: str, dataflow: str) -> dict:
+    """Return the function timed by each case."""
+    from app import ilostat
+    from app.controller import AppController
+
+    controller = AppController()
+    chatbot = controller._chatbot
+    chatbot.summarize_metadata = ilostat.get_dataflow_description
+
+    def dimensions() -> dict[str, str]:
+        return controller.init_current_dimensions(
+            controller.set_dimensions(area, dataflow)
+        )
+
+    def query_data():
+        dims = {**dimensions(), "REF_AREA": area}
+        return ilostat.query(dataflow=dataflow, dimensions=dims).data()
+
+    def set_dataframe():
+        return controller.set_dataframe(area, dataflow, dimensions(), None, None)
+
+    def prompt():
+        df = controller.set_dataframe(area, dataflow, dimensions(), None, None)
+        return controller.set_prompt(area, dataflow, df)
+
+    return {
+        "get_area_dimensions": lambda: ilostat.get_area_dimensions(area, dataflow),
+        "ILOStatQuery.data": query_data,
+        "set_dataframe": set_dataframe,
+        "prompt": prompt,
+    }
+
+
+def reset():
+    """Empty the response cache and the DSD registry, in memory and on disk."""
+    from ilostat._cache import configure_cache
+    from ilostat._registry import get_registry
+
+    configure_cache()
+    registry = get_registry()
+    registry.clear()
+    shutil.rmtree(registry.directory, ignore_errors=True)
+
+
+def run(case, server: ReplayServer, cold: bool) -> tuple[list[float], float, float]:
+    """Time a case. Returns the seconds of each run, and the requests and bytes
+    served by the replay server per run."""
+    timings = []
+    requests = size = 0
+    for _ in range(RUNS):
+        if cold:
+            reset()
+        before = dict(server.stats)
+        started = time.perf_counter()
+        case()
+        timings.append(time.perf_counter() - started)
+        requests += server.stats["requests"] - before["requests"]
+        size += server.stats["bytes"] - before["bytes"]
+    return timings, requests / RUNS, size / RUNS
+
+
+def p95(timings: list[float]) -> float:
+    return statistics.quantiles(timings, n=20, method="inclusive")[-1]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks.end_to_end",
+        description="Time the app's requests against recorded ILOSTAT responses.",
+    )
+    parser.add_argument("--record", action="store_true", help="Record from ILOSTAT")
+    parser.add_argument("--dir", default=CAPTURES_DIR, help="Directory of the captures")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added")
+    parser.add_argument(
+        "--jitter", type=float, default=0.0, help="Random seconds added"
+    )
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of errors")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    server = ReplayServer(
+        captures_dir=args.dir,
+        upstream=UPSTREAM_URL if args.record else None,
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        seed=args.seed,
+    )
+
+    with server:
+        from ilostat._client import configure_client
+
+        configure_client(url=server.url)
+
+        from app import default_area, default_dataflow
+
+        cases = get_cases(default_area, default_dataflow)
+
+        print(
+            f"{'case':<22} {'cache':>5} {'median':>9} {'p95':>9}"
+            f" {'requests':>9} {'bytes':>12}"
+        )
+        for name, case in cases.items():
+            for cold in [True, False]:
+                timings, requests, size = run(case, server, cold)
+                print(
+                    f"{name:<22} {'cold' if cold else 'warm':>5}"
+                    f" {statistics.median(timings) * 1000:>7.1f}ms"
+                    f" {p95(timings) * 1000:>7.1f}ms"
+                    f" {requests:>9.1f} {size:>12,.0f}"
+                )
+
+    print(", ".join(f"{stat}: {value:,}" for stat, value in server.stats.items()))
+    shutil.rmtree(os.environ["ILO_PRISM_DSD_DIR"], ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""Benchmark the ILOStat metadata getters.
+
+Compares three ways of answering the getters, both from a single thread and
+from concurrent threads like Gradio's workers:
+- a new SQLite connection for every call, which is what the getters used to do
+- the thread-local read connections of ilostat/_connection.py
+- the in-memory snapshot of ilostat/_snapshot.py, which the getters use now
+
+get_dimensions isn't part of the snapshot, so it's still answered by SQLite.
+
+Run from the project root once the metadata has been downloaded:
+
+    python -m benchmarks.metadata_getters
+"""
+
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from ilostat import _queries as queries
+from ilostat._connection import DB_PATH, fetch_all, fetch_one
+from ilostat.ilostat import ILOStat
+
+# Calls per getter and per thread
+CALLS = 2000
+
+# Threads of the concurrent runs
+THREADS = 8
+
+# Don't refresh the metadata in the background while benchmarking
+ilostat = ILOStat("en", refresh_ttl=None)
+
+
+def connect_per_call(getter: str, sql: str, params: tuple, one: bool, args: tuple):
+    """Run a getter query the old way, with a connection of its own."""
+    with sqlite3.connect(DB_PATH, check_same_thread=False) as conn:
+        cursor = conn.cursor()
+        try:
+            cursor.execute(sql, params)
+            return cursor.fetchone() if one else cursor.fetchall()
+        finally:
+            cursor.close()
+
+
+def pooled(getter: str, sql: str, params: tuple, one: bool, args: tuple):
+    """Run a getter query on the read connection of the current thread."""
+    return fetch_one(sql, params) if one else fetch_all(sql, params)
+
+
+def snapshot(getter: str, sql: str, params: tuple, one: bool, args: tuple):
+    """Call the getter itself."""
+    return getattr(ilostat, getter)(*args)
+
+
+def get_cases() -> dict[str, tuple[str, tuple, bool, tuple]]:
+    """Pick an area and one of its dataflows to query. Returns the query, its
+    parameters, whether it returns a single row and the arguments of each getter."""
+    area = fetch_one("SELECT code FROM cl_area ORDER BY cl_area_uid")[0]
+    dataflow = fetch_one(queries.DATAFLOWS, (area, "en"))[1]
+    return {
+        "get_areas": (queries.AREAS, ("en",), False, ()),
+        "get_area_label": (queries.AREA_LABEL, ("en", area), True, (area,)),
+        "get_dataflows": (queries.DATAFLOWS, (area, "en"), False, (area,)),
+        "get_dataflow_label": (
+            queries.DATAFLOW_LABEL,
+            (dataflow, "en"),
+            True,
+            (dataflow,),
+        ),
+        "get_dataflow_description": (
+            queries.DATAFLOW_DESCRIPTION,
+            (dataflow, "en"),
+            True,
+            (dataflow,),
+        ),
+        "get_dimensions": (queries.DIMENSIONS, ("en", dataflow), False, (dataflow,)),
+    }
+
+
+def run(method, getter: str, case: tuple, threads: int) -> float:
+    """Return the number of calls per second of a getter."""
+
+    def worker():
+        for _ in range(CALLS):
+            method(getter, *case)
+
+    started = time.perf_counter()
+    if threads == 1:
+        worker()
+    else:
+        with ThreadPoolExecutor(threads) as executor:
+            for future in [executor.submit(worker) for _ in range(threads)]:
+                future.result()
+    elapsed = time.perf_counter() - started
+
+    return CALLS * threads / elapsed
+
+
+def main():
+    methods = {"per call": connect_per_call, "pooled": pooled, "snapshot": snapshot}
+    print(
+        f"{'getter':<26} {'threads':>7} "
+        + " ".join(f"{name:>12}" for name in methods)
+        + f" {'speedup':>8}"
+    )
+    for getter, case in get_cases().items():
+        for threads in [1, THREADS]:
+            rates = [run(method, getter, case, threads) for method in methods.values()]
+            print(
+                f"{getter:<26} {threads:>7} "
+                + " ".join(f"{rate:>10,.0f}/s" for rate in rates)
+                + f" {rates[-1] / rates[0]:>7.1f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
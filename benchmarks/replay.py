@@ -0,0 +1,256 @@
+"""A local stand-in for the ILOSTAT SDMX API, for benchmarks and tests that
+can't, or shouldn't, depend on the live API.
+
+In "record" mode, the server forwards every request to ILOSTAT and saves the
+response. In "replay" mode, it only serves the saved responses, and answers
+404 to anything it hasn't seen. Either way, it can add latency and fail some
+requests on purpose, to see how the app copes with a slow or flaky API.
+
+Point the app at it with ILO_PRISM_SDMX_URL, or configure_client(url=...):
+
+    python -m benchmarks.replay record --port 8700
+    ILO_PRISM_SDMX_URL=http://127.0.0.1:8700 python main.py
+
+Then, on an air-gapped machine with the same captures:
+
+    python -m benchmarks.replay replay --port 8700 --latency 0.2 --error-rate 0.05
+"""
+
+import os
+import gzip
+import json
+import time
+import random
+import hashlib
+import argparse
+import tempfile
+import threading
+import requests
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Where the captured responses are kept
+CAPTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "captures")
+
+# The API that record mode forwards requests to
+UPSTREAM_URL = "http://sdmx.ilo.org/rest"
+
+# Headers of the upstream response that are saved and served again
+KEPT_HEADERS = ["Content-Type", "Content-Disposition"]
+
+
+def capture_key(path: str, accept: str) -> str:
+    """The name of the capture of a request, from its path, query and Accept
+    header, since the same URL can be served in several formats."""
+    return hashlib.sha256(f"{path} {accept}".encode()).hexdigest()[:32]
+
+
+class ReplayServer:
+    """
+    A threaded HTTP server that records and replays SDMX responses.
+
+    Parameters:
+    - captures_dir (str): Where the responses are saved and read from.
+    - upstream (str): The API to forward unknown requests to, in record mode.
+      None to replay only.
+    - latency (float): Seconds added to every response.
+    - jitter (float): Up to this many more seconds added at random.
+    - error_rate (float): The share of requests answered with error_status.
+    - error_status (int): The status of the injected errors.
+    - seed (int): Seed of the injected jitter and errors, for repeatable runs.
+    - port (int): The port to listen on, or 0 for any free one.
+    """
+
+    def __init__(
+        self,
+        captures_dir: str = CAPTURES_DIR,
+        upstream: str = None,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        error_rate: float = 0.0,
+        error_status: int = 503,
+        seed: int = None,
+        port: int = 0,
+    ):
+        self.captures_dir = captures_dir
+        self.upstream = upstream.rstrip("/") if upstream else None
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.stats = {
+            "requests": 0,
+            "replayed": 0,
+            "recorded": 0,
+            "missing": 0,
+            "errors": 0,
+            "bytes": 0,
+        }
+
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._session = requests.Session()
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", port), self._handler())
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        """The base URL of the server, to use instead of ILOSTAT's."""
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _count(self, stat: str, n: int = 1):
+        with self._lock:
+            self.stats[stat] += n
+
+    def _load(self, key: str) -> tuple[dict, bytes] | None:
+        """Read a captured response, if there's one."""
+        try:
+            with open(os.path.join(self.captures_dir, key + ".json"), "r") as f:
+                meta = json.load(f)
+            with gzip.open(os.path.join(self.captures_dir, key + ".gz"), "rb") as f:
+                return meta, f.read()
+        except FileNotFoundError:
+            return None
+
+    def _save(self, key: str, meta: dict, body: bytes):
+        """Save a response, the body first, so that a capture is never served
+        without its body."""
+        os.makedirs(self.captures_dir, exist_ok=True)
+        for suffix, data in [
+            (".gz", gzip.compress(body, mtime=0)),
+            (".json", json.dumps(meta, indent=2).encode()),
+        ]:
+            fd, tmp = tempfile.mkstemp(dir=self.captures_dir, suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp, os.path.join(self.captures_dir, key + suffix))
+
+    def _record(self, path: str, accept: str) -> tuple[dict, bytes]:
+        """Forward a request to the upstream API and save its response."""
+        response = self._session.get(
+            self.upstream + path, headers={"Accept": accept}, timeout=120
+        )
+        meta = {
+            "path": path,
+            "accept": accept,
+            "status": response.status_code,
+            "headers": {
+                name: response.headers[name]
+                for name in KEPT_HEADERS
+                if name in response.headers
+            },
+        }
+        self._save(capture_key(path, accept), meta, response.content)
+        self._count("recorded")
+        return meta, response.content
+
+    def _respond(self, path: str, accept: str) -> tuple[int, dict, bytes]:
+        """Work out the status, headers and body of the answer to a request."""
+        self._count("requests")
+
+        delay = self.latency + self._random.uniform(0, self.jitter)
+        if delay:
+            time.sleep(delay)
+
+        if self.error_rate and self._random.random() < self.error_rate:
+            self._count("errors")
+            return self.error_status, {"Retry-After": "1"}, b"Injected error"
+
+        capture = self._load(capture_key(path, accept))
+        if capture is None and self.upstream:
+            capture = self._record(path, accept)
+        elif capture is not None:
+            self._count("replayed")
+
+        if capture is None:
+            self._count("missing")
+            return 404, {"Content-Type": "text/plain"}, b"NoResultsFound"
+
+        meta, body = capture
+        self._count("bytes", len(body))
+        return meta["status"], meta["headers"], body
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                accept = self.headers.get("Accept", "")
+                status, headers, body = server._respond(self.path, accept)
+
+                # Compress like the API does, when the client asks for it
+                if "gzip" in self.headers.get("Accept-Encoding", ""):
+                    body = gzip.compress(body, compresslevel=5, mtime=0)
+                    headers = {**headers, "Content-Encoding": "gzip"}
+
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self) -> "ReplayServer":
+        """Serve requests in a daemon thread."""
+        self._thread = threading.Thread(
+            target=self._httpd.serve_forever, name="replay-server", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop serving and close the socket."""
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks.replay",
+        description="Record or replay the responses of the ILOSTAT SDMX API.",
+    )
+    parser.add_argument("mode", choices=["record", "replay"])
+    parser.add_argument("--dir", default=CAPTURES_DIR, help="Directory of the captures")
+    parser.add_argument("--upstream", default=UPSTREAM_URL, help="API to record")
+    parser.add_argument("--port", type=int, default=8700)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added")
+    parser.add_argument(
+        "--jitter", type=float, default=0.0, help="Random seconds added"
+    )
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of errors")
+    parser.add_argument("--error-status", type=int, default=503)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    server = ReplayServer(
+        captures_dir=args.dir,
+        upstream=args.upstream if args.mode == "record" else None,
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        seed=args.seed,
+        port=args.port,
+    )
+    print(f"{args.mode.capitalize()}ing {args.dir} at {server.url}")
+    try:
+        server._httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server._httpd.server_close()
+        print(", ".join(f"{stat}: {value:,}" for stat, value in server.stats.items()))
@@ -3,5 +3,10 @@ from ._area import get_cl_areas
 from ._area_dataflow import get_area_dataflows
 from ._initialize import init_db
 from ._validate_db import validate_db
+from ._refresh import refresh_metadata
+from ._migrate import migrate_db
 from ._dimensions import get_dimensions
 from ._query import ILOStatQuery
+from ._client import configure_client, get_client
+from ._cache import configure_cache, get_cache
+from ._ratelimit import configure_limiter, get_limiter
@@ -1,6 +1,8 @@
-import sdmx
-import sqlite3
 import progressbar
+from ._client import get_client
+from ._connection import connect
+from ._bulk import IngestionStats, get_languages, get_uid_map, localized_rows
+from ._checkpoint import mark_done
 
 
 # Widgets for the progress bar
@@ -15,22 +17,21 @@ widgets = [
 ]
 
 
-def get_cl_areas():
+def get_cl_areas(path: str = None):
     """Get a list of areas from the codelist and insert them into the database
-    together with their names."""
+    together with their names. path is the database to write to, by default
+    the one the app reads."""
 
     # Connect to the database
-    con = sqlite3.connect("store/ilo-prism.db")
+    con = connect(path)
     cur = con.cursor()
 
     # Get a list of languages and their ids
     # {'en': 1, 'fr': 2, 'es': 3}
-    cur.execute("SELECT * FROM language")
-    languages = cur.fetchall()
-    languages = {lang[1]: lang[0] for lang in languages}
+    languages = get_languages(cur)
 
-    # Create an SDMX Client client
-    ilostat = sdmx.Client("ILO")
+    # Get the shared SDMX client
+    ilostat = get_client()
 
     # Get a list of all of the data flows
     codelist_msg = ilostat.codelist("CL_AREA")
@@ -41,37 +42,48 @@ def get_cl_areas():
     # Set up the progress bar
     bar = progressbar.ProgressBar(max_value=(len(codelist_items)), widgets=widgets)
 
-    # For each item in the codelist,
-    for i, item in enumerate(codelist_items):
-        bar.update(i + 1)
+    stats = IngestionStats("Areas")
 
-        # Insert the area into the database
-        cur.execute("INSERT OR IGNORE INTO cl_area(code) VALUES(?)", (item,))
-        cl_area_uid = cur.lastrowid
-        con.commit()
+    # Write the whole stage in a single transaction
+    with con:
+        # Insert all of the areas at once
+        stats.executemany(
+            cur,
+            "INSERT OR IGNORE INTO cl_area(code) VALUES(?)",
+            [(item,) for item in codelist_items],
+        )
 
-        # Get the localized names of the area
+        # Look up the uids of all of the areas in one go
+        area_uids = get_uid_map(cur, "cl_area", "cl_area_uid")
+
+        # Stage the localized names of each area
         # Example: {'en': 'Egypt', 'es': 'Egipto', 'fr': 'Egypte'}
-        names = codelist_items[item].name.localizations
-
-        # Insert the names of the area into the database
-        for lang in names:
-            if lang in languages:
-                cur.execute(
-                    """
-                            INSERT OR IGNORE INTO cl_area_name (
-                                cl_area_uid, language_uid, name
-                            ) VALUES(?, ?, ?)""",
-                    (
-                        cl_area_uid,
-                        languages[lang],
-                        codelist_items[item].name.localizations[lang],
-                    ),
-                )
-                con.commit()
+        names = []
+        for i, item in enumerate(codelist_items):
+            bar.update(i + 1)
+            names += localized_rows(
+                area_uids[item], codelist_items[item].name.localizations, languages
+            )
+
+        # Replace the names we already had, so that the stage can be run again
+        cur.execute("DELETE FROM cl_area_name")
+
+        # Insert the names of the areas into the database
+        stats.executemany(
+            cur,
+            """
+                INSERT OR IGNORE INTO cl_area_name (
+                    cl_area_uid, language_uid, name
+                ) VALUES(?, ?, ?)""",
+            names,
+        )
+
+        # Record that the stage is complete
+        mark_done(cur, "cl_area")
 
     # Close the bar
     bar.finish()
+    stats.report()
 
     # Close the cursor
     con.close()
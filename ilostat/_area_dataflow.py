@@ -1,7 +1,16 @@
-import sdmx
 import sqlite3
 import time
+import queue
+import threading
 import progressbar
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from ._client import get_client
+from ._connection import connect
+from ._bulk import IngestionStats, get_languages, get_uid_map, localized_rows
+from ._checkpoint import get_checkpoints, mark_done, mark_failed
+from ._dimensions import get_constrained_dimensions
+from ._manifest import write_manifest
+from ._search import rebuild_search_index
 
 # Widgets for the progress bar
 progressbar_widgets = [
@@ -14,111 +23,366 @@ progressbar_widgets = [
     progressbar.AdaptiveETA(),
 ]
 
+# Number of dataflows whose constraints are downloaded at the same time
+DEFAULT_WORKERS = 8
 
-def get_area_dataflows():
-    # Connect to the database
-    con = sqlite3.connect("store/ilo-prism.db")
-    cur = con.cursor()
+# Maximum number of retries
+MAX_RETRIES = 10
+
+# Base sleep time in seconds
+BASE_SLEEP_TIME = 5
+
+# Longest sleep between retries in seconds. The rate limiter of the client
+# already slows every request down while the API is struggling.
+MAX_SLEEP_TIME = 60
+
+# Number of dataflows written between commits
+COMMIT_EVERY = 25
+
+# Name of the stage in the checkpoint table
+STAGE = "cl_area_dataflow"
+
+
+def fetch_dataflow(df: str):
+    """Download a dataflow together with its constraints. If the request fails,
+    retry it with an exponential backoff and re-raise the last exception."""
+    ilostat = get_client()
+
+    for attempt in range(MAX_RETRIES):
+        try:
+            return ilostat.dataflow(df)
+        except Exception as e:
+            if attempt < MAX_RETRIES - 1:
+                sleep_time = min(BASE_SLEEP_TIME * (2**attempt), MAX_SLEEP_TIME)
+                time.sleep(sleep_time)
+            else:
+                print(f"{df}: attempt {attempt + 1} failed. No more retries left.")
+                raise e  # Re-raise the exception if the last attempt fails
+
+
+def get_constrained_areas(dataflow) -> list[str]:
+    """Return the codes of the areas included in the constraints of a dataflow."""
+    areas = []
+
+    # Get the constraints
+    constraints = dataflow.constraint
+
+    for constraint in constraints:
+        # Get the content region included in the constraints
+        cr = constraints[constraint].data_content_region[0]
+
+        # Get the members of the content region
+        members = cr.member
+
+        # Get the values of the REF_AREA member
+        areas += [member_value.value for member_value in members["REF_AREA"].values]
+
+    return areas
 
-    # Get a list of languages and their ids
-    # {'en': 1, 'fr': 2, 'es': 3}
-    cur.execute("SELECT * FROM language")
-    languages = cur.fetchall()
-    languages = {lang[1]: lang[0] for lang in languages}
 
-    # Create an SDMX Client client
-    ilostat = sdmx.Client("ILO")
+def _download(df: str):
+    """Worker task: download the constraints of a dataflow and keep only what
+    the writer needs, so that the full message can be freed right away."""
+    dataflow = fetch_dataflow(df)
+    return df, (get_constrained_areas(dataflow), get_constrained_dimensions(dataflow))
 
-    # Get a list of all of the data flows
-    dataflows_msg = ilostat.dataflow()
 
-    # Get the dataflows
-    dataflows = dataflows_msg.dataflow
+def _write_dimensions(
+    cur: sqlite3.Cursor,
+    dataflow_uid: int,
+    dimensions: list[dict],
+    languages: dict[str, int],
+    uids: dict,
+):
+    """Store the constrained dimensions of a dataflow together with the localized
+    labels of their codelists. The uids of the codelists and codes written during
+    this run are kept in uids, so that shared codelists are only written once."""
 
-    # Set up the progress bar
-    bar = progressbar.ProgressBar(
-        max_value=(len(dataflows)), widgets=progressbar_widgets
+    # Replace the dimensions we already had for this dataflow
+    cur.execute(
+        """DELETE FROM dataflow_dimension_code WHERE dataflow_dimension_uid IN (
+               SELECT dataflow_dimension_uid FROM dataflow_dimension WHERE dataflow_uid = ?)""",
+        (dataflow_uid,),
+    )
+    cur.execute(
+        "DELETE FROM dataflow_dimension WHERE dataflow_uid = ?", (dataflow_uid,)
     )
 
-    for i, df in enumerate(dataflows):
+    for position, dimension in enumerate(dimensions):
+        codelist = dimension["codelist"]
 
-        bar.update(i + 1)
+        # Write the codelist and its names the first time we see it
+        if codelist not in uids:
+            cur.execute("INSERT OR IGNORE INTO codelist(code) VALUES(?)", (codelist,))
+            cur.execute("SELECT codelist_uid FROM codelist WHERE code = ?", (codelist,))
+            uids[codelist] = cur.fetchone()[0]
+            cur.executemany(
+                """INSERT INTO codelist_name (codelist_uid, language_uid, name)
+                   VALUES(?, ?, ?)
+                   ON CONFLICT(codelist_uid, language_uid) DO UPDATE SET name = excluded.name""",
+                localized_rows(uids[codelist], dimension["names"], languages),
+            )
+        codelist_uid = uids[codelist]
 
-        # Get the uid of the dataflow from the db
-        cur.execute("SELECT dataflow_uid FROM dataflow WHERE dataflow.code = ?", (df,))
-        dataflow_uid = cur.fetchone()
-        dataflow_uid = dataflow_uid[0]
+        # Write the codes and their names the first time we see them
+        new_codes = [
+            (code, names)
+            for code, names in dimension["values"]
+            if (codelist_uid, code) not in uids
+        ]
+        if new_codes:
+            cur.executemany(
+                "INSERT OR IGNORE INTO code(codelist_uid, code) VALUES(?, ?)",
+                [(codelist_uid, code) for code, _ in new_codes],
+            )
+            cur.execute(
+                "SELECT code, code_uid FROM code WHERE codelist_uid = ?",
+                (codelist_uid,),
+            )
+            for code, code_uid in cur.fetchall():
+                uids[(codelist_uid, code)] = code_uid
 
-        # Get the dataflow
-        dataflow = None
+            names = []
+            for code, localizations in new_codes:
+                names += localized_rows(
+                    uids[(codelist_uid, code)], localizations, languages
+                )
+            cur.executemany(
+                """INSERT INTO code_name (code_uid, language_uid, name)
+                   VALUES(?, ?, ?)
+                   ON CONFLICT(code_uid, language_uid) DO UPDATE SET name = excluded.name""",
+                names,
+            )
 
-        # Maximum number of retries
-        max_retries = 10
+        # Write the dimension and the codes it is constrained to
+        cur.execute(
+            """INSERT OR REPLACE INTO dataflow_dimension (
+                   dataflow_uid, dimension, codelist_uid, position
+               ) VALUES(?, ?, ?, ?)""",
+            (dataflow_uid, dimension["dimension"], codelist_uid, position),
+        )
+        dataflow_dimension_uid = cur.lastrowid
+        cur.executemany(
+            """INSERT OR IGNORE INTO dataflow_dimension_code (
+                   dataflow_dimension_uid, code_uid, position
+               ) VALUES(?, ?, ?)""",
+            [
+                (dataflow_dimension_uid, uids[(codelist_uid, code)], i)
+                for i, (code, _) in enumerate(dimension["values"])
+            ],
+        )
 
-        # Base sleep time in seconds
-        base_sleep_time = 5
 
-        # If the request fails, retry max_retries more times
-        for i in range(max_retries):
-            try:
-                dataflow = ilostat.dataflow(df)
-                break
-            except Exception as e:
-                if i < max_retries - 1:
-                    sleep_time = base_sleep_time * (2**i)
-                    time.sleep(sleep_time)
-                else:
-                    print(f"Attempt {i + 1} failed. No more retries left.")
-                    raise e  # Re-raise the exception if the last attempt fails
+def _write_area_dataflows(
+    results: queue.Queue,
+    total: int,
+    stats: IngestionStats,
+    stamps: dict = None,
+    path: str = None,
+):
+    """Writer thread: the only thread that touches the database. It consumes the
+    downloaded constraints and commits them in batches together with a checkpoint
+    for each dataflow, so that an interrupted run can pick up where it left off."""
+    con = connect(path)
+    cur = con.cursor()
+    try:
+        # Build the code -> uid maps once instead of querying them for every value
+        area_uids = get_uid_map(cur, "cl_area", "cl_area_uid")
+        dataflow_uids = get_uid_map(cur, "dataflow", "dataflow_uid")
+        languages = get_languages(cur)
+
+        # The uids of the codelists and codes written during this run
+        codelist_uids = {}
 
-        # Get the constraints
-        constraints = dataflow.constraint
+        # Set up the progress bar
+        bar = progressbar.ProgressBar(max_value=total, widgets=progressbar_widgets)
 
-        for constraint in constraints:
+        done = 0
+        failed = 0
+        completed = False
 
-            # Get the content region included in the constraints
-            cr = constraints[constraint].data_content_region[0]
+        while True:
+            item = results.get()
 
-            # Get the members of the content region
-            members = cr.member
+            # A None item means that the downloads are over, an exception that they
+            # were interrupted
+            if item is None or isinstance(item, BaseException):
+                completed = item is None
+                break
 
-            # Get the first member
-            ref_area = members["REF_AREA"]
+            status, df, result = item
+            dataflow_uid = dataflow_uids[df]
 
-            # Get the values of the member
-            member_values = ref_area.values
+            if status == "failed":
+                # Skip the dataflow and leave its version empty so that the next
+                # refresh downloads it again
+                print(f"Skipping {df}: {result!r}")
+                mark_failed(cur, STAGE, df, result)
+                cur.execute(
+                    "UPDATE dataflow SET version = NULL, updated = NULL WHERE dataflow_uid = ?",
+                    (dataflow_uid,),
+                )
+                failed += 1
+            else:
+                area_codes, dimensions = result
 
-            # For each value
-            for member_value in member_values:
-                area_code = member_value.value
+                # Stage the mapping for every area that exists in the database
+                area_dataflows = []
+                for area_code in area_codes:
+                    if area_code in area_uids:
+                        area_dataflows.append((dataflow_uid, area_uids[area_code]))
+                    else:
+                        print(
+                            f"Error: {df} includes Area {area_code} but this is not in the database"
+                        )
 
-                # Insert the dataflow into the database
+                # Replace the mapping we already had for this dataflow
                 cur.execute(
-                    "SELECT cl_area_uid FROM cl_area WHERE cl_area.code = ?",
-                    (area_code,),
+                    "DELETE FROM cl_area_dataflow WHERE dataflow_uid = ?",
+                    (dataflow_uid,),
+                )
+
+                stats.executemany(
+                    cur,
+                    """INSERT OR IGNORE INTO cl_area_dataflow (
+                                dataflow_uid,
+                                cl_area_uid)
+                                VALUES(?, ?)""",
+                    area_dataflows,
+                )
+
+                # Store the other dimensions the dataflow is constrained to
+                _write_dimensions(
+                    cur, dataflow_uid, dimensions, languages, codelist_uids
                 )
-                cl_area_uid = cur.fetchone()
-                # If the area exists in the database
-                if cl_area_uid:
-                    cl_area_uid = cl_area_uid[0]
 
+                # Record the version of the dataflow now that its constraints are stored
+                if stamps:
                     cur.execute(
-                        """INSERT OR IGNORE INTO cl_area_dataflow (
-                                    dataflow_uid,
-                                    cl_area_uid)
-                                    VALUES(?, ?)""",
-                        (dataflow_uid, cl_area_uid),
-                    )
-                    con.commit()
-                else:
-                    print(
-                        f"Error: {df} includes Area {area_code} but this is not in the database"
+                        "UPDATE dataflow SET version = ?, updated = ? WHERE dataflow_uid = ?",
+                        (*stamps[df], dataflow_uid),
                     )
 
-        bar.update()
+                mark_done(cur, STAGE, df)
+
+            # Only count a dataflow once its rows are staged
+            done += 1
+            bar.update(done)
+
+            # Commit in batches, or whenever we're waiting for downloads anyway
+            if done % COMMIT_EVERY == 0 or results.empty():
+                con.commit()
+
+        if completed:
+            mark_done(cur, STAGE)
+            rebuild_search_index(cur)
+            write_manifest(cur)
+            bar.finish()
+
+        # Keep whatever was written, even if the run was interrupted
+        con.commit()
+
+        if failed:
+            print(f"{failed} dataflows failed and were skipped")
+    finally:
+        con.close()
+
+
+def _run_writer(errors: list, *args):
+    """Run the writer thread, keeping the exception that stops it, if any, so
+    that the thread that waits for it can raise it."""
+    try:
+        _write_area_dataflows(*args)
+    except BaseException as e:
+        errors.append(e)
+
+
+def get_area_dataflows(
+    max_workers: int = DEFAULT_WORKERS,
+    dataflows: list[str] = None,
+    stamps: dict[str, tuple[str, str]] = None,
+    path: str = None,
+):
+    """Map the dataflows to the areas they include. The constraints of up to
+    max_workers dataflows are downloaded concurrently, while a single writer
+    thread inserts the results into the database.
+
+    Progress is checkpointed for each dataflow. Dataflows that were already
+    written are skipped, so an interrupted run resumes where it stopped.
+    Dataflows whose retries all fail are skipped instead of aborting the run,
+    and downloaded again by the next refresh.
+
+    Parameters:
+    - max_workers (int): Number of dataflows downloaded at the same time.
+    - dataflows (list[str]): Codes of the dataflows to map. Defaults to all of
+      the dataflows in ILOSTAT.
+    - stamps (dict): Versions and annotation timestamps to record for each
+      dataflow once its constraints are stored.
+    - path (str): The database to write to, by default the one the app reads.
+    """
+
+    if dataflows is None:
+        # Get the shared SDMX client
+        ilostat = get_client()
+
+        # Get a list of all of the data flows
+        dataflows = list(ilostat.dataflow().dataflow)
+
+    # Leave out the dataflows that are done
+    con = connect(path)
+    checkpoints = get_checkpoints(con.cursor(), STAGE)
+    con.close()
+
+    pending = [df for df in dataflows if checkpoints.get(df, (None, 0))[0] != "done"]
+
+    if len(pending) < len(dataflows):
+        print(f"Resuming: {len(dataflows) - len(pending)} dataflows already done")
+
+    stats = IngestionStats("Area dataflows")
+
+    # Start the writer thread. The exception that stops it, if any, ends up in
+    # writer_errors.
+    results = queue.Queue()
+    writer_errors = []
+    writer = threading.Thread(
+        target=_run_writer,
+        args=(writer_errors, results, len(pending), stats, stamps, path),
+    )
+    writer.start()
+
+    executor = ThreadPoolExecutor(
+        max_workers=max_workers, thread_name_prefix="area-dataflows"
+    )
+
+    try:
+        futures = {executor.submit(_download, df): df for df in pending}
+
+        # Hand the results to the writer as soon as they are downloaded
+        for future in as_completed(futures):
+            # Nobody reads the results once the writer is gone
+            if writer_errors:
+                raise writer_errors[0]
+            try:
+                results.put(("done", *future.result()))
+            except Exception as e:
+                # All of the retries failed: mark the dataflow and carry on
+                results.put(("failed", futures[future], e))
+    except BaseException as e:
+        # Stop downloading and let the writer commit what it has so far
+        executor.shutdown(wait=False, cancel_futures=True)
+        results.put(e)
+        writer.join()
+        raise
+
+    executor.shutdown()
+
+    # Tell the writer that we're done and wait for it to commit
+    results.put(None)
+    writer.join()
+    if writer_errors:
+        raise writer_errors[0]
 
-    bar.finish()
-    cur.close()
+    stats.report()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,168 @@
+import os
+import copy
+from concurrent.futures import ThreadPoolExecutor
+from typing import Literal
+import pandas as pd
+from ._query import DATA_FORMAT, ILOStatQuery
+
+# The longest URL sent to the API. Areas are grouped into as few requests as fit
+# under it; servers and proxies commonly reject URLs longer than 2-8 KB.
+MAX_URL_LENGTH = int(os.environ.get("ILO_PRISM_MAX_URL_LENGTH", 2000))
+
+# The most areas in one request, so that no single response gets too big
+MAX_AREAS = 50
+
+# Requests of a batch sent at the same time. The rate limiter of the client
+# still has the last word.
+BATCH_WORKERS = int(os.environ.get("ILO_PRISM_BATCH_WORKERS", 8))
+
+
+class BatchResult:
+    """The merged result of a batch of queries, together with the requests of
+    the batch that failed."""
+
+    def __init__(self, results: list[tuple], errors: list[dict]):
+        """
+        Args:
+            results (list[tuple]): The (dataflow, areas, ILOStatQueryResult) of
+                each request that succeeded.
+            errors (list[dict]): The dataflow, areas and exception of each
+                request that failed.
+        """
+        self.results = results
+        self.errors = errors
+
+        # Merge the data of every request, with the dataflow it comes from
+        frames = [
+            result.dataframe.assign(DATAFLOW=dataflow)
+            for dataflow, _, result in results
+        ]
+        if frames:
+            df = pd.concat(frames, ignore_index=True)
+            self.dataframe = df[["DATAFLOW"] + [c for c in df if c != "DATAFLOW"]]
+        else:
+            self.dataframe = pd.DataFrame(columns=["DATAFLOW", "value"])
+
+    @property
+    def ok(self) -> bool:
+        """Whether every request of the batch succeeded."""
+        return not self.errors
+
+
+def chunk_areas(query: ILOStatQuery, areas: list[str]) -> list[list[str]]:
+    """
+    Group areas into as few '+'-joined REF_AREA keys as fit under MAX_URL_LENGTH
+    and MAX_AREAS, e.g. ["X01", "ITA", ...] -> [["X01", "ITA", ...], [...]].
+
+    Parameters:
+    - query (ILOStatQuery): The query of the dataflow, whose URL the areas go in.
+    - areas (list[str]): The area codes.
+
+    Returns:
+    - list[list[str]]: The areas of each request.
+    """
+    if not areas:
+        return []
+
+    # The length of the URL without its areas
+    probe = copy.copy(query)
+    probe.dimensions = {**query.dimensions, "REF_AREA": areas[0]}
+    base = len(probe._prepare().url) - len(areas[0])
+
+    chunks = [[]]
+    length = base
+    for area in areas:
+        added = len(area) + (1 if chunks[-1] else 0)
+        if chunks[-1] and (
+            length + added > MAX_URL_LENGTH or len(chunks[-1]) >= MAX_AREAS
+        ):
+            chunks.append([])
+            length = base
+            added = len(area)
+        chunks[-1].append(area)
+        length += added
+    return chunks
+
+
+def query_many(
+    dataflows: list[str],
+    areas: list[str],
+    dimensions: dict[str, str] = None,
+    params: dict[str, str] = None,
+    language: Literal["en", "fr", "es"] = "en",
+    data_format: str = DATA_FORMAT,
+) -> BatchResult:
+    """
+    Query several dataflows for several areas at once. The areas of each
+    dataflow are grouped into as few requests as fit in a URL, and the requests
+    of every dataflow are sent concurrently.
+
+    Parameters:
+    - dataflows (list[str]): The dataflow codes.
+    - areas (list[str]): The area codes, e.g. ["X01", "ITA", "FRA"].
+    - dimensions (dict[str, str]): Dimension constraints other than REF_AREA.
+      Each dataflow only gets the dimensions it has.
+    - params (dict[str, str]): Additional parameters, e.g. {"startPeriod": "2020"}.
+    - language (str): The language of the labels ('en', 'fr' or 'es').
+    - data_format (str): How to ask for the data, "sdmx-ml" or "csv".
+
+    Returns:
+    - BatchResult: The merged data of every request that succeeded, and the
+      errors of those that failed.
+    """
+    dimensions = {
+        dim: value for dim, value in (dimensions or {}).items() if dim != "REF_AREA"
+    }
+    areas = list(dict.fromkeys(areas))
+    results = []
+    errors = []
+
+    def prepare(dataflow: str) -> ILOStatQuery:
+        # Parse the structure and look up the labels once per dataflow
+        query = ILOStatQuery(
+            dataflow=dataflow,
+            dimensions={},
+            params=params or {},
+            language=language,
+            data_format=data_format,
+        )
+        query.dimensions = {
+            dim: value for dim, value in dimensions.items() if dim in query.codelist
+        }
+        return query
+
+    def fetch(query: ILOStatQuery, chunk: list[str]):
+        query = copy.copy(query)
+        query.dimensions = {**query.dimensions, "REF_AREA": "+".join(chunk)}
+        return query.data()
+
+    with ThreadPoolExecutor(BATCH_WORKERS) as executor:
+        prepared = {
+            dataflow: executor.submit(prepare, dataflow)
+            for dataflow in dict.fromkeys(dataflows)
+        }
+
+        requests = []
+        for dataflow, future in prepared.items():
+            try:
+                query = future.result()
+                chunks = chunk_areas(query, areas)
+            except Exception as e:
+                errors.append({"dataflow": dataflow, "areas": areas, "error": e})
+                continue
+            for chunk in chunks:
+                requests.append((dataflow, chunk, executor.submit(fetch, query, chunk)))
+
+        for dataflow, chunk, future in requests:
+            try:
+                results.append((dataflow, chunk, future.result()))
+            except Exception as e:
+                errors.append({"dataflow": dataflow, "areas": chunk, "error": e})
+
+    for error in errors:
+        print(
+            f"Error: {error['dataflow']} for {'+'.join(error['areas'])}: "
+            f"{error['error']!r}"
+        )
+
+    return BatchResult(results, errors)
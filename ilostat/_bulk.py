@@ -0,0 +1,46 @@
+import time
+import sqlite3
+
+
+def get_languages(cur: sqlite3.Cursor) -> dict[str, int]:
+    """Return a mapping of language codes to their uids, e.g. {'en': 1, 'fr': 2, 'es': 3}"""
+    cur.execute("SELECT code, language_uid FROM language")
+    return dict(cur.fetchall())
+
+
+def get_uid_map(cur: sqlite3.Cursor, table: str, uid_column: str) -> dict[str, int]:
+    """Build a code -> uid map for a table in a single query instead of
+    looking up each code separately."""
+    cur.execute(f"SELECT code, {uid_column} FROM {table}")
+    return dict(cur.fetchall())
+
+
+def localized_rows(uid: int, localizations: dict[str, str], languages: dict[str, int]):
+    """Stage (uid, language_uid, text) rows for the languages we support."""
+    return [
+        (uid, languages[lang], text)
+        for lang, text in localizations.items()
+        if lang in languages
+    ]
+
+
+class IngestionStats:
+    """Keeps track of how many rows a stage of the ingestion wrote and how fast."""
+
+    def __init__(self, stage: str):
+        self.stage = stage
+        self.rows = 0
+        self._started = time.perf_counter()
+
+    def executemany(self, cur: sqlite3.Cursor, sql: str, rows: list[tuple]):
+        """Write a batch of staged rows and count them."""
+        cur.executemany(sql, rows)
+        self.rows += len(rows)
+
+    def report(self):
+        """Print the number of rows written and the throughput of the stage."""
+        elapsed = time.perf_counter() - self._started
+        rate = self.rows / elapsed if elapsed > 0 else float(self.rows)
+        print(
+            f"{self.stage}: {self.rows} rows in {elapsed:.2f}s ({rate:,.0f} rows/sec)"
+        )
@@ -0,0 +1,191 @@
+import os
+import gzip
+import json
+import shutil
+import hashlib
+import sqlite3
+import argparse
+import tempfile
+from ._connection import DB_PATH, ROOT_DIR, connect_read_only
+from ._manifest import read_manifest
+from ._migrate import latest_version, migrate_db
+from ._swap import swap_in
+from ._validate_db import validate_db
+
+# Where the compressed snapshot of the database is shipped, outside of store/ so
+# that a volume mounted there doesn't hide it
+BUNDLE_DIR = os.path.join(ROOT_DIR, "bundle")
+
+# The compressed database and the description of the snapshot
+BUNDLE_DB = "ilo-prism.db.gz"
+BUNDLE_MANIFEST = "manifest.json"
+
+# Version of the bundle format itself
+BUNDLE_FORMAT = 1
+
+
+def _write_atomically(path: str, write):
+    """Write a file next to its destination, then rename it into place, so that
+    a bundle is never left half written."""
+    directory = os.path.dirname(path) or "."
+    fd, tmp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            write(f)
+        os.replace(tmp, path)
+    except BaseException:
+        os.remove(tmp)
+        raise
+
+
+def build_bundle(bundle_dir: str = BUNDLE_DIR) -> dict:
+    """Compress a consistent copy of the database into bundle_dir, together with a
+    manifest.json describing it. The database must hold a complete build.
+
+    Returns:
+    - dict: The contents of manifest.json.
+    """
+    migrate_db()
+    if not validate_db():
+        raise RuntimeError(f"{DB_PATH} doesn't hold a complete build of the metadata")
+
+    os.makedirs(bundle_dir, exist_ok=True)
+    manifest = read_manifest()
+
+    with tempfile.TemporaryDirectory(dir=bundle_dir) as tmp:
+        # VACUUM INTO writes a compact, consistent copy
+        copy = os.path.join(tmp, "ilo-prism.db")
+        con = connect_read_only()
+        try:
+            con.execute("VACUUM INTO ?", (copy,))
+        finally:
+            con.close()
+
+        sha256 = hashlib.sha256()
+        with open(copy, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                sha256.update(block)
+
+        def compress(out):
+            with open(copy, "rb") as src, gzip.GzipFile(
+                fileobj=out, mode="wb", mtime=0
+            ) as dst:
+                shutil.copyfileobj(src, dst, 1 << 20)
+
+        _write_atomically(os.path.join(bundle_dir, BUNDLE_DB), compress)
+        size = os.path.getsize(copy)
+
+    description = {
+        "format": BUNDLE_FORMAT,
+        "schema_version": manifest["schema_version"],
+        "build_id": manifest["build_id"],
+        "built_at": manifest["built_at"],
+        "row_counts": manifest["row_counts"],
+        "size": size,
+        "sha256": sha256.hexdigest(),
+    }
+    _write_atomically(
+        os.path.join(bundle_dir, BUNDLE_MANIFEST),
+        lambda f: f.write(json.dumps(description, indent=2).encode()),
+    )
+
+    compressed = os.path.getsize(os.path.join(bundle_dir, BUNDLE_DB))
+    print(
+        f"Bundled build {description['build_id']} (schema version "
+        f"{description['schema_version']}): {size:,} bytes, {compressed:,} compressed"
+    )
+    return description
+
+
+def read_bundle_manifest(bundle_dir: str = BUNDLE_DIR) -> dict | None:
+    """Return the description of the bundled snapshot, or None if there's none."""
+    try:
+        with open(os.path.join(bundle_dir, BUNDLE_MANIFEST), "r") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def restore_bundle(bundle_dir: str = BUNDLE_DIR) -> bool:
+    """Replace the contents of the database with the bundled snapshot, if there's
+    one this version of the code can use. The snapshot is decompressed next to
+    the database, migrated to the latest schema and validated, then swapped in
+    atomically so that readers never see it half restored.
+
+    Returns:
+    - bool: True if the snapshot was restored, False otherwise.
+    """
+    description = read_bundle_manifest(bundle_dir)
+    if description is None:
+        return False
+
+    if description["format"] != BUNDLE_FORMAT:
+        print(f"Error: unknown bundle format {description['format']}")
+        return False
+
+    if description["schema_version"] > latest_version():
+        print("Error: the bundled snapshot is newer than this version of the code")
+        return False
+
+    print(f"Restoring the bundled snapshot of build {description['build_id']}...")
+
+    directory = os.path.dirname(DB_PATH) or "."
+    fd, tmp = tempfile.mkstemp(dir=directory, suffix=".db")
+    try:
+        # Decompress, checking the contents against the manifest as we go
+        sha256 = hashlib.sha256()
+        with os.fdopen(fd, "wb") as dst, gzip.open(
+            os.path.join(bundle_dir, BUNDLE_DB), "rb"
+        ) as src:
+            for block in iter(lambda: src.read(1 << 20), b""):
+                sha256.update(block)
+                dst.write(block)
+
+        if sha256.hexdigest() != description["sha256"]:
+            print("Error: the bundled snapshot is corrupted")
+            return False
+
+        src = sqlite3.connect(tmp)
+        try:
+            if src.execute("PRAGMA quick_check").fetchone()[0] != "ok":
+                print("Error: the bundled snapshot failed its integrity check")
+                return False
+
+            row = src.execute(
+                "SELECT status, build_id FROM metadata_manifest WHERE manifest_uid = 1"
+            ).fetchone()
+            if row != ("complete", description["build_id"]):
+                print("Error: the bundled snapshot isn't a complete build")
+                return False
+        finally:
+            src.close()
+
+        # mkstemp only lets the owner read the file, unlike the database it replaces
+        os.chmod(tmp, 0o644)
+
+        # The snapshot may have been built for an older schema
+        migrate_db(tmp)
+        return swap_in(tmp)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        prog="python -m ilostat._bundle",
+        description="Build or restore the compressed snapshot of the metadata "
+        "that is shipped with the Docker image.",
+    )
+    parser.add_argument("command", choices=["build", "restore"])
+    parser.add_argument("--dir", default=BUNDLE_DIR, help="Directory of the bundle")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        # Download the metadata first if the database doesn't hold a complete build
+        from .ilostat import ILOStat
+
+        ILOStat("en", refresh_ttl=None)
+        build_bundle(args.dir)
+    elif not restore_bundle(args.dir):
+        raise SystemExit(1)
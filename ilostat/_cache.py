@@ -0,0 +1,318 @@
+import os
+import json
+import time
+import zlib
+import sqlite3
+import argparse
+import threading
+from collections import OrderedDict
+from urllib.parse import urlsplit
+import requests
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+from ._connection import STORE_DIR
+
+# The compressed on-disk tier of the cache. Set ILO_PRISM_CACHE to keep it
+# somewhere else, or to an empty string to only cache in memory.
+CACHE_PATH = os.environ.get("ILO_PRISM_CACHE", os.path.join(STORE_DIR, "http-cache.db"))
+
+# Bytes of responses kept in memory, least recently used first out
+MEMORY_BYTES = int(os.environ.get("ILO_PRISM_CACHE_MEMORY", 64 * 1024 * 1024))
+
+# Seconds for which responses are reused. Structures (dataflows, codelists,
+# DSDs) rarely change, data does whenever ILOSTAT publishes new figures.
+STRUCTURE_TTL = float(os.environ.get("ILO_PRISM_CACHE_STRUCTURE_TTL", 24 * 60 * 60))
+DATA_TTL = float(os.environ.get("ILO_PRISM_CACHE_DATA_TTL", 600))
+
+# The SDMX REST resources whose responses are data rather than structures
+DATA_RESOURCES = {"data", "availableconstraint"}
+
+# Level of the zlib compression of the on-disk tier
+COMPRESSION_LEVEL = 6
+
+# Headers that describe how the response was sent rather than its contents
+HOP_HEADERS = {"content-encoding", "content-length", "transfer-encoding", "connection"}
+
+
+def cache_key(request: requests.PreparedRequest) -> str | None:
+    """The key of the cached response to a request, or None if it can't be cached."""
+    if request.method != "GET":
+        return None
+    return f"{request.url} {request.headers.get('Accept', '')}"
+
+
+def is_data(url: str) -> bool:
+    """Check if a URL asks for data rather than structures, e.g.
+    http://sdmx.ilo.org/rest/data/ILO,DF_UNE_2EAP_SEX_AGE_RT/..."""
+    return not DATA_RESOURCES.isdisjoint(urlsplit(url).path.split("/"))
+
+
+def to_response(request: requests.PreparedRequest, entry: tuple) -> requests.Response:
+    """Turn a cached entry back into the response to a request."""
+    _, status, headers, body = entry
+    response = requests.Response()
+    response.status_code = status
+    response.reason = "OK"
+    response.headers = CaseInsensitiveDict(headers)
+    response.encoding = get_encoding_from_headers(response.headers)
+    response.url = request.url
+    response.request = request
+    response._content = body
+    response._content_consumed = True
+    return response
+
+
+class ResponseCache:
+    """A cache of SDMX responses in two tiers: an LRU in memory bounded by bytes,
+    in front of a store of compressed responses on disk that outlives the process.
+    Structure and data responses expire after their own TTL."""
+
+    def __init__(
+        self,
+        path: str = CACHE_PATH,
+        memory_bytes: int = MEMORY_BYTES,
+        structure_ttl: float = STRUCTURE_TTL,
+        data_ttl: float = DATA_TTL,
+    ):
+        self.path = path
+        self.memory_bytes = memory_bytes
+        self.structure_ttl = structure_ttl
+        self.data_ttl = data_ttl
+
+        # key -> (expires_at, status, headers, body), most recently used last
+        self._memory = OrderedDict()
+        self._memory_size = 0
+        self._con = None
+        # The memory tier and the counters have one lock, the on-disk tier
+        # another, so that memory hits never wait for a response being
+        # compressed or written to disk
+        self._lock = threading.Lock()
+        self._disk_lock = threading.Lock()
+        self._stats = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "expired": 0,
+            "evictions": 0,
+            "stores": 0,
+        }
+
+    def _connect(self) -> sqlite3.Connection | None:
+        """Open the on-disk tier on first use, dropping the expired responses.
+        If it can't be opened, e.g. on a read-only volume, only memory is used."""
+        if self._con is None and self.path:
+            try:
+                con = sqlite3.connect(
+                    self.path, check_same_thread=False, isolation_level=None
+                )
+                con.execute("PRAGMA journal_mode = WAL")
+                con.execute(
+                    """CREATE TABLE IF NOT EXISTS response (
+                           key TEXT PRIMARY KEY,
+                           expires_at REAL NOT NULL,
+                           status INTEGER NOT NULL,
+                           headers TEXT NOT NULL,
+                           body BLOB NOT NULL
+                       )"""
+                )
+                con.execute("DELETE FROM response WHERE expires_at < ?", (time.time(),))
+                self._con = con
+            except sqlite3.Error as e:
+                self._disable_disk(e)
+        return self._con
+
+    def _disable_disk(self, error: sqlite3.Error):
+        """Stop using the on-disk tier after an error, e.g. a full disk or a
+        database locked by another process, and cache in memory only."""
+        print(f"Error: the response cache {self.path} can't be used: {error}")
+        if self._con is not None:
+            try:
+                self._con.close()
+            except sqlite3.Error:
+                pass
+            self._con = None
+        self.path = None
+
+    def _remember(self, key: str, entry: tuple):
+        """Keep an entry in memory, evicting the least recently used ones."""
+        size = len(entry[3])
+        if size > self.memory_bytes:
+            return
+        if key in self._memory:
+            self._memory_size -= len(self._memory.pop(key)[3])
+        self._memory[key] = entry
+        self._memory_size += size
+        while self._memory_size > self.memory_bytes:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_size -= len(evicted[3])
+            self._stats["evictions"] += 1
+
+    def get(self, key: str) -> tuple | None:
+        """Return the cached entry of a key, if it hasn't expired."""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._memory.move_to_end(key)
+                    self._stats["memory_hits"] += 1
+                    return entry
+                self._memory_size -= len(self._memory.pop(key)[3])
+                self._stats["expired"] += 1
+
+        row = None
+        with self._disk_lock:
+            con = self._connect()
+            if con is not None:
+                try:
+                    row = con.execute(
+                        """SELECT expires_at, status, headers, body FROM response
+                           WHERE key = ? AND expires_at > ?""",
+                        (key, now),
+                    ).fetchone()
+                except sqlite3.Error as e:
+                    self._disable_disk(e)
+
+        if row is None:
+            with self._lock:
+                self._stats["misses"] += 1
+            return None
+
+        expires_at, status, headers, body = row
+        entry = (expires_at, status, json.loads(headers), zlib.decompress(body))
+        with self._lock:
+            self._remember(key, entry)
+            self._stats["disk_hits"] += 1
+        return entry
+
+    def put(self, key: str, response: requests.Response):
+        """Cache a successful response in both tiers."""
+        ttl = self.data_ttl if is_data(response.url) else self.structure_ttl
+        if response.status_code != 200 or not ttl:
+            return
+        headers = {
+            name: value
+            for name, value in response.headers.items()
+            if name.lower() not in HOP_HEADERS
+        }
+        entry = (time.time() + ttl, response.status_code, headers, response.content)
+        with self._lock:
+            self._remember(key, entry)
+            self._stats["stores"] += 1
+
+        if not self.path:
+            return
+        body = zlib.compress(entry[3], COMPRESSION_LEVEL)
+        with self._disk_lock:
+            con = self._connect()
+            if con is not None:
+                try:
+                    con.execute(
+                        """INSERT OR REPLACE INTO response (
+                               key, expires_at, status, headers, body
+                           ) VALUES(?, ?, ?, ?, ?)""",
+                        (key, entry[0], entry[1], json.dumps(headers), body),
+                    )
+                except sqlite3.Error as e:
+                    self._disable_disk(e)
+
+    def clear(self):
+        """Drop every cached response, in memory and on disk."""
+        with self._lock:
+            self._memory.clear()
+            self._memory_size = 0
+        with self._disk_lock:
+            con = self._connect()
+            if con is not None:
+                try:
+                    con.execute("DELETE FROM response")
+                    con.execute("VACUUM")
+                except sqlite3.Error as e:
+                    self._disable_disk(e)
+
+    def stats(self) -> dict:
+        """
+        Return the counters of the cache since the process started.
+
+        Returns:
+        - dict: The hits of each tier, misses, expired entries, evictions from
+          memory and stored responses, together with the number of entries and
+          bytes in memory, e.g. {"memory_hits": 12, "disk_hits": 3, ...}
+        """
+        with self._lock:
+            return {
+                **self._stats,
+                "memory_entries": len(self._memory),
+                "memory_bytes": self._memory_size,
+            }
+
+    def close(self):
+        """Close the on-disk tier."""
+        with self._disk_lock:
+            if self._con is not None:
+                self._con.close()
+                self._con = None
+
+
+# The cache shared by every cached SDMX client of the process
+_cache = None
+_lock = threading.Lock()
+
+
+def get_cache() -> ResponseCache:
+    """Return the response cache of the process, creating it on first use."""
+    global _cache
+    if _cache is None:
+        with _lock:
+            if _cache is None:
+                _cache = ResponseCache()
+    return _cache
+
+
+def configure_cache(
+    path: str = None,
+    memory_bytes: int = None,
+    structure_ttl: float = None,
+    data_ttl: float = None,
+):
+    """
+    Replace the response cache of the process with one with new settings. The
+    settings that aren't given keep their current values.
+
+    Parameters:
+    - path (str): The on-disk tier, or an empty string to only cache in memory.
+    - memory_bytes (int): Bytes of responses kept in memory.
+    - structure_ttl (float): Seconds for which structure responses are reused.
+    - data_ttl (float): Seconds for which data responses are reused.
+    """
+    global _cache
+    with _lock:
+        current = _cache or ResponseCache()
+        _cache = ResponseCache(
+            path=current.path if path is None else path,
+            memory_bytes=current.memory_bytes if memory_bytes is None else memory_bytes,
+            structure_ttl=(
+                current.structure_ttl if structure_ttl is None else structure_ttl
+            ),
+            data_ttl=current.data_ttl if data_ttl is None else data_ttl,
+        )
+        current.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        prog="python -m ilostat._cache",
+        description="Describe or clear the on-disk cache of SDMX responses.",
+    )
+    parser.add_argument("command", choices=["stats", "clear"])
+    args = parser.parse_args()
+
+    cache = get_cache()
+    if args.command == "clear":
+        cache.clear()
+    con = cache._connect()
+    if con is not None:
+        entries, size = con.execute(
+            "SELECT COUNT(*), COALESCE(SUM(length(body)), 0) FROM response"
+        ).fetchone()
+        print(f"{cache.path}: {entries} responses, {size:,} compressed bytes")
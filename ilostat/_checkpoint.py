@@ -0,0 +1,93 @@
+import sqlite3
+from ._connection import connect
+
+# The stages of the metadata ingestion, in the order in which they run
+STAGES = ["cl_area", "dataflow", "codelist", "cl_area_dataflow"]
+
+
+def has_checkpoints(cur: sqlite3.Cursor) -> bool:
+    """Check if the database has a checkpoint table. Databases created before
+    ingestion was checkpointed don't."""
+    cur.execute(
+        "SELECT COUNT(*) FROM sqlite_master WHERE type='table' AND name='ingest_checkpoint'"
+    )
+    return cur.fetchone()[0] == 1
+
+
+def get_completed_stages(cur: sqlite3.Cursor) -> set[str]:
+    """Return the stages of the ingestion that ran to completion."""
+    if not has_checkpoints(cur):
+        return set()
+    cur.execute(
+        "SELECT stage FROM ingest_checkpoint WHERE item = '' AND status = 'done'"
+    )
+    return {row[0] for row in cur.fetchall()}
+
+
+def get_checkpoints(cur: sqlite3.Cursor, stage: str) -> dict[str, tuple[str, int]]:
+    """Return the status and number of failed attempts of each item of a stage,
+    e.g. {'DF_UNE_2EAP_SEX_AGE_RT': ('done', 0)}"""
+    cur.execute(
+        """SELECT item, status, attempts FROM ingest_checkpoint
+           WHERE stage = ? AND item != ''""",
+        (stage,),
+    )
+    return {item: (status, attempts) for item, status, attempts in cur.fetchall()}
+
+
+def mark_done(cur: sqlite3.Cursor, stage: str, item: str = ""):
+    """Record that an item of a stage, or the whole stage, was written. This should
+    be called in the same transaction as the one that writes the item."""
+    cur.execute(
+        """INSERT INTO ingest_checkpoint (stage, item, status, attempts, error)
+           VALUES(?, ?, 'done', 0, NULL)
+           ON CONFLICT(stage, item) DO UPDATE SET
+               status = 'done',
+               error = NULL,
+               updated_at = CURRENT_TIMESTAMP""",
+        (stage, item),
+    )
+
+
+def mark_failed(cur: sqlite3.Cursor, stage: str, item: str, error: BaseException):
+    """Record that an item of a stage failed and how many times it did."""
+    cur.execute(
+        """INSERT INTO ingest_checkpoint (stage, item, status, attempts, error)
+           VALUES(?, ?, 'failed', 1, ?)
+           ON CONFLICT(stage, item) DO UPDATE SET
+               status = 'failed',
+               attempts = attempts + 1,
+               error = excluded.error,
+               updated_at = CURRENT_TIMESTAMP""",
+        (stage, item, repr(error)),
+    )
+
+
+def reset_checkpoints(cur: sqlite3.Cursor, stage: str, items: list[str]):
+    """Forget the checkpoints of some items so that they are written again."""
+    cur.executemany(
+        "DELETE FROM ingest_checkpoint WHERE stage = ? AND item = ?",
+        [(stage, item) for item in items],
+    )
+
+
+def build_in_progress(path: str = None) -> bool:
+    """Check if a previous build of the metadata was interrupted, in which case
+    it can be resumed instead of starting over."""
+    con = connect(path)
+    cur = con.cursor()
+    try:
+        completed = get_completed_stages(cur)
+    finally:
+        con.close()
+    return 0 < len(completed) < len(STAGES)
+
+
+def stage_done(stage: str, path: str = None) -> bool:
+    """Check if a stage of the ingestion ran to completion."""
+    con = connect(path)
+    cur = con.cursor()
+    try:
+        return stage in get_completed_stages(cur)
+    finally:
+        con.close()
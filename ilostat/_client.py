@@ -0,0 +1,164 @@
+import os
+import sdmx
+import dataclasses
+import threading
+import time
+from requests.adapters import HTTPAdapter
+from urllib3.util.request import ACCEPT_ENCODING
+from ._cache import cache_key, get_cache, to_response
+from ._ratelimit import BULK, INTERACTIVE, get_limiter, parse_retry_after
+
+# Connections to the ILOSTAT API kept open for reuse. It should be at least the
+# number of threads that download at the same time, e.g. the ingestion workers.
+POOL_SIZE = int(os.environ.get("ILO_PRISM_HTTP_POOL_SIZE", 16))
+
+# Seconds to wait for a connection to the API, and then for its response
+CONNECT_TIMEOUT = float(os.environ.get("ILO_PRISM_HTTP_CONNECT_TIMEOUT", 10))
+READ_TIMEOUT = float(os.environ.get("ILO_PRISM_HTTP_READ_TIMEOUT", 30.1))
+
+# Whether to ask for compressed responses. SDMX-ML is verbose XML, so the
+# responses shrink several times over.
+COMPRESSION = os.environ.get("ILO_PRISM_HTTP_COMPRESSION", "1") != "0"
+
+# The SDMX REST API to send requests to instead of ILOSTAT's, e.g. the replay
+# server of benchmarks/replay.py
+SDMX_URL = os.environ.get("ILO_PRISM_SDMX_URL")
+
+# The clients shared by every thread, by whether they cache their responses
+_clients = {}
+_options = {
+    "pool_size": POOL_SIZE,
+    "timeout": (CONNECT_TIMEOUT, READ_TIMEOUT),
+    "compression": COMPRESSION,
+    "url": SDMX_URL,
+}
+_lock = threading.Lock()
+
+
+class PooledAdapter(HTTPAdapter):
+    """An HTTP adapter with a pool of pool_size keep-alive connections per host,
+    which applies a default timeout to requests that don't set one. If cached,
+    responses are served from, and stored in, the response cache of the process.
+    Requests that reach the API go through the rate limiter of the process, those
+    of the cached client first, since they're made on behalf of users."""
+
+    def __init__(self, pool_size: int, timeout: tuple[float, float], cached: bool):
+        self.timeout = timeout
+        self.cached = cached
+        self.priority = INTERACTIVE if cached else BULK
+        super().__init__(pool_connections=pool_size, pool_maxsize=pool_size)
+
+    def send(self, request, timeout=None, **kwargs):
+        key = cache_key(request) if self.cached else None
+        if key is not None:
+            entry = get_cache().get(key)
+            if entry is not None:
+                return to_response(request, entry)
+
+        limiter = get_limiter()
+        limiter.acquire(self.priority)
+        started = time.monotonic()
+        try:
+            response = super().send(request, timeout=timeout or self.timeout, **kwargs)
+        except Exception:
+            limiter.release(time.monotonic() - started, failed=True)
+            raise
+        limiter.release(
+            time.monotonic() - started,
+            status=response.status_code,
+            retry_after=parse_retry_after(response.headers.get("Retry-After")),
+        )
+
+        # Streamed responses are read as they arrive, so they can't be kept
+        if key is not None and not kwargs.get("stream"):
+            get_cache().put(key, response)
+        return response
+
+
+def _create_client(cached: bool) -> sdmx.Client:
+    """Create an SDMX client for ILOSTAT with a pooled HTTP session."""
+    client = sdmx.Client("ILO")
+    session = client.session
+
+    # Point this client, and only this one, at another API
+    if _options["url"]:
+        client.source = dataclasses.replace(client.source, url=_options["url"])
+
+    # With requests-cache installed, sdmx's session keeps every response in
+    # memory for good. Responses are cached by the adapter instead.
+    if hasattr(session, "settings"):
+        session.settings.disabled = True
+
+    adapter = PooledAdapter(_options["pool_size"], _options["timeout"], cached)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+
+    # Only ask for the encodings that can be decoded here, e.g. br if brotli
+    # is installed
+    session.headers["Accept-Encoding"] = (
+        ACCEPT_ENCODING if _options["compression"] else "identity"
+    )
+    return client
+
+
+def get_client(cached: bool = False) -> sdmx.Client:
+    """
+    Return the SDMX client shared by every thread of the process, creating it on
+    first use. Its connections to the API are kept open between requests.
+
+    Parameters:
+    - cached (bool): Whether to use the client whose responses are cached, for
+      the requests the app makes on behalf of users. The ingestion doesn't use
+      it, so that refreshes always see the current metadata.
+
+    Returns:
+    - sdmx.Client: The client for ILOSTAT.
+    """
+    client = _clients.get(cached)
+    if client is None:
+        with _lock:
+            client = _clients.get(cached)
+            if client is None:
+                client = _clients[cached] = _create_client(cached)
+    return client
+
+
+def configure_client(
+    pool_size: int = None,
+    timeout: float | tuple[float, float] = None,
+    compression: bool = None,
+    url: str = None,
+):
+    """
+    Change the settings of the shared SDMX clients. The clients are created again,
+    with the new settings, the next time they're used.
+
+    Parameters:
+    - pool_size (int): Connections to the API kept open for reuse.
+    - timeout (float | tuple[float, float]): Seconds to wait for the API, or for
+      a connection and then for the response.
+    - compression (bool): Whether to ask for compressed responses.
+    - url (str): The SDMX REST API to send requests to instead of ILOSTAT's.
+    """
+    with _lock:
+        if pool_size is not None:
+            _options["pool_size"] = pool_size
+        if timeout is not None:
+            _options["timeout"] = timeout
+        if compression is not None:
+            _options["compression"] = compression
+        if url is not None:
+            _options["url"] = url
+        _close_clients()
+
+
+def close_clients():
+    """Close the connections of the shared SDMX clients."""
+    with _lock:
+        _close_clients()
+
+
+def _close_clients():
+    for client in _clients.values():
+        client.session.close()
+    _clients.clear()
@@ -0,0 +1,141 @@
+import json
+import progressbar
+from ._client import get_client
+from ._connection import connect, fetch_all
+from ._bulk import IngestionStats, get_languages, get_uid_map, localized_rows
+from ._checkpoint import mark_done
+from ._queries import CODE_LABELS, CODELIST_LABELS
+
+# Widgets for the progress bar
+widgets = [
+    "Downloading codelists",
+    " ",
+    progressbar.SimpleProgress(),
+    " ",
+    progressbar.Bar(),
+    " ",
+    progressbar.AdaptiveETA(),
+]
+
+
+def get_codelists(path: str = None):
+    """Get every codelist of ILOSTAT (CL_SEX, CL_AGE_*, CL_CLASSIF_*, ...) in a
+    single request and insert them into the database together with the names of
+    their codes. path is the database to write to, by default the one the app reads."""
+
+    # Connect to the database
+    con = connect(path)
+    cur = con.cursor()
+
+    # Get a list of languages and their ids
+    # {'en': 1, 'fr': 2, 'es': 3}
+    languages = get_languages(cur)
+
+    # Get the shared SDMX client
+    ilostat = get_client()
+
+    # Get all of the codelists at once
+    codelists = ilostat.codelist().codelist
+
+    # Set up the progress bar
+    bar = progressbar.ProgressBar(max_value=(len(codelists)), widgets=widgets)
+
+    stats = IngestionStats("Codelists")
+
+    # Write the whole stage in a single transaction
+    with con:
+        # Insert all of the codelists at once
+        stats.executemany(
+            cur,
+            "INSERT OR IGNORE INTO codelist(code) VALUES(?)",
+            [(codelist,) for codelist in codelists],
+        )
+
+        # Look up the uids of all of the codelists in one go
+        codelist_uids = get_uid_map(cur, "codelist", "codelist_uid")
+
+        # Stage the codes and the localized names of each codelist
+        names = []
+        codes = []
+        for codelist in codelists:
+            codelist_uid = codelist_uids[codelist]
+            names += localized_rows(
+                codelist_uid, codelists[codelist].name.localizations, languages
+            )
+            codes += [(codelist_uid, code) for code in codelists[codelist].items]
+
+        stats.executemany(
+            cur,
+            """INSERT INTO codelist_name (codelist_uid, language_uid, name)
+               VALUES(?, ?, ?)
+               ON CONFLICT(codelist_uid, language_uid) DO UPDATE SET name = excluded.name""",
+            names,
+        )
+        stats.executemany(
+            cur, "INSERT OR IGNORE INTO code(codelist_uid, code) VALUES(?, ?)", codes
+        )
+
+        # Look up the uids of all of the codes in one go
+        cur.execute("SELECT codelist_uid, code, code_uid FROM code")
+        code_uids = {
+            (codelist_uid, code): code_uid
+            for codelist_uid, code, code_uid in cur.fetchall()
+        }
+
+        # Stage the localized names of each code
+        # Example: {'en': 'Female', 'es': 'Mujeres', 'fr': 'Femmes'}
+        names = []
+        for i, codelist in enumerate(codelists):
+            bar.update(i + 1)
+            codelist_uid = codelist_uids[codelist]
+            items = codelists[codelist].items
+            for code in items:
+                names += localized_rows(
+                    code_uids[(codelist_uid, code)],
+                    items[code].name.localizations,
+                    languages,
+                )
+
+        stats.executemany(
+            cur,
+            """INSERT INTO code_name (code_uid, language_uid, name)
+               VALUES(?, ?, ?)
+               ON CONFLICT(code_uid, language_uid) DO UPDATE SET name = excluded.name""",
+            names,
+        )
+
+        # Record that the stage is complete
+        mark_done(cur, "codelist")
+
+    bar.finish()
+    stats.report()
+    con.close()
+
+
+def get_codelist_labels(codelists: list[str], lang: str) -> dict[str, dict]:
+    """
+    Look up the names of some codelists and the labels of all of their codes in
+    the database, with one query for the names and one for the codes.
+
+    Parameters:
+    - codelists (list[str]): The codelists, e.g. ['CL_SEX', 'CL_AGE_YTHADULT'].
+    - lang (str): The language of the labels ('en', 'fr' or 'es').
+
+    Returns:
+    - dict[str, dict]: The name and code labels of each codelist found, e.g.
+      {"CL_SEX": {"name": "Sex", "codes": {"SEX_T": "Total", ...}}}
+    """
+    ids = json.dumps(list(codelists))
+
+    labels = {
+        codelist: {"name": name, "codes": {}}
+        for codelist, name in fetch_all(CODELIST_LABELS, (lang, ids))
+    }
+    for codelist, code, label in fetch_all(CODE_LABELS, (lang, ids)):
+        labels[codelist]["codes"][code] = label
+
+    return labels
+
+
+if __name__ == "__main__":
+    get_codelists()
@@ -0,0 +1,136 @@
+import os
+import sqlite3
+import pathlib
+import threading
+
+# The project root, so that paths don't depend on the working directory
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# The schema, migrations and, by default, the database
+STORE_DIR = os.path.join(ROOT_DIR, "store")
+
+# The database with the metadata. Set ILO_PRISM_DB to keep it somewhere else,
+# e.g. on a volume shared by several app processes.
+DB_PATH = os.path.abspath(
+    os.environ.get("ILO_PRISM_DB", os.path.join(STORE_DIR, "ilo-prism.db"))
+)
+
+# How this process may use the database, set with ILO_PRISM_DB_MODE:
+# - "rw": the default. The process builds, migrates and refreshes the metadata.
+# - "ro": the process only reads. Another process keeps the metadata up to date.
+# - "immutable": like "ro", for a database that never changes while the process
+#   runs, e.g. on a read-only volume. SQLite then skips locking altogether.
+DB_MODE = os.environ.get("ILO_PRISM_DB_MODE", "rw")
+if DB_MODE not in ["rw", "ro", "immutable"]:
+    raise ValueError("ILO_PRISM_DB_MODE must be one of 'rw', 'ro' or 'immutable'")
+
+# Whether this process may write to the database
+READ_ONLY = DB_MODE != "rw"
+
+# Bytes of the database that the read connections memory-map. The mapped pages
+# live in the OS page cache, so processes reading the same file share one copy.
+MMAP_SIZE = int(os.environ.get("ILO_PRISM_MMAP_SIZE", 256 * 1024 * 1024))
+
+# Prepared statements kept per connection, so that repeated getter queries
+# aren't compiled again on every call
+CACHED_STATEMENTS = 256
+
+# Pragmas of the read connections: a small private page cache since reads are
+# served from the memory map, and temporary b-trees (ORDER BY) kept in memory
+READ_PRAGMAS = [
+    "PRAGMA cache_size = -2048",
+    f"PRAGMA mmap_size = {MMAP_SIZE}",
+    "PRAGMA temp_store = MEMORY",
+]
+
+# One read connection per thread, reused across calls
+_local = threading.local()
+
+
+def disable_wal(con: sqlite3.Connection):
+    """Switch the database back to a rollback journal. New builds are written to a
+    side file and renamed over the database instead of being written in place,
+    and a write-ahead log can't follow its database through a rename. Databases
+    that were switched to WAL before are switched back once nothing else reads
+    them."""
+    try:
+        con.execute("PRAGMA journal_mode = DELETE")
+    except sqlite3.OperationalError:
+        # Another connection is reading it; try again next time
+        pass
+
+
+def connect(path: str = None, **kwargs) -> sqlite3.Connection:
+    """Open a read-write connection to the database. Only the ingestion, which
+    builds, migrates and refreshes the metadata, should write."""
+    if READ_ONLY:
+        raise RuntimeError(
+            f"The database is opened in {DB_MODE!r} mode, so the metadata can't be "
+            "written by this process"
+        )
+    return sqlite3.connect(path or DB_PATH, **kwargs)
+
+
+def connect_read_only(path: str = None, **kwargs) -> sqlite3.Connection:
+    """Open a read-only connection to the database, through a mode=ro URI, or an
+    immutable=1 one in "immutable" mode, with the pragmas of the read connections."""
+    uri = pathlib.Path(path or DB_PATH).as_uri() + "?mode=ro"
+    if DB_MODE == "immutable":
+        uri += "&immutable=1"
+    con = sqlite3.connect(uri, uri=True, **kwargs)
+    for pragma in READ_PRAGMAS:
+        con.execute(pragma)
+    return con
+
+
+def get_generation(path: str = None) -> tuple[int, int] | None:
+    """Identify the file currently at the database path. A new build is renamed
+    over the database, so the file, and with it the generation, changes."""
+    try:
+        stat = os.stat(path or DB_PATH)
+    except FileNotFoundError:
+        return None
+    return (stat.st_dev, stat.st_ino)
+
+
+def get_connection() -> sqlite3.Connection:
+    """Return the read connection of the current thread, opening it on first use.
+    If a new generation of the database was swapped in since, the connection to
+    the old one is closed and a new one is opened."""
+    con = getattr(_local, "connection", None)
+    generation = get_generation()
+    if con is not None and _local.generation != generation:
+        close_connection()
+        con = None
+    if con is None:
+        con = connect_read_only(cached_statements=CACHED_STATEMENTS)
+        _local.connection = con
+        _local.generation = generation
+    return con
+
+
+def close_connection():
+    """Close the read connection of the current thread, if it has one."""
+    con = getattr(_local, "connection", None)
+    if con is not None:
+        con.close()
+        _local.connection = None
+
+
+def fetch_all(sql: str, params: tuple = ()) -> list[tuple]:
+    """Run a read query on the connection of the current thread and return all rows."""
+    cur = get_connection().execute(sql, params)
+    try:
+        return cur.fetchall()
+    finally:
+        cur.close()
+
+
+def fetch_one(sql: str, params: tuple = ()) -> tuple | None:
+    """Run a read query on the connection of the current thread and return the first
+    row. The cursor is closed right away so that it doesn't hold a read snapshot."""
+    cur = get_connection().execute(sql, params)
+    try:
+        return cur.fetchone()
+    finally:
+        cur.close()
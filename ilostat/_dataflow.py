@@ -1,6 +1,9 @@
-import sdmx
 import sqlite3
 import progressbar
+from ._client import get_client
+from ._connection import connect
+from ._bulk import IngestionStats, get_languages, get_uid_map, localized_rows
+from ._checkpoint import mark_done
 
 # Widgets for the progress bar
 widgets = [
@@ -14,21 +17,108 @@ widgets = [
 ]
 
 
-def get_dataflows():
-    """Get a list of dataflows and insert them into the database together with their names."""
+def get_dataflow_stamp(dataflow) -> tuple[str, str]:
+    """Return the version of a dataflow and the timestamps found in its annotations,
+    e.g. ('1.0', 'LAST_UPDATE=2024-11-28T10:00:00'). If either of them changes,
+    the metadata of the dataflow has to be downloaded again."""
+    version = str(dataflow.version) if dataflow.version else None
 
-    # Connect to the database
-    con = sqlite3.connect("store/ilo-prism.db")
-    cur = con.cursor()
+    timestamps = []
+    for annotation in dataflow.annotations:
+        label = annotation.id or annotation.type or ""
+        if "UPDATE" in label.upper() or "DATE" in label.upper():
+            value = annotation.title or str(annotation.text)
+            timestamps.append(f"{label}={value}")
+
+    return version, ";".join(sorted(timestamps))
+
+
+def write_dataflows(
+    cur: sqlite3.Cursor,
+    dataflows,
+    codes: list[str],
+    stats: IngestionStats,
+    stamp: bool = True,
+    bar: progressbar.ProgressBar = None,
+):
+    """Insert or update the given dataflows together with their names and
+    descriptions. If stamp is False, the version of the dataflows is left
+    empty so that they are considered outdated until it is set."""
 
     # Get a list of languages and their ids
     # {'en': 1, 'fr': 2, 'es': 3}
-    cur.execute("SELECT * FROM language")
-    languages = cur.fetchall()
-    languages = {lang[1]: lang[0] for lang in languages}
+    languages = get_languages(cur)
+
+    # Stage the dataflows together with their versions
+    rows = []
+    for code in codes:
+        version, updated = (
+            get_dataflow_stamp(dataflows[code]) if stamp else (None, None)
+        )
+        rows.append((code, version, updated))
+
+    # Insert all of the dataflows at once, updating the ones we already have
+    stats.executemany(
+        cur,
+        """
+            INSERT INTO dataflow(code, version, updated) VALUES(?, ?, ?)
+            ON CONFLICT(code) DO UPDATE SET
+                version = excluded.version,
+                updated = excluded.updated""",
+        rows,
+    )
+
+    # Look up the uids of all of the dataflows in one go
+    dataflow_uids = get_uid_map(cur, "dataflow", "dataflow_uid")
+
+    # Stage the localized names and descriptions of each dataflow
+    names = []
+    descriptions = []
+    for i, code in enumerate(codes):
+        if bar:
+            bar.update(i + 1)
+        dataflow_uid = dataflow_uids[code]
+        names += localized_rows(
+            dataflow_uid, dataflows[code].name.localizations, languages
+        )
+        descriptions += localized_rows(
+            dataflow_uid, dataflows[code].description.localizations, languages
+        )
+
+    # Replace the names and descriptions we had for these dataflows
+    stale = [(dataflow_uids[code],) for code in codes]
+    cur.executemany("DELETE FROM dataflow_name WHERE dataflow_uid = ?", stale)
+    cur.executemany("DELETE FROM dataflow_description WHERE dataflow_uid = ?", stale)
+
+    stats.executemany(
+        cur,
+        """
+            INSERT OR IGNORE INTO dataflow_name (
+                dataflow_uid, language_uid, name
+            ) VALUES(?, ?, ?)""",
+        names,
+    )
+
+    stats.executemany(
+        cur,
+        """
+            INSERT OR IGNORE INTO dataflow_description (
+                dataflow_uid, language_uid, description
+            ) VALUES(?, ?, ?)""",
+        descriptions,
+    )
+
+
+def get_dataflows(path: str = None):
+    """Get a list of dataflows and insert them into the database together with their names.
+    path is the database to write to, by default the one the app reads."""
 
-    # Create an SDMX Client client
-    ilostat = sdmx.Client("ILO")
+    # Connect to the database
+    con = connect(path)
+    cur = con.cursor()
+
+    # Get the shared SDMX client
+    ilostat = get_client()
 
     # Get a list of all of the data flows
     dataflows_msg = ilostat.dataflow()
@@ -39,47 +129,18 @@ def get_dataflows():
     # Set up the progress bar
     bar = progressbar.ProgressBar(max_value=(len(dataflows)), widgets=widgets)
 
-    for i, (dataflow) in enumerate(dataflows):
-
-        bar.update(i + 1)
-
-        cur.execute("INSERT OR IGNORE INTO dataflow(code) VALUES(?)", (dataflow,))
-        dataflow_uid = cur.lastrowid
-        con.commit()
-
-        # Get the localized names of the dataflow
-        names = dataflows[dataflow].name.localizations
-        for lang in names:
-            if lang in languages:
-                cur.execute(
-                    """
-                            INSERT OR IGNORE INTO dataflow_name (
-                                dataflow_uid, language_uid, name
-                            ) VALUES(?, ?, ?)""",
-                    (
-                        dataflow_uid,
-                        languages[lang],
-                        dataflows[dataflow].name.localizations[lang],
-                    ),
-                )
-
-        descriptions = dataflows[dataflow].description.localizations
-        for lang in descriptions:
-            if lang in languages:
-                cur.execute(
-                    """
-                            INSERT OR IGNORE INTO dataflow_description (
-                                dataflow_uid, language_uid, description
-                            ) VALUES(?, ?, ?)""",
-                    (
-                        dataflow_uid,
-                        languages[lang],
-                        dataflows[dataflow].description.localizations[lang],
-                    ),
-                )
+    stats = IngestionStats("Dataflows")
+
+    # Write the whole stage in a single transaction
+    with con:
+        write_dataflows(cur, dataflows, list(dataflows), stats, bar=bar)
+
+        # Record that the stage is complete
+        mark_done(cur, "dataflow")
 
     bar.finish()
-    cur.close()
+    stats.report()
+    con.close()
 
 
 if __name__ == "__main__":
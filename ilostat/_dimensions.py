@@ -1,4 +1,5 @@
-import sdmx
+from ._connection import fetch_all
+from ._queries import DIMENSIONS
 
 
 def dims_with_multi_vals(dimensions: list):
@@ -9,12 +10,23 @@ def dims_with_multi_vals(dimensions: list):
     return filtered_dims
 
 
-def get_dimensions(df: str, lang: str):
-    # Create an SDMX Client client
-    ilostat = sdmx.Client("ILO")
+def get_constrained_dimensions(dataflow) -> list[dict]:
+    """
+    Extract the constrained dimensions of a dataflow message, together with the
+    localized labels of their codelists, so that they can be stored in the database.
 
-    dataflow = ilostat.dataflow(df)
+    Parameters:
+    - dataflow: The SDMX message of the dataflow, including its constraints.
 
+    Returns:
+    - list[dict]: One dictionary per dimension, e.g.
+      {
+        "dimension": "SEX",
+        "codelist": "CL_SEX",
+        "names": {"en": "Sex", "fr": "Sexe", "es": "Sexo"},
+        "values": [("SEX_T", {"en": "Total", ...}), ...],
+      }
+    """
     # Get the constraints
     constraints = dataflow.constraint
 
@@ -22,33 +34,63 @@ def get_dimensions(df: str, lang: str):
     dimensions = []
 
     for constraint in constraints:
-
         # Get the content region included in the constraints
         cr = constraints[constraint].data_content_region[0]
 
         # Get the members of the content region
         dims = cr.member
 
-        # Get rid of REF_AREA because we already know the country
-        dims.pop("REF_AREA", None)
-
         for dim in dims:
+            # We already know the areas of each dataflow
+            if dim.id == "REF_AREA":
+                continue
 
             # Get the codelist for this dimension
             cl = dim.local_representation.enumerated
 
             if cl:
-                # Initialize the dimension objct
-                dimension = {
-                    "dimension": (dim.concept_identity.id, cl.name.localizations[lang]),
-                    "values": [],
-                }
-
+                values = []
                 for value in dims[dim].values:
-                    values = (cl.items[value].name.localizations[lang], value.value)
-                    dimension["values"].append(values)
+                    item = cl.items.get(value.value)
+                    names = item.name.localizations if item else {}
+                    values.append((value.value, dict(names)))
+
+                dimensions.append(
+                    {
+                        "dimension": dim.concept_identity.id,
+                        "codelist": cl.id,
+                        "names": dict(cl.name.localizations),
+                        "values": values,
+                    }
+                )
+
+    return dimensions
+
+
+def get_dimensions(df: str, lang: str):
+    """
+    Retrieve the constrained dimensions of a dataflow from the database.
+
+    Parameters:
+    - df (str): The dataflow code.
+    - lang (str): The language of the labels ('en', 'fr' or 'es').
+
+    Returns:
+    - list[dict]: The dimensions with more than one value, e.g.
+      [{"dimension": ("SEX", "Sex"), "values": [("Total", "SEX_T"), ...]}]
+    """
+    rows = fetch_all(DIMENSIONS, (lang, df))
+
+    # The eventual return value
+    dimensions = []
 
-                dimensions.append(dimension)
+    for dimension_code, dimension_label, value_label, value in rows:
+        # Start a new dimension whenever the dimension changes
+        if not dimensions or dimensions[-1]["dimension"][0] != dimension_code:
+            dimensions.append(
+                {"dimension": (dimension_code, dimension_label), "values": []}
+            )
+        dimensions[-1]["values"].append((value_label, value))
 
     # Then get rid of dimensions with only one value. There's no point in showing them
     # if they don't give the user options to choose from
@@ -1,19 +1,24 @@
-import sqlite3
+import os
+from ._connection import STORE_DIR, connect
+from ._manifest import write_manifest
 
 
-def init_db():
-    """Initialize the database"""
+def init_db(path: str = None):
+    """Initialize the database at path, by default the one the app reads"""
 
     print("Initializing database")
 
-    con = sqlite3.connect("store/ilo-prism.db")
+    con = connect(path)
     cur = con.cursor()
 
     # Initialize the tables from the schema
-    with open("store/schema.sql", "r") as f:
+    with open(os.path.join(STORE_DIR, "schema.sql"), "r") as f:
         schema = f.read()
         cur.executescript(schema)
 
+    # Record that a build has started
+    write_manifest(cur, status="building")
+
     # Commit the transaction
     con.commit()
 
@@ -0,0 +1,130 @@
+import os
+import json
+import sqlite3
+from ._connection import fetch_one
+
+# The tables of the databases built before the schema was versioned. Their
+# metadata is usable as it is; the rest is downloaded by the next refresh.
+BASELINE_TABLES = [
+    "language",
+    "cl_area",
+    "cl_area_name",
+    "dataflow",
+    "dataflow_name",
+    "dataflow_description",
+    "cl_area_dataflow",
+]
+
+# The tables that must have rows for the metadata to be usable
+REQUIRED_TABLES = BASELINE_TABLES + ["dataflow_dimension"]
+
+# The tables whose row counts are recorded in the manifest
+COUNTED_TABLES = REQUIRED_TABLES + [
+    "codelist",
+    "codelist_name",
+    "code",
+    "code_name",
+    "dataflow_dimension_code",
+]
+
+# Seconds after which the metadata is refreshed in the background. Set the
+# ILO_PRISM_METADATA_TTL environment variable to 0 to never refresh automatically.
+METADATA_TTL = float(os.environ.get("ILO_PRISM_METADATA_TTL", 7 * 24 * 60 * 60))
+
+
+def count_rows(
+    cur: sqlite3.Cursor, tables: list[str] = COUNTED_TABLES
+) -> dict[str, int]:
+    """Count the rows of every table recorded in the manifest."""
+    counts = {}
+    for table in tables:
+        cur.execute(f"SELECT COUNT(*) FROM {table}")
+        counts[table] = cur.fetchone()[0]
+    return counts
+
+
+def write_manifest(
+    cur: sqlite3.Cursor, status: str = "complete", tables: list[str] = COUNTED_TABLES
+):
+    """Record the state of the metadata, with the row counts of tables. This
+    should be called in the same transaction as the one that finishes (or
+    starts) a build. Every call gives the data a new build_id."""
+    schema_version = cur.execute("PRAGMA user_version").fetchone()[0]
+    cur.execute(
+        """INSERT INTO metadata_manifest (
+               manifest_uid, schema_version, status, built_at, checked_at,
+               row_counts, build_id
+           ) VALUES(
+               1, ?, ?, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP, ?,
+               lower(hex(randomblob(8)))
+           )
+           ON CONFLICT(manifest_uid) DO UPDATE SET
+               schema_version = excluded.schema_version,
+               status = excluded.status,
+               built_at = excluded.built_at,
+               checked_at = excluded.checked_at,
+               row_counts = excluded.row_counts,
+               build_id = excluded.build_id""",
+        (schema_version, status, json.dumps(count_rows(cur, tables))),
+    )
+
+
+def touch_manifest(cur: sqlite3.Cursor):
+    """Record that the metadata was checked against ILOSTAT and found up to date."""
+    cur.execute(
+        "UPDATE metadata_manifest SET checked_at = CURRENT_TIMESTAMP WHERE manifest_uid = 1"
+    )
+
+
+def read_manifest(con: sqlite3.Connection = None) -> dict | None:
+    """Read the manifest of the metadata with a single primary key lookup, on the
+    read connection of the current thread or on con if given.
+
+    Returns:
+    - dict | None: The schema version, status, build and check timestamps, row
+      counts, build_id and the age of the last check in seconds, or None if the
+      database has no manifest.
+    """
+    sql = """SELECT schema_version, status, built_at, checked_at, row_counts,
+                    build_id, (julianday('now') - julianday(checked_at)) * 86400
+             FROM metadata_manifest WHERE manifest_uid = 1"""
+    try:
+        row = fetch_one(sql) if con is None else con.execute(sql).fetchone()
+    except sqlite3.OperationalError:
+        # The database predates the manifest, or doesn't exist yet
+        return None
+
+    if row is None:
+        return None
+
+    schema_version, status, built_at, checked_at, row_counts, build_id, age = row
+    return {
+        "schema_version": schema_version,
+        "status": status,
+        "built_at": built_at,
+        "checked_at": checked_at,
+        "row_counts": json.loads(row_counts),
+        "build_id": build_id,
+        "age": age,
+    }
+
+
+def manifest_valid(manifest: dict | None, schema_version: int) -> bool:
+    """Check if a manifest describes a complete build for the given schema version
+    in which none of the required tables are empty. The manifests backfilled
+    for databases built before the schema was versioned only count the tables
+    those had, so the other required tables are only checked if counted."""
+    if manifest is None:
+        return False
+    if manifest["status"] != "complete" or manifest["schema_version"] != schema_version:
+        return False
+    counts = manifest["row_counts"]
+    return all(counts.get(table, 0) > 0 for table in BASELINE_TABLES) and all(
+        counts[table] > 0 for table in REQUIRED_TABLES if table in counts
+    )
+
+
+def manifest_stale(manifest: dict, ttl: float | None = METADATA_TTL) -> bool:
+    """Check if the metadata was last checked against ILOSTAT more than ttl
+    seconds ago. A ttl of None or 0 disables the check."""
+    return bool(ttl) and manifest["age"] > ttl
@@ -0,0 +1,210 @@
+import os
+import re
+import sqlite3
+import tempfile
+from functools import cache
+from ._checkpoint import get_completed_stages
+from ._connection import STORE_DIR, connect, connect_read_only, disable_wal
+from ._manifest import BASELINE_TABLES, count_rows, write_manifest
+from ._queries import GETTER_QUERIES
+from ._search import rebuild_search_index
+
+# Directory with the migrations, named like 002_unique_and_covering_indexes.sql
+MIGRATIONS_DIR = os.path.join(STORE_DIR, "migrations")
+
+
+def _add_dataflow_versions(cur: sqlite3.Cursor):
+    """Databases created before dataflows were versioned lack these columns.
+    Their dataflows are then considered outdated by the next refresh."""
+    cur.execute("SELECT name FROM pragma_table_info('dataflow')")
+    columns = {row[0] for row in cur.fetchall()}
+    for column in ["version", "updated"]:
+        if column not in columns:
+            cur.execute(f"ALTER TABLE dataflow ADD COLUMN {column} TEXT")
+
+
+def _backfill_manifest(cur: sqlite3.Cursor):
+    """Databases that were fully ingested before the manifest existed get one,
+    so that they aren't built again from scratch. This runs once the manifest
+    has all of its columns.
+
+    The manifest only counts the tables those databases had. Their dataflows
+    are left without versions, and the manifest is marked as checked long ago,
+    so that the next refresh downloads the constraints they lack."""
+    cur.execute("SELECT COUNT(*) FROM metadata_manifest")
+    if cur.fetchone()[0] > 0:
+        return
+    counts = count_rows(cur, BASELINE_TABLES)
+    # Migration 1 gives baseline databases an empty checkpoint table, so only
+    # a build that completed some stages but not the last one is unfinished
+    completed_stages = get_completed_stages(cur)
+    incomplete = bool(completed_stages) and "cl_area_dataflow" not in completed_stages
+    if all(counts[table] > 0 for table in BASELINE_TABLES) and not incomplete:
+        cur.execute("UPDATE dataflow SET version = NULL, updated = NULL")
+        write_manifest(cur, tables=BASELINE_TABLES)
+        cur.execute("UPDATE metadata_manifest SET checked_at = '1970-01-01 00:00:00'")
+
+
+# Python steps that run after the SQL of the migration with the same version
+HOOKS = {
+    1: _add_dataflow_versions,
+    4: _backfill_manifest,
+    5: rebuild_search_index,
+}
+
+
+def get_migrations() -> list[tuple[int, str]]:
+    """Return the version and path of each migration, in order."""
+    migrations = []
+    for filename in os.listdir(MIGRATIONS_DIR):
+        match = re.match(r"(\d+)_.*\.sql$", filename)
+        if match:
+            migrations.append(
+                (int(match.group(1)), os.path.join(MIGRATIONS_DIR, filename))
+            )
+    return sorted(migrations)
+
+
+@cache
+def latest_version() -> int:
+    """Return the version of the schema that the migrations lead to."""
+    return get_migrations()[-1][0]
+
+
+def split_statements(script: str) -> list[str]:
+    """Split an SQL script into its statements so that they can run inside a
+    single transaction, which executescript() doesn't allow."""
+    statements = []
+    statement = ""
+    for line in script.splitlines(keepends=True):
+        statement += line
+        if sqlite3.complete_statement(statement):
+            statements.append(statement.strip())
+            statement = ""
+    return statements
+
+
+def _sync_manifest(cur: sqlite3.Cursor, version: int):
+    """Migrations upgrade the metadata in place, so it stays valid for the new
+    version of the schema."""
+    cur.execute(
+        "SELECT COUNT(*) FROM sqlite_master WHERE type='table' AND name='metadata_manifest'"
+    )
+    if cur.fetchone()[0] == 1:
+        cur.execute("UPDATE metadata_manifest SET schema_version = ?", (version,))
+
+
+def migrate_db(path: str = None):
+    """Upgrade the database in place to the latest version of the schema. The
+    version of the database is kept in PRAGMA user_version and each pending
+    migration runs in its own transaction."""
+
+    # Manage the transactions explicitly
+    con = connect(path, isolation_level=None)
+    cur = con.cursor()
+
+    try:
+        disable_wal(con)
+
+        version = cur.execute("PRAGMA user_version").fetchone()[0]
+
+        for target, migration in get_migrations():
+            if target <= version:
+                continue
+
+            print(f"Migrating database to version {target}")
+
+            with open(migration, "r") as f:
+                statements = split_statements(f.read())
+
+            cur.execute("BEGIN")
+            try:
+                for statement in statements:
+                    cur.execute(statement)
+                if target in HOOKS:
+                    HOOKS[target](cur)
+                cur.execute(f"PRAGMA user_version = {target}")
+                _sync_manifest(cur, target)
+                cur.execute("COMMIT")
+            except Exception:
+                cur.execute("ROLLBACK")
+                raise
+
+            version = target
+    finally:
+        con.close()
+
+
+def describe_schema(con: sqlite3.Connection) -> dict:
+    """Describe the columns, uniqueness constraints and indexes of every table,
+    regardless of how the SQL that created them is formatted."""
+    cur = con.cursor()
+    cur.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'"
+    )
+    schema = {}
+    for (table,) in cur.fetchall():
+        columns = cur.execute(
+            'SELECT name, type, "notnull", pk FROM pragma_table_info(?)', (table,)
+        ).fetchall()
+        indexes = set()
+        for _, index, unique, origin, _ in cur.execute(
+            "SELECT * FROM pragma_index_list(?)", (table,)
+        ).fetchall():
+            index_columns = cur.execute(
+                "SELECT name FROM pragma_index_info(?) ORDER BY seqno", (index,)
+            ).fetchall()
+            # Constraints get generated index names, so only their columns matter
+            name = index if origin == "c" else origin
+            indexes.add((name, unique, tuple(c[0] for c in index_columns)))
+        schema[table] = (sorted(columns), sorted(indexes))
+    return schema
+
+
+def check_schema():
+    """Assert that migrating an empty database leads to the same schema as
+    store/schema.sql, so that the two never drift apart."""
+    fresh = sqlite3.connect(":memory:")
+    with open(os.path.join(STORE_DIR, "schema.sql"), "r") as f:
+        fresh.executescript(f.read())
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "check-migrations.db")
+        migrate_db(path)
+        migrated = sqlite3.connect(path)
+        assert describe_schema(fresh) == describe_schema(
+            migrated
+        ), "store/schema.sql and store/migrations lead to different schemas"
+        version = migrated.execute("PRAGMA user_version").fetchone()[0]
+        migrated.close()
+
+    assert (
+        version == fresh.execute("PRAGMA user_version").fetchone()[0]
+    ), "store/schema.sql doesn't set the latest user_version"
+
+
+def check_query_plans(path: str = None):
+    """Assert that the query of every ILOStat getter is answered through indexes
+    instead of scanning a table."""
+    con = connect_read_only(path)
+    cur = con.cursor()
+    try:
+        for getter, (query, params) in GETTER_QUERIES.items():
+            plan = cur.execute(f"EXPLAIN QUERY PLAN {query}", params).fetchall()
+            details = [row[-1] for row in plan]
+            # Full-text queries show up as scans of the virtual table, using its index
+            scans = [
+                detail
+                for detail in details
+                if detail.startswith("SCAN") and "VIRTUAL TABLE" not in detail
+            ]
+            assert not scans, f"{getter} scans a table: {details}"
+    finally:
+        con.close()
+
+
+if __name__ == "__main__":
+    check_schema()
+    migrate_db()
+    check_query_plans()
+    print("Schema, migrations and query plans are consistent")
@@ -0,0 +1,112 @@
+import os
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from ._dimensions import get_dimensions
+from ._registry import get_registry
+from .area_dimensions import get_area_values, merge_area_dimensions
+
+# Threads that run the blocking steps of the pipelines: SQLite lookups, requests
+# to the API and parsing
+PIPELINE_WORKERS = int(os.environ.get("ILO_PRISM_PIPELINE_WORKERS", 8))
+
+# The threads shared by every pipeline of the process, created on first use
+_executor = None
+_lock = threading.Lock()
+
+
+def _run_blocking(fn, *args):
+    """Run a blocking step in the threads of the pipelines."""
+    global _executor
+    if _executor is None:
+        with _lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    PIPELINE_WORKERS, thread_name_prefix="ilo-prism-pipeline"
+                )
+    return asyncio.get_running_loop().run_in_executor(_executor, fn, *args)
+
+
+async def resolve_area_dimensions(
+    area: str, dataflow: str, lang: str, structure=None
+) -> list:
+    """
+    Resolve the dimension values and years that a dataflow has for an area. The
+    stored dimensions of the dataflow are looked up while its structure is
+    fetched, and that one structure is used to request and parse the data of
+    the area.
+
+    Parameters:
+    - area (str): The country/area code (e.g., "ITA").
+    - dataflow (str): The dataflow code.
+    - lang (str): The language of the labels ('en', 'fr' or 'es').
+    - structure: An awaitable of the DataflowStructure of the dataflow, if it's
+      already being fetched, e.g. for another area.
+
+    Returns:
+    - list: The dimensions of get_dimensions() that the area has, followed by
+      its TIME_PERIOD values.
+    """
+    if structure is None:
+        structure = _run_blocking(get_registry().get, dataflow)
+
+    all_dimensions, structure = await asyncio.gather(
+        _run_blocking(get_dimensions, dataflow, lang), structure
+    )
+    area_dimensions = await _run_blocking(
+        get_area_values, area, dataflow, structure.dsd
+    )
+    return merge_area_dimensions(all_dimensions, area_dimensions)
+
+
+async def resolve_many_area_dimensions(
+    selections: list[tuple[str, str]], lang: str
+) -> list:
+    """
+    Resolve the dimensions of several areas and dataflows at once. The structure
+    of each dataflow is fetched only once, however many areas ask for it.
+
+    Parameters:
+    - selections (list[tuple[str, str]]): (area, dataflow) pairs, e.g.
+      [("ITA", "DF_UNE_2EAP_SEX_AGE_RT"), ("FRA", "DF_UNE_2EAP_SEX_AGE_RT")]
+    - lang (str): The language of the labels ('en', 'fr' or 'es').
+
+    Returns:
+    - list: The dimensions of each pair, in the same order, or the exception
+      raised while resolving them.
+    """
+    structures = {}
+    for _, dataflow in selections:
+        if dataflow not in structures:
+            structures[dataflow] = asyncio.ensure_future(
+                _run_blocking(get_registry().get, dataflow)
+            )
+
+    return await asyncio.gather(
+        *[
+            resolve_area_dimensions(area, dataflow, lang, structures[dataflow])
+            for area, dataflow in selections
+        ],
+        return_exceptions=True,
+    )
+
+
+def run_pipeline(coroutine):
+    """
+    Run a pipeline to completion from synchronous code, e.g. a Gradio worker
+    thread. If the calling thread already runs an event loop, the pipeline runs
+    in a loop of its own in another thread rather than blocking it.
+
+    Parameters:
+    - coroutine: The pipeline, e.g. resolve_area_dimensions("ITA", ...).
+
+    Returns:
+    - The result of the pipeline.
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coroutine)
+
+    with ThreadPoolExecutor(1) as executor:
+        return executor.submit(asyncio.run, coroutine).result()
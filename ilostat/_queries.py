@@ -0,0 +1,189 @@
+# The SQL queries behind the ILOStat metadata getters. They are kept in one place
+# so that their query plans can be checked against the indexes of the schema.
+
+# The names and codes of all areas in a language
+AREAS = """
+    SELECT cn.name, ca.code
+    FROM cl_area AS ca
+    JOIN cl_area_name AS cn ON ca.cl_area_uid = cn.cl_area_uid
+    JOIN language AS l ON cn.language_uid = l.language_uid
+    WHERE l.code = ?
+    """
+
+# The name of an area in a language
+AREA_LABEL = """
+    SELECT cn.name
+    FROM cl_area AS ca
+    JOIN cl_area_name AS cn ON ca.cl_area_uid = cn.cl_area_uid
+    JOIN language AS l ON cn.language_uid = l.language_uid
+    WHERE l.code = ? AND ca.code = ?;
+    """
+
+# The names and codes of the dataflows of an area in a language
+DATAFLOWS = """
+    SELECT dn.name, d.code
+    FROM cl_area AS ca
+    JOIN cl_area_dataflow AS cad ON ca.cl_area_uid = cad.cl_area_uid
+    JOIN dataflow AS d ON cad.dataflow_uid = d.dataflow_uid
+    JOIN dataflow_name AS dn ON d.dataflow_uid = dn.dataflow_uid
+    JOIN language AS l ON dn.language_uid = l.language_uid
+    WHERE ca.code = ? AND l.code = ?
+    ORDER BY dn.name ASC;
+    """
+
+# The name of a dataflow in a language
+DATAFLOW_LABEL = """
+    SELECT dn.name
+    FROM dataflow AS d
+    JOIN dataflow_name AS dn ON d.dataflow_uid = dn.dataflow_uid
+    JOIN language AS l ON dn.language_uid = l.language_uid
+    WHERE d.code = ? AND l.code = ?
+    """
+
+# The description of a dataflow in a language
+DATAFLOW_DESCRIPTION = """
+    SELECT dd.description
+    FROM dataflow AS d
+    JOIN dataflow_description AS dd ON d.dataflow_uid = dd.dataflow_uid
+    JOIN language AS l ON dd.language_uid = l.language_uid
+    WHERE d.code = ? AND l.code = ?
+    """
+
+# The version of a dataflow, which changes along with its structure
+DATAFLOW_VERSION = "SELECT version FROM dataflow WHERE code = ?"
+
+# The constrained dimensions of a dataflow and the labels of their codes in a language
+DIMENSIONS = """
+    SELECT dd.dimension,
+           COALESCE(cln.name, cl.code),
+           COALESCE(cn.name, c.code),
+           c.code
+    FROM dataflow AS d
+    JOIN dataflow_dimension AS dd ON d.dataflow_uid = dd.dataflow_uid
+    JOIN codelist AS cl ON dd.codelist_uid = cl.codelist_uid
+    JOIN dataflow_dimension_code AS ddc
+        ON dd.dataflow_dimension_uid = ddc.dataflow_dimension_uid
+    JOIN code AS c ON ddc.code_uid = c.code_uid
+    JOIN language AS l ON l.code = ?
+    LEFT JOIN codelist_name AS cln
+        ON cl.codelist_uid = cln.codelist_uid AND cln.language_uid = l.language_uid
+    LEFT JOIN code_name AS cn
+        ON c.code_uid = cn.code_uid AND cn.language_uid = l.language_uid
+    WHERE d.code = ?
+    ORDER BY dd.position, ddc.position
+    """
+
+# The names of some codelists in a language. The codelists are passed as a JSON
+# array, e.g. '["CL_SEX", "CL_AGE_YTHADULT"]', so that any number of them can be
+# looked up with one query.
+CODELIST_LABELS = """
+    SELECT cl.code, COALESCE(cln.name, cl.code)
+    FROM codelist AS cl
+    JOIN language AS l ON l.code = ?
+    LEFT JOIN codelist_name AS cln
+        ON cl.codelist_uid = cln.codelist_uid AND cln.language_uid = l.language_uid
+    WHERE cl.code IN (SELECT value FROM json_each(?))
+    """
+
+# The labels of all codes of some codelists in a language, with the codelists
+# passed as a JSON array
+CODE_LABELS = """
+    SELECT cl.code, c.code, COALESCE(cn.name, c.code)
+    FROM codelist AS cl
+    JOIN code AS c ON cl.codelist_uid = c.codelist_uid
+    JOIN language AS l ON l.code = ?
+    LEFT JOIN code_name AS cn
+        ON c.code_uid = cn.code_uid AND cn.language_uid = l.language_uid
+    WHERE cl.code IN (SELECT value FROM json_each(?))
+    """
+
+# The dataflows of an area whose name or description match a full-text query in a
+# language, best matches first. Matches in the name weigh more.
+SEARCH_DATAFLOWS = """
+    SELECT s.name, d.code
+    FROM dataflow_search AS s
+    JOIN dataflow AS d ON s.dataflow_uid = d.dataflow_uid
+    JOIN cl_area_dataflow AS cad ON d.dataflow_uid = cad.dataflow_uid
+    JOIN cl_area AS ca ON cad.cl_area_uid = ca.cl_area_uid
+    WHERE dataflow_search MATCH ? AND s.language = ? AND ca.code = ?
+    ORDER BY bm25(dataflow_search, 10.0, 1.0)
+    LIMIT ?
+    """
+
+# The dataflows whose name or description match a full-text query in a language
+SEARCH_ALL_DATAFLOWS = """
+    SELECT s.name, d.code
+    FROM dataflow_search AS s
+    JOIN dataflow AS d ON s.dataflow_uid = d.dataflow_uid
+    WHERE dataflow_search MATCH ? AND s.language = ?
+    ORDER BY bm25(dataflow_search, 10.0, 1.0)
+    LIMIT ?
+    """
+
+# The areas whose name matches a full-text query in a language
+SEARCH_AREAS = """
+    SELECT s.name, ca.code
+    FROM area_search AS s
+    JOIN cl_area AS ca ON s.cl_area_uid = ca.cl_area_uid
+    WHERE area_search MATCH ? AND s.language = ?
+    ORDER BY rank
+    LIMIT ?
+    """
+
+# Every getter query with example parameters, used to check their query plans
+GETTER_QUERIES = {
+    "get_areas": (AREAS, ("en",)),
+    "get_area_label": (AREA_LABEL, ("en", "X01")),
+    "get_dataflows": (DATAFLOWS, ("X01", "en")),
+    "get_dataflow_label": (DATAFLOW_LABEL, ("DF_UNE_2EAP_SEX_AGE_RT", "en")),
+    "get_dataflow_description": (
+        DATAFLOW_DESCRIPTION,
+        ("DF_UNE_2EAP_SEX_AGE_RT", "en"),
+    ),
+    "get_dataflow_version": (DATAFLOW_VERSION, ("DF_UNE_2EAP_SEX_AGE_RT",)),
+    "get_dimensions": (DIMENSIONS, ("en", "DF_UNE_2EAP_SEX_AGE_RT")),
+    "search_dataflows": (SEARCH_DATAFLOWS, ('"unemp"*', "en", "X01", 10)),
+    "search_all_dataflows": (SEARCH_ALL_DATAFLOWS, ('"unemp"*', "en", 10)),
+    "search_areas": (SEARCH_AREAS, ('"fra"*', "en", 10)),
+    "get_codelist_labels": (CODELIST_LABELS, ("en", '["CL_SEX", "CL_AGE"]')),
+    "get_code_labels": (CODE_LABELS, ("en", '["CL_SEX", "CL_AGE"]')),
+}
+
+# The queries that load the in-memory snapshot of the metadata, in every language
+# at once. See ilostat/_snapshot.py
+
+# The identifier of the data in the database
+SNAPSHOT_BUILD_ID = "SELECT build_id FROM metadata_manifest WHERE manifest_uid = 1"
+
+# The names of all areas
+SNAPSHOT_AREAS = """
+    SELECT l.code, ca.code, cn.name
+    FROM cl_area AS ca
+    JOIN cl_area_name AS cn ON ca.cl_area_uid = cn.cl_area_uid
+    JOIN language AS l ON cn.language_uid = l.language_uid
+    ORDER BY ca.cl_area_uid
+    """
+
+# The names of all dataflows
+SNAPSHOT_DATAFLOW_NAMES = """
+    SELECT l.code, d.code, dn.name
+    FROM dataflow AS d
+    JOIN dataflow_name AS dn ON d.dataflow_uid = dn.dataflow_uid
+    JOIN language AS l ON dn.language_uid = l.language_uid
+    """
+
+# The descriptions of all dataflows
+SNAPSHOT_DATAFLOW_DESCRIPTIONS = """
+    SELECT l.code, d.code, dd.description
+    FROM dataflow AS d
+    JOIN dataflow_description AS dd ON d.dataflow_uid = dd.dataflow_uid
+    JOIN language AS l ON dd.language_uid = l.language_uid
+    """
+
+# The dataflows of every area
+SNAPSHOT_AREA_DATAFLOWS = """
+    SELECT ca.code, d.code
+    FROM cl_area_dataflow AS cad
+    JOIN cl_area AS ca ON cad.cl_area_uid = ca.cl_area_uid
+    JOIN dataflow AS d ON cad.dataflow_uid = d.dataflow_uid
+    """
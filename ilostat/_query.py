@@ -1,6 +1,34 @@
-from typing import Literal
-import sdmx
-from ._result import ILOStatQueryResult
+import io
+import os
+from typing import Iterator, Literal
+import pandas as pd
+import requests
+from ._client import get_client
+from ._codelist import get_codelist_labels
+from ._registry import get_registry
+from ._result import ILOStatQueryResult, format_dataframe
+from ._singleflight import get_flight
+from ._stream import iter_observations
+
+# Rows in each DataFrame that iter_data() yields
+CHUNK_SIZE = 10_000
+
+# Bytes read from the API at a time by iter_data()
+READ_SIZE = 64 * 1024
+
+# How data() asks for data: "sdmx-ml", parsed by sdmx, or "csv", SDMX-CSV
+# parsed by pandas, which is faster, with SDMX-ML as the fallback
+DATA_FORMAT = os.environ.get("ILO_PRISM_DATA_FORMAT", "sdmx-ml")
+
+# The media type of SDMX-CSV, with codes rather than labels, since the labels
+# are looked up locally in the language of the query
+CSV_ACCEPT = "application/vnd.sdmx.data+csv;version=1.0.0;labels=id"
+
+# Statuses of the API when it doesn't serve SDMX-CSV
+CSV_UNSUPPORTED = [406, 415, 501]
+
+# Cleared the first time the API doesn't serve SDMX-CSV
+_csv_supported = True
 
 
 class ILOStatQuery:
@@ -10,6 +38,7 @@ class ILOStatQuery:
         dimensions: dict[str, str],
         params: dict[str, str],
         language: Literal["en", "fr", "es"] = "en",
+        data_format: Literal["sdmx-ml", "csv"] = DATA_FORMAT,
     ):
         """
         Initialize an ILOStatQuery instance with specific dataflow, dimensions,
@@ -20,19 +49,18 @@ class ILOStatQuery:
             dimensions (dict[str, str]): Mapping of dimension IDs to specific values.
             params (dict[str, str]): Additional parameters for data filtering.
             language (Literal): Language code for localized names ("en", "fr", or "es").
+            data_format (Literal): How data() asks for data, "sdmx-ml" or "csv".
         """
         self.dataflow = dataflow
         self.dimensions = dimensions
         self.params = params
-        self._ilostat = sdmx.Client(
-            "ILO",
-            backend="sqlite",
-            fast_save=True,
-            expire_after=600,
-        )  # Initialize SDMX client for ILO data
+        # Shared SDMX client for ILO data, whose responses are cached
+        self._ilostat = get_client(cached=True)
         self.language = language
+        self.data_format = data_format
 
         # Internal attributes to store metadata, multiplier, and code list mappings
+        self._structure = None
         self._dsd = None
         self._codelist = None
         self._multiplier = 0
@@ -48,20 +76,119 @@ class ILOStatQuery:
         self._url = url
 
     def _set_dsd(self):
-        """Retrieve and set the data structure definition (DSD) for the specified dataflow."""
-        df_msg = self._ilostat.dataflow(self.dataflow)
-        df_flow = df_msg.dataflow[self.dataflow]
-        self._dsd = df_flow.structure  # Assign the DSD structure to self._dsd
+        """Retrieve and set the data structure definition (DSD) for the specified
+        dataflow. It's parsed once per dataflow and kept by the DSD registry, so
+        repeated queries don't download it again."""
+        self._structure = get_registry().get(self.dataflow)
+        self._dsd = self._structure.dsd  # Assign the DSD structure to self._dsd
 
     def _set_codelist(self):
-        """Populate the code list with readable names for each dimension component."""
+        """Populate the code list with readable names for each dimension component.
+        The labels are looked up in the database all at once; codelists that
+        aren't stored there are read from the DSD instead."""
+        # Map each dimension ID to its code list
+        enumerated = self._structure.codelists
+
+        labels = get_codelist_labels(
+            [cl.id for cl in enumerated.values() if cl is not None], self.language
+        )
+
         codelist = {}
-        for dim in self._dsd.dimensions.components:
-            dim_id = dim.id
-            dim_name = self._dsd.dimensions.get(dim_id).local_representation.enumerated
-            codelist[dim_id] = dim_name  # Map each dimension ID to its code list
+        for dim_id, cl in enumerated.items():
+            if cl is None:
+                codelist[dim_id] = None
+            elif cl.id in labels:
+                codelist[dim_id] = labels[cl.id]
+            else:
+                codelist[dim_id] = {
+                    "name": cl.name.localizations.get(self.language, cl.id),
+                    "codes": {
+                        code: item.name.localizations.get(self.language, code)
+                        for code, item in cl.items.items()
+                    },
+                }
         self._codelist = codelist
 
+    @property
+    def request_key(self) -> tuple:
+        """The canonical form of the request of the query, the same for queries
+        that ask for the same data, e.g. with their dimensions or their codes
+        in another order."""
+        dimensions = {
+            dim: "+".join(sorted(str(value).split("+")))
+            for dim, value in (self.dimensions or {}).items()
+        }
+        return (
+            self.dataflow,
+            tuple(sorted(dimensions.items())),
+            tuple(sorted((self.params or {}).items())),
+        )
+
+    def _fetch(self):
+        """Request the data of the query and parse it."""
+        return self._ilostat.data(
+            self.dataflow,
+            dsd=self._dsd,
+            key=self.dimensions,
+            params=self.params or {},
+        )
+
+    def _prepare(self) -> requests.PreparedRequest:
+        """Prepare the request of the query without sending it."""
+        return self._ilostat.get(
+            "data",
+            self.dataflow,
+            dsd=self._dsd,
+            key=self.dimensions,
+            params=self.params or {},
+            dry_run=True,
+        )
+
+    def _fetch_csv(self) -> requests.Response:
+        """Request the data of the query as SDMX-CSV."""
+        request = self._prepare()
+        request.headers["Accept"] = CSV_ACCEPT
+        response = self._ilostat.session.send(request)
+        response.raise_for_status()
+        return response
+
+    def _csv_data(self) -> ILOStatQueryResult | None:
+        """Fetch and parse the data of the query as SDMX-CSV. Returns None if
+        the API doesn't serve it, so that it's fetched as SDMX-ML instead."""
+        global _csv_supported
+
+        try:
+            response = get_flight("data").do(
+                ("csv", *self.request_key), self._fetch_csv
+            )
+        except requests.HTTPError as e:
+            status = e.response.status_code if e.response is not None else None
+            if status in CSV_UNSUPPORTED:
+                _csv_supported = False
+            if status is not None and status < 500:
+                # E.g. no data; answered the way SDMX-ML is
+                return None
+            raise
+
+        # The API may ignore the Accept header and send SDMX-ML anyway
+        if "csv" not in response.headers.get("Content-Type", ""):
+            _csv_supported = False
+            return None
+
+        try:
+            result = ILOStatQueryResult.from_csv(
+                io.BytesIO(response.content),
+                [dim.id for dim in self._dsd.dimensions.components],
+                codelist=self._codelist,
+                language=self.language,
+            )
+        except (ValueError, pd.errors.ParserError) as e:
+            print(f"Error: the SDMX-CSV of {self.dataflow} can't be read: {e}")
+            return None
+
+        self._set_url(response.url)
+        return result
+
     def data(self) -> ILOStatQueryResult:
         """
         Fetch and return data as a Pandas DataFrame, with human-readable names
@@ -70,13 +197,16 @@ class ILOStatQuery:
         Returns:
             pd.DataFrame: DataFrame containing the queried data with formatted values.
         """
-        # Retrieve the dataflow message based on specified dimensions and parameters
-        data_msg = self._ilostat.data(
-            self.dataflow,
-            dsd=self._dsd,
-            key=self.dimensions,
-            params=self.params,
-        )
+        # Try the faster SDMX-CSV first, if asked to
+        if self.data_format == "csv" and _csv_supported:
+            result = self._csv_data()
+            if result is not None:
+                return result
+
+        # Retrieve the dataflow message based on specified dimensions and
+        # parameters. Identical queries made at the same time, e.g. by users
+        # opening the app on the default selection, share one request.
+        data_msg = get_flight("data").do(self.request_key, self._fetch)
 
         # Remember the URL for the most recent query
         self._set_url(data_msg.response.url)
@@ -92,6 +222,54 @@ class ILOStatQuery:
         # Return the object as the result
         return result
 
+    def iter_data(self, chunk_size: int = CHUNK_SIZE) -> Iterator[pd.DataFrame]:
+        """
+        Fetch the data like data(), but parse it as it's downloaded and yield it
+        in DataFrames of at most chunk_size rows, so that memory stays bounded
+        however much data the query asks for, e.g. every area and every year.
+        The response isn't cached or shared with other queries.
+
+        Args:
+            chunk_size (int): The most rows in each DataFrame.
+
+        Returns:
+            Iterator[pd.DataFrame]: DataFrames formatted like the one of data().
+        """
+        request = self._prepare()
+        self._set_url(request.url)
+
+        # The columns of the dimensions, in the order of the DSD
+        dimensions = [dim.id for dim in self._dsd.dimensions.components]
+
+        with self._ilostat.session.send(request, stream=True) as response:
+            response.raise_for_status()
+
+            rows = []
+            multipliers = []
+            decimals = []
+            for observation in iter_observations(response.iter_content(READ_SIZE)):
+                rows.append(
+                    [observation.get(dim) for dim in dimensions]
+                    + [float(observation.get("OBS_VALUE", "nan"))]
+                )
+                multipliers.append(int(observation.get("UNIT_MULT", 0)))
+                places = observation.get("DECIMALS")
+                decimals.append(None if places is None else int(places))
+
+                if len(rows) == chunk_size:
+                    yield self._format_chunk(rows, dimensions, multipliers, decimals)
+                    rows, multipliers, decimals = [], [], []
+
+            if rows:
+                yield self._format_chunk(rows, dimensions, multipliers, decimals)
+
+    def _format_chunk(
+        self, rows: list, dimensions: list[str], multipliers: list, decimals: list
+    ) -> pd.DataFrame:
+        """Turn rows of observations into a DataFrame formatted like data()'s."""
+        df = pd.DataFrame(rows, columns=dimensions + ["value"])
+        return format_dataframe(df, self._codelist, multipliers, decimals)
+
     @property
     def url(self):
         """Return the URL for the most recent query. Only available after calling data()."""
@@ -99,7 +277,8 @@ class ILOStatQuery:
 
     @property
     def codelist(self):
-        """Return the code list with human-readable names for each dimension."""
+        """Return the code list with human-readable names for each dimension, e.g.
+        {"SEX": {"name": "Sex", "codes": {"SEX_T": "Total", ...}}, ...}"""
         return self._codelist
 
 
@@ -0,0 +1,259 @@
+import os
+import time
+import threading
+
+# Requests per second sent to the ILOSTAT API by the whole process, on average,
+# and the number that can be sent at once after a quiet spell
+RATE = float(os.environ.get("ILO_PRISM_RATE", 10))
+BURST = float(os.environ.get("ILO_PRISM_RATE_BURST", 20))
+
+# Bounds of the number of requests in flight at the same time. The limiter
+# starts halfway and adapts: it adds a request for every window of healthy
+# responses, and halves when the API throttles, fails or slows down.
+MIN_CONCURRENCY = 1
+MAX_CONCURRENCY = int(os.environ.get("ILO_PRISM_MAX_CONCURRENCY", 16))
+
+# A response this many times slower than the average is a sign of overload
+LATENCY_SPIKE = 3.0
+
+# Responses to see before latency spikes are looked for
+LATENCY_SAMPLES = 20
+
+# Weight of each response in the moving average of latency
+LATENCY_WEIGHT = 0.05
+
+# Seconds after halving before halving again, until the average latency is
+# known. After that, the limit is halved at most once per average latency, so
+# that the failures of the requests that were already in flight count once.
+DECREASE_INTERVAL = 1.0
+
+# Priorities of requests. Interactive requests, made on behalf of users, go
+# first; bulk ones, e.g. the ingestion, leave them the last free slot. When the
+# limit is down to a single request, bulk ones only take it if no interactive
+# request was made in the last INTERACTIVE_GRACE seconds.
+INTERACTIVE = "interactive"
+BULK = "bulk"
+
+# Seconds after an interactive request was made or sent during which users are
+# taken to be active, since they tend to make several requests in a row
+INTERACTIVE_GRACE = 5.0
+
+
+def parse_retry_after(value: str | None) -> float | None:
+    """The seconds of a Retry-After header, if it gives any."""
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        return None
+
+
+class RateLimiter:
+    """A process-wide limiter of the requests to the API: a token bucket that
+    sets their pace, and a limit on the requests in flight that adapts to the
+    API's health by additive increase and multiplicative decrease (AIMD)."""
+
+    def __init__(
+        self,
+        rate: float = RATE,
+        burst: float = BURST,
+        max_concurrency: int = MAX_CONCURRENCY,
+    ):
+        self.rate = rate
+        self.burst = burst
+        self.max_concurrency = max(MIN_CONCURRENCY, max_concurrency)
+        self.limit = max(MIN_CONCURRENCY, self.max_concurrency / 2)
+
+        self._tokens = burst
+        self._updated = time.monotonic()
+        self._in_flight = 0
+        self._waiting = {INTERACTIVE: 0, BULK: 0}
+        self._last_interactive = float("-inf")
+        self._paused_until = 0.0
+        self._latency = None
+        self._samples = 0
+        self._last_decrease = 0.0
+        self._cond = threading.Condition()
+        self._stats = {
+            "requests": 0,
+            "interactive": 0,
+            "bulk": 0,
+            "throttled": 0,
+            "failures": 0,
+            "latency_spikes": 0,
+            "decreases": 0,
+            "waited": 0.0,
+        }
+
+    def _refill(self, now: float):
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def _wait_time(self, priority: str, now: float) -> float | None:
+        """Seconds to wait before a request can be sent, 0 if it can be sent
+        now, or None to wait until a request in flight is done."""
+        if now < self._paused_until:
+            return self._paused_until - now
+
+        slots = int(self.limit)
+        if priority == BULK:
+            if self._waiting[INTERACTIVE]:
+                return None
+            if slots > MIN_CONCURRENCY:
+                slots -= 1
+            else:
+                # The only slot goes to bulk requests once users are idle
+                idle_in = self._last_interactive + INTERACTIVE_GRACE - now
+                if idle_in > 0:
+                    return idle_in
+        if self._in_flight >= slots:
+            return None
+
+        if self._tokens < 1:
+            return (1 - self._tokens) / self.rate
+        return 0
+
+    def acquire(self, priority: str = INTERACTIVE):
+        """
+        Wait until a request can be sent, then count it as in flight. Every
+        acquire() must be followed by a release().
+
+        Parameters:
+        - priority (str): INTERACTIVE or BULK.
+        """
+        started = time.monotonic()
+        with self._cond:
+            if priority == INTERACTIVE:
+                self._last_interactive = started
+            self._waiting[priority] += 1
+            try:
+                while True:
+                    now = time.monotonic()
+                    self._refill(now)
+                    wait = self._wait_time(priority, now)
+                    if wait == 0:
+                        break
+                    self._cond.wait(wait)
+            finally:
+                self._waiting[priority] -= 1
+
+            self._tokens -= 1
+            self._in_flight += 1
+            if priority == INTERACTIVE:
+                self._last_interactive = time.monotonic()
+            self._stats["requests"] += 1
+            self._stats[priority] += 1
+            self._stats["waited"] += time.monotonic() - started
+
+            # Bulk requests may have been waiting for this one to go first
+            if priority == INTERACTIVE and self._waiting[BULK]:
+                self._cond.notify_all()
+
+    def release(
+        self,
+        latency: float,
+        status: int = None,
+        failed: bool = False,
+        retry_after: float = None,
+    ):
+        """
+        Count a request as done, and adapt the limit to how it went.
+
+        Parameters:
+        - latency (float): Seconds the API took to respond.
+        - status (int): The HTTP status of the response, if there's one.
+        - failed (bool): Whether the request failed without a response, e.g.
+          with a timeout.
+        - retry_after (float): Seconds the API asked to wait before retrying.
+        """
+        with self._cond:
+            now = time.monotonic()
+            self._in_flight -= 1
+
+            if status == 429 or (status is not None and status >= 500) or failed:
+                self._stats["failures" if failed else "throttled"] += 1
+                if retry_after:
+                    self._paused_until = max(self._paused_until, now + retry_after)
+                self._decrease(now)
+            elif (
+                self._samples >= LATENCY_SAMPLES
+                and latency > LATENCY_SPIKE * self._latency
+            ):
+                self._stats["latency_spikes"] += 1
+                self._decrease(now)
+            else:
+                # Add one request to the limit for every limit healthy responses
+                self.limit = min(self.max_concurrency, self.limit + 1 / self.limit)
+
+            if status is not None and status < 500:
+                self._samples += 1
+                self._latency = (
+                    latency
+                    if self._latency is None
+                    else self._latency + LATENCY_WEIGHT * (latency - self._latency)
+                )
+
+            self._cond.notify_all()
+
+    def _decrease(self, now: float):
+        interval = DECREASE_INTERVAL if self._latency is None else self._latency
+        if now - self._last_decrease >= interval:
+            self.limit = max(MIN_CONCURRENCY, self.limit / 2)
+            self._last_decrease = now
+            self._stats["decreases"] += 1
+
+    def stats(self) -> dict:
+        """
+        Return the counters of the limiter since the process started.
+
+        Returns:
+        - dict: The requests sent, by priority, the throttled and failed ones,
+          latency spikes, decreases of the limit and seconds spent waiting,
+          with the current limit, requests in flight and average latency.
+        """
+        with self._cond:
+            return {
+                **self._stats,
+                "limit": round(self.limit, 2),
+                "in_flight": self._in_flight,
+                "latency": self._latency,
+            }
+
+
+# The limiter shared by every SDMX client of the process
+_limiter = None
+_lock = threading.Lock()
+
+
+def get_limiter() -> RateLimiter:
+    """Return the rate limiter of the process, creating it on first use."""
+    global _limiter
+    if _limiter is None:
+        with _lock:
+            if _limiter is None:
+                _limiter = RateLimiter()
+    return _limiter
+
+
+def configure_limiter(
+    rate: float = None, burst: float = None, max_concurrency: int = None
+):
+    """
+    Replace the rate limiter of the process with one with new settings. The
+    settings that aren't given keep their current values. Requests already
+    waiting keep waiting on the old limiter.
+
+    Parameters:
+    - rate (float): Requests per second, on average.
+    - burst (float): Requests that can be sent at once after a quiet spell.
+    - max_concurrency (int): The most requests in flight at the same time.
+    """
+    global _limiter
+    with _lock:
+        current = _limiter or RateLimiter()
+        _limiter = RateLimiter(
+            rate=current.rate if rate is None else rate,
+            burst=current.burst if burst is None else burst,
+            max_concurrency=(
+                current.max_concurrency if max_concurrency is None else max_concurrency
+            ),
+        )
@@ -0,0 +1,254 @@
+import os
+import time
+import sqlite3
+import threading
+from ._client import get_client
+from ._connection import READ_ONLY, connect
+from ._area import get_cl_areas
+from ._area_dataflow import DEFAULT_WORKERS, get_area_dataflows
+from ._bulk import IngestionStats
+from ._checkpoint import (
+    STAGES,
+    build_in_progress,
+    get_completed_stages,
+    reset_checkpoints,
+    stage_done,
+)
+from ._codelist import get_codelists
+from ._dataflow import get_dataflow_stamp, get_dataflows, write_dataflows
+from ._initialize import init_db
+from ._manifest import METADATA_TTL, manifest_stale, read_manifest, touch_manifest
+from ._migrate import migrate_db
+from ._swap import SIDE_PATH, copy_to_side_file, side_file_lock, swap_in
+
+
+def get_stored_stamps(cur: sqlite3.Cursor) -> dict[str, tuple[str, str]]:
+    """Return the version and annotation timestamps of each dataflow in the database."""
+    cur.execute("SELECT code, version, updated FROM dataflow")
+    return {code: (version, updated) for code, version, updated in cur.fetchall()}
+
+
+def _build_metadata() -> bool:
+    if build_in_progress(SIDE_PATH):
+        print("Resuming the previous metadata build...")
+        migrate_db(SIDE_PATH)
+    else:
+        init_db(SIDE_PATH)
+
+    stages = {
+        "cl_area": get_cl_areas,
+        "dataflow": get_dataflows,
+        "codelist": get_codelists,
+        "cl_area_dataflow": get_area_dataflows,
+    }
+
+    for stage in STAGES:
+        if not stage_done(stage, SIDE_PATH):
+            stages[stage](path=SIDE_PATH)
+
+    return swap_in()
+
+
+def build_metadata() -> bool:
+    """Build all of the metadata from scratch: the areas, dataflows, codelists
+    and the constraints of every dataflow. If a previous build was interrupted,
+    it is resumed from its last checkpoint instead.
+
+    The metadata is built in a side file, which replaces the database once
+    it's complete, so the current metadata can be read in the meantime.
+
+    Returns:
+    - bool: True if the new metadata was swapped in, False if it wasn't valid
+      and the database was left as it was.
+    """
+    with side_file_lock:
+        return _build_metadata()
+
+
+def refresh_metadata(max_workers: int = DEFAULT_WORKERS) -> bool:
+    """Bring the metadata in the database up to date with ILOSTAT. Only the
+    dataflows that are new or whose version or annotation timestamps changed
+    are downloaded again, and dataflows that no longer exist are removed. If
+    a full build was interrupted, it is resumed instead.
+
+    The changes are applied to a copy of the database, which is then swapped in
+    atomically, so the metadata can be read while the refresh runs.
+
+    Returns:
+    - bool: True if the metadata is up to date, False if the refreshed copy
+      wasn't valid and the database was left as it was.
+    """
+    with side_file_lock:
+        return _refresh_metadata(max_workers)
+
+
+def _refresh_metadata(max_workers: int) -> bool:
+    # Make sure the database has the latest schema
+    migrate_db()
+
+    # Finish an interrupted build rather than throwing its side file away
+    if build_in_progress(SIDE_PATH):
+        return _build_metadata()
+
+    # Connect to the database
+    con = connect()
+    cur = con.cursor()
+
+    # Get the shared SDMX client
+    ilostat = get_client()
+
+    # Get the current list of dataflows
+    dataflows = ilostat.dataflow().dataflow
+
+    # Compare their versions with the ones we have
+    current = {code: get_dataflow_stamp(dataflows[code]) for code in dataflows}
+    stored = get_stored_stamps(cur)
+
+    changed = [code for code in current if stored.get(code) != current[code]]
+    removed = [code for code in stored if code not in current]
+
+    print(f"{len(changed)} new or changed dataflows, {len(removed)} removed")
+
+    # Databases built before the codelists were stored don't have them yet
+    has_codelists = "codelist" in get_completed_stages(cur)
+
+    if not changed and not removed and has_codelists:
+        with con:
+            touch_manifest(cur)
+        con.close()
+        return True
+
+    con.close()
+
+    # Apply the changes to a copy of the database
+    copy_to_side_file()
+    con = connect(SIDE_PATH)
+    cur = con.cursor()
+
+    # The areas and the codelists are a single request each, so we simply bring
+    # all of them up to date
+    get_cl_areas(SIDE_PATH)
+    get_codelists(SIDE_PATH)
+
+    stats = IngestionStats("Dataflows")
+
+    with con:
+        # Remove the dataflows that no longer exist
+        uids = [(code,) for code in removed]
+        cur.executemany(
+            """DELETE FROM dataflow_dimension_code WHERE dataflow_dimension_uid IN (
+                   SELECT dataflow_dimension_uid FROM dataflow_dimension
+                   JOIN dataflow USING (dataflow_uid) WHERE dataflow.code = ?)""",
+            uids,
+        )
+        for table in [
+            "dataflow_name",
+            "dataflow_description",
+            "cl_area_dataflow",
+            "dataflow_dimension",
+        ]:
+            cur.executemany(
+                f"""DELETE FROM {table} WHERE dataflow_uid IN (
+                        SELECT dataflow_uid FROM dataflow WHERE code = ?)""",
+                uids,
+            )
+        cur.executemany("DELETE FROM dataflow WHERE code = ?", uids)
+
+        # Write the new and changed dataflows without their versions for now,
+        # so that they're downloaded again if the refresh doesn't go through
+        write_dataflows(cur, dataflows, changed, stats, stamp=False)
+
+        # Make sure that their constraints are downloaded again
+        reset_checkpoints(cur, "cl_area_dataflow", changed + removed)
+
+    stats.report()
+
+    con.close()
+
+    # Download the constraints of the new and changed dataflows only. Their
+    # versions are recorded as soon as their constraints are stored.
+    get_area_dataflows(
+        max_workers,
+        dataflows=changed,
+        stamps={code: current[code] for code in changed},
+        path=SIDE_PATH,
+    )
+
+    # Replace the database with the refreshed copy
+    return swap_in()
+
+
+# Seconds after a background refresh was started before another one can be,
+# and between two checks of the age of the metadata. A refresh that fails, e.g.
+# while the API is down, leaves the metadata stale; without a backoff, every
+# ILOStat created afterwards would start another one.
+REFRESH_BACKOFF = float(os.environ.get("ILO_PRISM_REFRESH_BACKOFF", 60 * 60))
+
+# When the last background refresh was started, and when the age of the
+# metadata was last checked, as time.monotonic() values
+_last_attempt = None
+_last_check = None
+
+
+def _recent(since: float | None, now: float) -> bool:
+    return since is not None and now - since < REFRESH_BACKOFF
+
+
+def refresh_in_background(
+    max_workers: int = DEFAULT_WORKERS,
+) -> threading.Thread | None:
+    """Run an incremental refresh in a daemon thread, so that the metadata can be
+    used while it's brought up to date. Nothing happens if a build or refresh
+    is already running in this process, if a refresh was started less than
+    REFRESH_BACKOFF seconds ago, or if this process opens the database
+    read-only.
+
+    Returns:
+    - threading.Thread | None: The thread of the refresh, if one was started.
+    """
+    global _last_attempt
+    if READ_ONLY or _recent(_last_attempt, time.monotonic()):
+        return None
+    if not side_file_lock.acquire(blocking=False):
+        return None
+    _last_attempt = time.monotonic()
+
+    def run():
+        try:
+            _refresh_metadata(max_workers)
+        except Exception as e:
+            print(f"Error: the background refresh of the metadata failed: {e!r}")
+        finally:
+            side_file_lock.release()
+
+    thread = threading.Thread(target=run, name="ilostat-refresh", daemon=True)
+    thread.start()
+    return thread
+
+
+def refresh_if_stale(ttl: float | None = METADATA_TTL) -> threading.Thread | None:
+    """Refresh the metadata in the background if it was last checked against
+    ILOSTAT more than ttl seconds ago. The age of the metadata is looked up at
+    most once per REFRESH_BACKOFF seconds, so this can be called on every use.
+
+    Parameters:
+    - ttl: Seconds after which the metadata is stale. None or 0 disables the
+      refresh.
+
+    Returns:
+    - threading.Thread | None: The thread of the refresh, if one was started.
+    """
+    global _last_check
+    now = time.monotonic()
+    if not ttl or _recent(_last_check, now):
+        return None
+    _last_check = now
+
+    manifest = read_manifest()
+    if manifest is None or not manifest_stale(manifest, ttl):
+        return None
+    return refresh_in_background()
+
+
+if __name__ == "__main__":
+    refresh_metadata()
@@ -0,0 +1,146 @@
+import os
+import pickle
+import tempfile
+import threading
+from collections import OrderedDict
+from ._client import get_client
+from ._connection import STORE_DIR, fetch_one
+from ._dsd import get_dsd
+from ._queries import DATAFLOW_VERSION
+from ._singleflight import get_flight
+
+# Where the parsed structures of the dataflows are kept across restarts. Set
+# ILO_PRISM_DSD_DIR to keep them somewhere else.
+REGISTRY_DIR = os.environ.get("ILO_PRISM_DSD_DIR", os.path.join(STORE_DIR, "dsd"))
+
+# Number of dataflow structures kept in memory, least recently used first out
+REGISTRY_SIZE = int(os.environ.get("ILO_PRISM_DSD_REGISTRY_SIZE", 64))
+
+
+class DataflowStructure:
+    """The data structure definition (DSD) of a dataflow, parsed once, together
+    with the codelist of each of its dimensions."""
+
+    def __init__(self, dataflow: str, version: str | None, dsd):
+        self.dataflow = dataflow
+        self.version = version
+        self.dsd = dsd
+
+        # Map each dimension ID to its code list, if it has one
+        self.codelists = {}
+        for dim in dsd.dimensions.components:
+            representation = dim.local_representation
+            self.codelists[dim.id] = (
+                representation.enumerated if representation else None
+            )
+
+
+class DsdRegistry:
+    """A thread-safe LRU registry of the structures of the dataflows, backed by
+    pickles on disk. A structure is downloaded again when the version of its
+    dataflow in the metadata changes."""
+
+    def __init__(self, directory: str = REGISTRY_DIR, size: int = REGISTRY_SIZE):
+        self.directory = directory
+        self.size = size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _path(self, dataflow: str) -> str:
+        return os.path.join(self.directory, f"{dataflow}.pickle")
+
+    def _load(self, dataflow: str, version: str | None) -> DataflowStructure | None:
+        """Read the structure of a dataflow from disk, if it's there and current."""
+        try:
+            with open(self._path(dataflow), "rb") as f:
+                structure = pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            # Written by another version of sdmx, or cut short
+            print(f"Error: the stored structure of {dataflow} can't be read: {e!r}")
+            return None
+        if not isinstance(structure, DataflowStructure) or structure.version != version:
+            return None
+        return structure
+
+    def _save(self, structure: DataflowStructure):
+        """Write the structure of a dataflow to disk, renaming it into place so
+        that other processes never read half of it."""
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    pickle.dump(structure, f, protocol=pickle.HIGHEST_PROTOCOL)
+                os.replace(tmp, self._path(structure.dataflow))
+            except BaseException:
+                os.remove(tmp)
+                raise
+        except OSError as e:
+            # E.g. a read-only volume; the structure is still kept in memory
+            print(f"Error: the structure of {structure.dataflow} can't be stored: {e}")
+
+    def _fetch(self, dataflow: str, version: str | None) -> DataflowStructure:
+        """Read the structure of a dataflow from disk or, failing that, the API."""
+        structure = self._load(dataflow, version)
+        if structure is None:
+            dsd = get_dsd(get_client(cached=True), dataflow)
+            structure = DataflowStructure(dataflow, version, dsd)
+            self._save(structure)
+        return structure
+
+    def get(self, dataflow: str) -> DataflowStructure:
+        """
+        Return the structure of a dataflow, from memory, from disk or, the first
+        time, from the API.
+
+        Parameters:
+        - dataflow (str): The dataflow code, e.g. 'DF_UNE_2EAP_SEX_AGE_RT'.
+
+        Returns:
+        - DataflowStructure: The DSD of the dataflow and the codelists of its
+          dimensions.
+        """
+        row = fetch_one(DATAFLOW_VERSION, (dataflow,))
+        version = row[0] if row else None
+
+        with self._lock:
+            structure = self._entries.get(dataflow)
+            if structure is not None and structure.version == version:
+                self._entries.move_to_end(dataflow)
+                return structure
+
+        # Parse the structure outside of the lock, so that other dataflows can
+        # still be looked up in the meantime. Concurrent lookups of the same
+        # dataflow share one download.
+        structure = get_flight("structure").do(
+            (dataflow, version), self._fetch, dataflow, version
+        )
+
+        with self._lock:
+            self._entries[dataflow] = structure
+            self._entries.move_to_end(dataflow)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+        return structure
+
+    def clear(self):
+        """Forget the structures in memory. The ones on disk are kept."""
+        with self._lock:
+            self._entries.clear()
+
+
+# The registry shared by every query of the process
+_registry = None
+_lock = threading.Lock()
+
+
+def get_registry() -> DsdRegistry:
+    """Return the DSD registry of the process, creating it on first use."""
+    global _registry
+    if _registry is None:
+        with _lock:
+            if _registry is None:
+                _registry = DsdRegistry()
+    return _registry
@@ -1,6 +1,11 @@
 import pandas as pd
 import sdmx
 
+# The columns of SDMX-CSV that hold the value of an observation and the
+# attributes that format it
+CSV_VALUE = "OBS_VALUE"
+CSV_ATTRIBUTES = ["UNIT_MULT", "DECIMALS"]
+
 
 class ILOStatQueryResult:
     def __init__(self, data, codelist, language):
@@ -9,7 +14,8 @@ class ILOStatQueryResult:
 
         Args:
             data: SDMX data object containing the results of a query.
-            codelist (dict): Dictionary mapping dimension IDs to their codelists.
+            codelist (dict): Dictionary mapping dimension IDs to the name of their
+                codelist and the labels of its codes, in the language of the query.
             language (str): Language code for translating codelist names.
         """
         self._sdmx_data = data  # Store the raw SDMX data
@@ -22,23 +28,68 @@ class ILOStatQueryResult:
         # Format the base DataFrame into the final readable version
         self.dataframe = self._format_df()
 
-    def _get_readable_name(self, column, value):
+    @classmethod
+    def from_csv(cls, source, dimensions: list[str], codelist, language):
         """
-        Retrieve a human-readable name for a code list value.
+        Build a result from an SDMX-CSV response instead of an SDMX data object,
+        parsed by pandas' C engine. The result is the same as from the SDMX-ML
+        of the same query, except that it has no sdmx_data.
 
         Args:
-            column (str): Dimension ID for which the readable name is needed.
-            value (str): Specific code value to translate to a human-readable name.
+            source: The SDMX-CSV, as a path or file-like object.
+            dimensions (list[str]): The dimension IDs, in the order of the DSD.
+            codelist (dict): The names and code labels of each dimension.
+            language (str): Language code for translating codelist names.
 
-        Returns:
-            str: Human-readable name or the original value if not found.
+        Raises:
+            ValueError: If the CSV lacks a dimension or the observation values.
         """
-        try:
-            # Return the localized name for the given column and value
-            return self._codelist[column][value].name[self.language]
-        except KeyError:
-            # Return the original value if a name is not found in the codelist
-            return value
+        df = pd.read_csv(
+            source,
+            engine="c",
+            dtype={
+                **{column: str for column in dimensions + CSV_ATTRIBUTES},
+                CSV_VALUE: float,
+            },
+            keep_default_na=False,
+            na_values={CSV_VALUE: ["", "NaN"]},
+            usecols=lambda column: column in dimensions
+            or column in CSV_ATTRIBUTES
+            or column == CSV_VALUE,
+        )
+        missing = [column for column in dimensions + [CSV_VALUE] if column not in df]
+        if missing:
+            raise ValueError(f"SDMX-CSV without the columns {missing}")
+
+        # The multiplier and decimals of each observation, if they're given
+        multipliers = (
+            pd.to_numeric(df["UNIT_MULT"], errors="coerce").fillna(0).astype(int)
+            if "UNIT_MULT" in df
+            else [0] * len(df)
+        )
+        decimals = (
+            [
+                None if pd.isna(places) else int(places)
+                for places in pd.to_numeric(df["DECIMALS"], errors="coerce")
+            ]
+            if "DECIMALS" in df
+            else [None] * len(df)
+        )
+
+        result = cls.__new__(cls)
+        result._sdmx_data = None
+        result._codelist = codelist
+        result.language = language
+        result._base_df = df[dimensions + [CSV_VALUE]].rename(
+            columns={CSV_VALUE: "value"}
+        )
+        result.dataframe = format_dataframe(
+            pd.DataFrame.copy(result._base_df, deep=True),
+            codelist,
+            list(multipliers),
+            decimals,
+        )
+        return result
 
     def _format_df(self):
         """
@@ -48,41 +99,20 @@ class ILOStatQueryResult:
         Returns:
             pd.DataFrame: Formatted DataFrame with readable values.
         """
-        # Create a deep copy of the base dataframe to avoid modifying the original
-        formatted_df = pd.DataFrame.copy(self._base_df, deep=True)
-
-        # Drop the FREQ and MEASURE columns if they are present
-        if "FREQ" in formatted_df.columns:
-            formatted_df.drop(columns=["FREQ"], inplace=True)
-
-        if "MEASURE" in formatted_df.columns:
-            formatted_df.drop(columns=["MEASURE"], inplace=True)
-
-        # Process each observation to apply multipliers and decimals
-        for index, observation in enumerate(self._sdmx_data.obs):
-            multiplier = pow(10, int(observation.attached_attribute["UNIT_MULT"].value))
-            decimals = int(observation.attached_attribute["DECIMALS"].value)
-            # Multiply and round values to the specified number of decimals
-            formatted_df.loc[index, "value"] = round(
-                formatted_df.loc[index, "value"] * multiplier, decimals
-            )
-
-        # Apply human-readable names to columns with codelists
-        for column in formatted_df.columns:
-            if column in self._codelist and self._codelist[column] is not None:
-                formatted_df[column] = formatted_df[column].apply(
-                    lambda x: self._get_readable_name(column, x)
-                )
-
-        # Rename columns to their human-readable names
-        column_rename_map = {
-            column: self._codelist[column].name.localizations[self.language]
-            for column in formatted_df.columns
-            if column in self._codelist and hasattr(self._codelist[column], "name")
-        }
-        formatted_df.rename(columns=column_rename_map, inplace=True)
-
-        return formatted_df
+        # The multiplier and decimals of each observation
+        multipliers = []
+        decimals = []
+        for observation in self._sdmx_data.obs:
+            multipliers.append(int(observation.attached_attribute["UNIT_MULT"].value))
+            decimals.append(int(observation.attached_attribute["DECIMALS"].value))
+
+        # Format a deep copy of the base dataframe to avoid modifying the original
+        return format_dataframe(
+            pd.DataFrame.copy(self._base_df, deep=True),
+            self._codelist,
+            multipliers,
+            decimals,
+        )
 
     @property
     def base_dataframe(self):
@@ -109,10 +139,64 @@ class ILOStatQueryResult:
 
     @property
     def sdmx_data(self):
-        """Retrieve the raw SDMX data object."""
+        """Retrieve the raw SDMX data object, or None if the result was read
+        from SDMX-CSV."""
         return self._sdmx_data
 
 
+def format_dataframe(
+    df: pd.DataFrame,
+    codelist: dict,
+    multipliers: list[int],
+    decimals: list[int | None],
+) -> pd.DataFrame:
+    """
+    Format a DataFrame of observations in place: apply their multipliers and
+    decimals, and give columns and codes their human-readable names.
+
+    Args:
+        df (pd.DataFrame): One column per dimension and a "value" column.
+        codelist (dict): The name and code labels of each dimension.
+        multipliers (list[int]): The UNIT_MULT of each row.
+        decimals (list[int | None]): The DECIMALS of each row, or None to
+            leave the value of the row unrounded.
+
+    Returns:
+        pd.DataFrame: The formatted DataFrame.
+    """
+    # Drop the FREQ and MEASURE columns if they are present
+    if "FREQ" in df.columns:
+        df.drop(columns=["FREQ"], inplace=True)
+
+    if "MEASURE" in df.columns:
+        df.drop(columns=["MEASURE"], inplace=True)
+
+    # Multiply and round values to the specified number of decimals
+    df["value"] = [
+        value * pow(10, multiplier)
+        if places is None
+        else round(value * pow(10, multiplier), places)
+        for value, multiplier, places in zip(df["value"], multipliers, decimals)
+    ]
+
+    # Apply human-readable names to columns with codelists, a whole column at a
+    # time, keeping the original values that have no name
+    for column in df.columns:
+        if codelist.get(column) is not None:
+            codes = codelist[column]["codes"]
+            df[column] = df[column].map(codes).fillna(df[column])
+
+    # Rename columns to their human-readable names
+    column_rename_map = {
+        column: codelist[column]["name"]
+        for column in df.columns
+        if codelist.get(column) is not None
+    }
+    df.rename(columns=column_rename_map, inplace=True)
+
+    return df
+
+
 if __name__ == "__main__":
     # Import the query class (assumed to be in a local module)
     from ._query import ILOStatQuery
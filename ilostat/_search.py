@@ -0,0 +1,82 @@
+import re
+import sqlite3
+from . import _queries as queries
+from ._connection import fetch_all
+
+
+def rebuild_search_index(cur: sqlite3.Cursor):
+    """Fill the full-text search indexes from the names and descriptions in the
+    database. This should be called in the same transaction as the one that
+    finishes a build, so that the indexes never lag behind the data."""
+    cur.execute("DELETE FROM dataflow_search")
+    cur.execute(
+        """INSERT INTO dataflow_search (name, description, language, dataflow_uid)
+           SELECT dn.name, COALESCE(dd.description, ''), l.code, dn.dataflow_uid
+           FROM dataflow_name AS dn
+           JOIN language AS l ON dn.language_uid = l.language_uid
+           LEFT JOIN dataflow_description AS dd
+               ON dn.dataflow_uid = dd.dataflow_uid
+               AND dn.language_uid = dd.language_uid"""
+    )
+    cur.execute("DELETE FROM area_search")
+    cur.execute(
+        """INSERT INTO area_search (name, language, cl_area_uid)
+           SELECT cn.name, l.code, cn.cl_area_uid
+           FROM cl_area_name AS cn
+           JOIN language AS l ON cn.language_uid = l.language_uid"""
+    )
+
+    # Merge the segments of the indexes so that queries only look at one
+    cur.execute("INSERT INTO dataflow_search (dataflow_search) VALUES ('optimize')")
+    cur.execute("INSERT INTO area_search (area_search) VALUES ('optimize')")
+
+
+def fts_query(text: str) -> str | None:
+    """Turn what a user typed into an FTS5 query in which every word must match
+    the start of a word, e.g. 'unemp rate' -> '"unemp"* "rate"*'. Returns None
+    if the text has no words."""
+    words = re.findall(r"\w+", text)
+    if not words:
+        return None
+    return " ".join(f'"{word}"*' for word in words)
+
+
+def search_dataflows(
+    text: str, language: str, area: str = None, limit: int = 20
+) -> list[tuple[str, str]]:
+    """
+    Search the dataflows by name and description.
+
+    Parameters:
+    - text (str): What the user typed.
+    - language (str): The language to search in ('en', 'fr' or 'es').
+    - area (str): Only return the dataflows of this area, if given.
+    - limit (int): The maximum number of results.
+
+    Returns:
+    - list[tuple[str, str]]: The names and codes of the best matches, best first.
+    """
+    query = fts_query(text)
+    if query is None:
+        return []
+    if area is None:
+        return fetch_all(queries.SEARCH_ALL_DATAFLOWS, (query, language, limit))
+    return fetch_all(queries.SEARCH_DATAFLOWS, (query, language, area, limit))
+
+
+def search_areas(text: str, language: str, limit: int = 20) -> list[tuple[str, str]]:
+    """
+    Search the areas by name.
+
+    Parameters:
+    - text (str): What the user typed.
+    - language (str): The language to search in ('en', 'fr' or 'es').
+    - limit (int): The maximum number of results.
+
+    Returns:
+    - list[tuple[str, str]]: The names and codes of the best matches, best first.
+    """
+    query = fts_query(text)
+    if query is None:
+        return []
+    return fetch_all(queries.SEARCH_AREAS, (query, language, limit))
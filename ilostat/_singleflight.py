@@ -0,0 +1,97 @@
+import threading
+
+
+class _Call:
+    """A call in flight, and its outcome once it's done."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Coalesces identical calls made at the same time: the first caller of a
+    key runs the call, and the callers of the same key that arrive before it's
+    done wait for it and share its result, or its exception. Nothing is kept
+    once the call is done; that's the job of the caches."""
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self._stats = {"calls": 0, "executions": 0, "coalesced": 0, "errors": 0}
+
+    def do(self, key, fn, *args):
+        """
+        Run fn(*args), unless a call with the same key is already in flight, in
+        which case wait for that one instead.
+
+        Parameters:
+        - key: Anything hashable that identifies the call, e.g. its request.
+        - fn: The function to call.
+
+        Returns:
+        - The result of the call, shared by every caller of the key.
+        """
+        with self._lock:
+            self._stats["calls"] += 1
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self._stats["executions"] += 1
+            else:
+                self._stats["coalesced"] += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn(*args)
+        except BaseException as e:
+            call.error = e
+            with self._lock:
+                self._stats["errors"] += 1
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+    def stats(self) -> dict:
+        """
+        Return the counters of the calls since the process started.
+
+        Returns:
+        - dict: The calls made, the ones that ran, the ones that waited for an
+          identical call instead, failed calls and the calls in flight, e.g.
+          {"calls": 40, "executions": 3, "coalesced": 37, "errors": 0, ...}
+        """
+        with self._lock:
+            return {**self._stats, "in_flight": len(self._calls)}
+
+
+# The single-flight groups of the process, by the kind of call they coalesce
+_flights = {}
+_lock = threading.Lock()
+
+
+def get_flight(name: str) -> SingleFlight:
+    """Return the single-flight group of a kind of call, e.g. "data", creating
+    it on first use."""
+    flight = _flights.get(name)
+    if flight is None:
+        with _lock:
+            flight = _flights.setdefault(name, SingleFlight())
+    return flight
+
+
+def flight_stats() -> dict[str, dict]:
+    """Return the counters of every single-flight group, by name."""
+    with _lock:
+        flights = dict(_flights)
+    return {name: flight.stats() for name, flight in flights.items()}
@@ -0,0 +1,128 @@
+import sqlite3
+import threading
+import time
+from types import MappingProxyType
+from . import _queries as queries
+from ._connection import connect_read_only, fetch_one
+
+# Seconds between checks of whether the data in the database changed
+RELOAD_INTERVAL = 1.0
+
+
+class MetadataSnapshot:
+    """An immutable copy of the areas, dataflows, labels and descriptions in the
+    database, indexed for every language at once so that lookups are O(1).
+
+    Attributes:
+        build_id (str): The build of the data the snapshot was loaded from.
+        areas (Mapping): language -> ((name, code), ...) of every area.
+        area_labels (Mapping): (language, area) -> name.
+        dataflows (Mapping): (area, language) -> ((name, code), ...) sorted by name.
+        dataflow_labels (Mapping): (dataflow, language) -> name.
+        dataflow_descriptions (Mapping): (dataflow, language) -> description.
+    """
+
+    def __init__(self, build_id: str, area_rows, name_rows, description_rows, links):
+        self.build_id = build_id
+
+        areas = {}
+        area_labels = {}
+        for language, area, name in area_rows:
+            areas.setdefault(language, []).append((name, area))
+            area_labels[(language, area)] = name
+
+        dataflow_labels = {(df, language): name for language, df, name in name_rows}
+        dataflow_descriptions = {
+            (df, language): description
+            for language, df, description in description_rows
+        }
+
+        # Only the dataflows with a name in a language are listed in that language
+        languages = list(areas)
+        dataflows = {}
+        for area, df in links:
+            for language in languages:
+                name = dataflow_labels.get((df, language))
+                if name is not None:
+                    dataflows.setdefault((area, language), []).append((name, df))
+
+        self.areas = MappingProxyType(
+            {language: tuple(rows) for language, rows in areas.items()}
+        )
+        self.area_labels = MappingProxyType(area_labels)
+        self.dataflows = MappingProxyType(
+            {key: tuple(sorted(rows)) for key, rows in dataflows.items()}
+        )
+        self.dataflow_labels = MappingProxyType(dataflow_labels)
+        self.dataflow_descriptions = MappingProxyType(dataflow_descriptions)
+
+
+def get_build_id(cur: sqlite3.Cursor) -> str | None:
+    """Return the identifier of the data in the database, if it has a manifest."""
+    row = cur.execute(queries.SNAPSHOT_BUILD_ID).fetchone()
+    return row[0] if row else None
+
+
+def load_snapshot() -> MetadataSnapshot:
+    """Load a snapshot of the metadata in a single read transaction, so that it's
+    consistent even while the ingestion writes to the database."""
+    con = connect_read_only(isolation_level=None)
+    cur = con.cursor()
+    try:
+        cur.execute("BEGIN")
+        snapshot = MetadataSnapshot(
+            get_build_id(cur),
+            cur.execute(queries.SNAPSHOT_AREAS).fetchall(),
+            cur.execute(queries.SNAPSHOT_DATAFLOW_NAMES).fetchall(),
+            cur.execute(queries.SNAPSHOT_DATAFLOW_DESCRIPTIONS).fetchall(),
+            cur.execute(queries.SNAPSHOT_AREA_DATAFLOWS).fetchall(),
+        )
+        cur.execute("COMMIT")
+    finally:
+        con.close()
+    return snapshot
+
+
+# The snapshot shared by every ILOStat instance of the process. It's replaced as a
+# whole, so readers always see either the old or the new snapshot, never a mix.
+_snapshot: MetadataSnapshot | None = None
+
+# When the database was last checked for a newer build
+_checked = 0.0
+
+# Held by the thread that checks for, or loads, a newer build
+_reload = threading.Lock()
+
+
+def get_snapshot() -> MetadataSnapshot:
+    """Return the current snapshot of the metadata. At most once per
+    RELOAD_INTERVAL, the build_id of the database is compared with the one of
+    the snapshot, and a new snapshot is loaded if they differ. Other threads
+    keep using the old snapshot in the meantime."""
+    global _snapshot, _checked
+
+    snapshot = _snapshot
+    if snapshot is not None and time.monotonic() - _checked < RELOAD_INTERVAL:
+        return snapshot
+
+    # Only one thread reloads; if there's a snapshot, the others don't wait for it
+    if not _reload.acquire(blocking=snapshot is None):
+        return snapshot
+
+    try:
+        if _snapshot is None:
+            _snapshot = load_snapshot()
+        elif time.monotonic() - _checked >= RELOAD_INTERVAL:
+            row = fetch_one(queries.SNAPSHOT_BUILD_ID)
+            if row is None or row[0] != _snapshot.build_id:
+                _snapshot = load_snapshot()
+        _checked = time.monotonic()
+        return _snapshot
+    finally:
+        _reload.release()
+
+
+def reset_snapshot():
+    """Forget the current snapshot, so that the next lookup loads a new one."""
+    global _snapshot
+    _snapshot = None
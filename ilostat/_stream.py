@@ -0,0 +1,54 @@
+from typing import Iterable, Iterator
+from xml.etree.ElementTree import XMLPullParser
+
+
+def local_name(tag: str) -> str:
+    """The name of an XML element without its namespace, e.g. 'Series'."""
+    return tag.rsplit("}", 1)[-1]
+
+
+def iter_observations(chunks: Iterable[bytes]) -> Iterator[dict[str, str]]:
+    """
+    Parse a structure-specific SDMX-ML data message as it's downloaded, and
+    yield its observations one at a time. Each element is dropped once it's
+    been read, so memory stays bounded however big the message is.
+
+    Parameters:
+    - chunks (Iterable[bytes]): The bytes of the message, e.g. the
+      iter_content() of a streamed response.
+
+    Returns:
+    - Iterator[dict[str, str]]: The dimensions and attributes of each
+      observation, together with those of its series, e.g.
+      {"REF_AREA": "ITA", "SEX": "SEX_T", "TIME_PERIOD": "2020",
+       "OBS_VALUE": "9.2", "UNIT_MULT": "0", "DECIMALS": "1", ...}
+    """
+    parser = XMLPullParser(events=("start", "end"))
+
+    # The open elements, and the attributes of the series being read
+    parents = []
+    series = {}
+
+    for chunk in chunks:
+        parser.feed(chunk)
+        for event, element in parser.read_events():
+            if event == "start":
+                parents.append(element)
+                if local_name(element.tag) == "Series":
+                    series = dict(element.attrib)
+                continue
+
+            parents.pop()
+            name = local_name(element.tag)
+            if name == "Obs":
+                yield {**series, **element.attrib}
+            elif name == "Series":
+                series = {}
+            else:
+                continue
+
+            # Forget the observation or series now that it's been read
+            if parents:
+                parents[-1].remove(element)
+
+    parser.close()
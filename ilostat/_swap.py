@@ -0,0 +1,91 @@
+import os
+import sqlite3
+import threading
+from ._checkpoint import build_in_progress
+from ._connection import DB_PATH, connect, connect_read_only, disable_wal
+from ._manifest import manifest_valid, read_manifest
+from ._migrate import latest_version
+
+# Where new builds and refreshes of the metadata are written, next to the
+# database so that it can be renamed over it
+SIDE_PATH = DB_PATH + ".next"
+
+# Held by the build or refresh that writes the side file, so that two of them
+# never overwrite each other's side file
+side_file_lock = threading.Lock()
+
+
+def remove_side_file(path: str = SIDE_PATH):
+    """Remove a side file left behind by a build that didn't go through, together
+    with its rollback journal."""
+    for leftover in [path, path + "-journal"]:
+        try:
+            os.remove(leftover)
+        except FileNotFoundError:
+            pass
+
+
+def copy_to_side_file(path: str = SIDE_PATH):
+    """Start a refresh from a compact copy of the current database. The copy is a
+    consistent snapshot, so the database can be read while it's taken. A side
+    file that holds an interrupted build is never replaced, so that the build
+    can be resumed."""
+    if build_in_progress(path):
+        raise RuntimeError(
+            f"{path} holds an interrupted build of the metadata, which a refresh "
+            "would throw away. Resume the build instead."
+        )
+    remove_side_file(path)
+    con = connect_read_only()
+    try:
+        con.execute("VACUUM INTO ?", (path,))
+    finally:
+        con.close()
+
+
+def side_file_error(path: str = SIDE_PATH) -> str | None:
+    """Return why a side file can't be swapped in, or None if it holds a complete
+    build for the latest version of the schema and passes SQLite's integrity
+    check."""
+    if not os.path.exists(path):
+        return "it doesn't exist"
+
+    con = connect(path)
+    try:
+        # A database in WAL mode can't be renamed without its log
+        disable_wal(con)
+
+        if con.execute("PRAGMA quick_check").fetchone()[0] != "ok":
+            return "it failed its integrity check"
+
+        if not manifest_valid(read_manifest(con), latest_version()):
+            return "it doesn't hold a complete build of the metadata"
+    except sqlite3.DatabaseError as e:
+        return f"it can't be read: {e}"
+    finally:
+        con.close()
+    return None
+
+
+def check_side_file(path: str = SIDE_PATH) -> bool:
+    """Check that a side file can be swapped in, and print why if it can't."""
+    error = side_file_error(path)
+    if error is not None:
+        print(f"Error: {path} can't be swapped in: {error}")
+    return error is None
+
+
+def swap_in(path: str = SIDE_PATH) -> bool:
+    """Validate a side file and rename it over the database. The rename is atomic:
+    readers see either the old database or the new one, never a mix of both.
+    Connections that are already open keep reading the old file until they're
+    reopened, which the read connections do on their next query.
+
+    Returns:
+    - bool: True if the side file was swapped in, False if it wasn't valid.
+    """
+    if not check_side_file(path):
+        return False
+    os.replace(path, DB_PATH)
+    print(f"Swapped the new metadata into {DB_PATH}")
+    return True
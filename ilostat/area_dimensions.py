@@ -1,5 +1,21 @@
-import sdmx
-from ._dsd import get_dsd
+import re
+import requests
+from ._client import get_client
+from ._registry import get_registry
+from ._singleflight import get_flight
+
+# Ask for the first and last observation of each series only, which is enough to
+# know the dimension values and years of an area
+BOUNDS_PARAMS = {"firstNObservations": 1, "lastNObservations": 1, "detail": "dataonly"}
+
+# Bounds queries rejected with a 400 in a row before they're no longer made. A
+# 400 may also be about one dataflow or area, so a single one isn't enough.
+MAX_BOUNDS_FAILURES = 3
+
+# Cleared once the API says it doesn't implement BOUNDS_PARAMS (501), or has
+# rejected them MAX_BOUNDS_FAILURES times in a row
+_bounds_supported = True
+_bounds_failures = 0
 
 
 def find_dict_in_list(list_of_dicts, key, value):
@@ -58,37 +74,40 @@ def filter_dimensions(data, filter_criteria):
     return filtered_data
 
 
-def filter_area_dimensions(area: str, dataflow: str, all_dimensions: any):
+def get_observations(ilostat, dataflow: str, dsd, area: str, params: dict = None):
     """
-    Retrieves dimensions for a dataflow available for a specified country/area.
+    Fetch the observations of a dataflow for an area.
 
     Parameters:
-    - area (str): The country/area code to filter dimensions for (e.g., "ITA").
-    - dataflow (str): The dataflow identifier for which dimensions are requested.
-    - all_dimensions (list): A list of all available dimensions for the dataflow.
+    - ilostat: The SDMX client.
+    - dataflow (str): The dataflow identifier.
+    - dsd: The Data Structure Definition (DSD) of the dataflow.
+    - area (str): The country/area code.
+    - params (dict): Additional parameters for the query.
 
     Returns:
-    - list: A filtered list of dimensions relevant to the specified country/area.
+    - list: The observations, with their full keys.
     """
-    # Initialize a client to interact with ILO data services
-    ilostat = sdmx.Client("ILO")
-
-    # Retrieve the Data Structure Definition (DSD) for the specified dataflow
-    dsd = get_dsd(ilostat, dataflow)
-
     # Set the area as the only dimension for filtering
     dimensions = {"REF_AREA": area}
 
     # Fetch data based on the area and dataflow
-    data_msg = ilostat.data(
-        dataflow,
-        dsd=dsd,
-        key=dimensions,
-    )
+    data_msg = ilostat.data(dataflow, dsd=dsd, key=dimensions, params=params)
 
     # Extract the list of observations from the fetched data
-    observations = data_msg.data[0].obs
+    return data_msg.data[0].obs
+
+
+def collect_dimensions(observations) -> list[dict]:
+    """
+    Gather the values of each dimension found in the keys of some observations.
 
+    Parameters:
+    - observations (list): The observations of a dataflow for an area.
+
+    Returns:
+    - list: One dictionary per dimension, e.g. {"dimension": "SEX", "values": {"SEX_T"}}
+    """
     # Initialize an empty list to store dimensions supported by the country/area
     area_dimensions = []
 
@@ -124,6 +143,122 @@ def filter_area_dimensions(area: str, dataflow: str, all_dimensions: any):
             # Add new value to the existing dimension entry
             current_dim["values"].add(new_dim_value)
 
+    return area_dimensions
+
+
+def fill_years(periods: set[str]) -> set[str] | None:
+    """
+    Fill in the years between the first and the last of some periods, e.g.
+    {"2015", "2018"} -> {"2015", "2016", "2017", "2018"}. The range is padded:
+    it includes the years in between that have no observations at all, since
+    only the first and last observation of each series are known.
+
+    Parameters:
+    - periods (set[str]): The first and last periods of each series.
+
+    Returns:
+    - set[str] | None: Every year in between, or None if the periods aren't
+      years, e.g. months, which can't be filled in without knowing their format.
+    """
+    if not periods or not all(re.fullmatch(r"\d{4}", period) for period in periods):
+        return None
+    years = [int(period) for period in periods]
+    return {str(year) for year in range(min(years), max(years) + 1)}
+
+
+def get_bounded_dimensions(ilostat, dataflow: str, dsd, area: str) -> list | None:
+    """
+    Learn which dimension values and years a dataflow has for an area from the
+    first and last observation of each series only, which is a few kilobytes
+    instead of every observation.
+
+    Returns:
+    - list | None: The dimensions, as collect_dimensions() returns them, or None
+      if they can't be learned this way.
+    """
+    global _bounds_supported, _bounds_failures
+
+    try:
+        observations = get_observations(ilostat, dataflow, dsd, area, BOUNDS_PARAMS)
+    except NotImplementedError:
+        _bounds_supported = False
+        return None
+    except requests.HTTPError as e:
+        status = e.response.status_code if e.response is not None else None
+        if status == 400:
+            _bounds_failures += 1
+        if status == 501 or _bounds_failures >= MAX_BOUNDS_FAILURES:
+            # The API doesn't understand the parameters; don't ask again
+            _bounds_supported = False
+        return None
+    _bounds_failures = 0
+
+    area_dimensions = collect_dimensions(observations)
+
+    time_dimension = find_dict_in_list(area_dimensions, "dimension", "TIME_PERIOD")
+    if time_dimension:
+        years = fill_years(time_dimension["values"])
+        if years is None:
+            return None
+        time_dimension["values"] = years
+
+    return area_dimensions
+
+
+def get_area_values(area: str, dataflow: str, dsd=None) -> list[dict]:
+    """
+    Find the dimension values and years that a dataflow has for an area. Only
+    the first and last observation of each series are downloaded. If the API
+    doesn't support that, or the periods aren't years, every observation of the
+    area is downloaded instead, through the response cache.
+
+    Parameters:
+    - area (str): The country/area code (e.g., "ITA").
+    - dataflow (str): The dataflow identifier.
+    - dsd: The Data Structure Definition (DSD) of the dataflow, if it's already
+      known. Otherwise it's taken from the DSD registry.
+
+    Returns:
+    - list: One dictionary per dimension, as collect_dimensions() returns them.
+    Callers asking for the same area and dataflow at the same time share it,
+    so it mustn't be changed.
+    """
+    return get_flight("area_values").do(
+        (dataflow, area), _get_area_values, area, dataflow, dsd
+    )
+
+
+def _get_area_values(area: str, dataflow: str, dsd) -> list[dict]:
+    # Get the shared client to interact with ILO data services
+    ilostat = get_client(cached=True)
+
+    # Retrieve the Data Structure Definition (DSD) for the specified dataflow
+    if dsd is None:
+        dsd = get_registry().get(dataflow).dsd
+
+    area_dimensions = None
+    if _bounds_supported:
+        area_dimensions = get_bounded_dimensions(ilostat, dataflow, dsd, area)
+
+    # Fall back to every observation of the area
+    if area_dimensions is None:
+        observations = get_observations(ilostat, dataflow, dsd, area)
+        area_dimensions = collect_dimensions(observations)
+
+    return area_dimensions
+
+
+def merge_area_dimensions(all_dimensions: list, area_dimensions: list) -> list:
+    """
+    Keep the dimension values of a dataflow that an area has, and add its years.
+
+    Parameters:
+    - all_dimensions (list): A list of all available dimensions for the dataflow.
+    - area_dimensions (list): The values of the area, from get_area_values().
+
+    Returns:
+    - list: A filtered list of dimensions relevant to the area.
+    """
     # Filter dimensions using the gathered data
     filtered_dims = filter_dimensions(all_dimensions, area_dimensions)
 
@@ -147,6 +282,23 @@ def filter_area_dimensions(area: str, dataflow: str, all_dimensions: any):
     return filtered_dims
 
 
+def filter_area_dimensions(area: str, dataflow: str, all_dimensions: any, dsd=None):
+    """
+    Retrieves dimensions for a dataflow available for a specified country/area.
+
+    Parameters:
+    - area (str): The country/area code to filter dimensions for (e.g., "ITA").
+    - dataflow (str): The dataflow identifier for which dimensions are requested.
+    - all_dimensions (list): A list of all available dimensions for the dataflow.
+    - dsd: The DSD of the dataflow, if it's already known.
+
+    Returns:
+    - list: A filtered list of dimensions relevant to the specified country/area.
+    """
+    area_dimensions = get_area_values(area, dataflow, dsd)
+    return merge_area_dimensions(all_dimensions, area_dimensions)
+
+
 if __name__ == "__main__":
     from ._dimensions import get_dimensions
 
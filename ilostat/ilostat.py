@@ -1,38 +1,126 @@
+import threading
 from typing import Literal
-import sqlite3
-from ._dataflow import get_dataflows
-from ._area import get_cl_areas
-from ._area_dataflow import get_area_dataflows
-from ._initialize import init_db
+from ._bundle import restore_bundle
 from ._validate_db import validate_db
+from ._manifest import METADATA_TTL, manifest_valid, read_manifest
+from ._migrate import latest_version, migrate_db
+from ._refresh import (
+    build_metadata,
+    refresh_if_stale,
+    refresh_in_background,
+    refresh_metadata,
+)
+from ._snapshot import get_snapshot, reset_snapshot
+from ._cache import get_cache
+from ._singleflight import flight_stats
+from ._ratelimit import configure_limiter, get_limiter
+from ._client import configure_client, get_client
+from ._registry import get_registry
+from ._connection import DB_MODE, DB_PATH, READ_ONLY
+from ._swap import SIDE_PATH, side_file_error
 from ._dimensions import get_dimensions
-from ._query import ILOStatQuery
-from .area_dimensions import filter_area_dimensions
+from ._search import search_areas, search_dataflows
+from ._query import DATA_FORMAT, ILOStatQuery
+from ._batch import query_many
+from ._pipeline import (
+    resolve_area_dimensions,
+    resolve_many_area_dimensions,
+    run_pipeline,
+)
+
+# Whether an ILOStat of this process has already validated the database, and
+# migrated, restored or built it if needed. That's only done once: an ILOStat
+# is created for every prompt, e.g. by the summarizer.
+_ready = False
+_ready_lock = threading.Lock()
 
 
 class ILOStat:
     """A class to interact with the ILOSTAT API, providing access to metadata,
     dataflows, and descriptions for various country and area data.
+
+    Areas, dataflows, labels and descriptions are looked up in an in-memory
+    snapshot of the database, shared by the instances of every language and
+    reloaded when the database changes.
     """
 
-    def __init__(self, language: Literal["en", "fr", "es"] = "en"):
+    def __init__(
+        self,
+        language: Literal["en", "fr", "es"] = "en",
+        refresh_ttl: float | None = METADATA_TTL,
+    ):
         """
-        Initializes the ILOStat instance with a specific language and checks
-        if the metadata is valid. If not, initializes metadata.
+        Initializes the ILOStat instance with a specific language. The first
+        instance of the process checks if the metadata is valid. If not, it
+        restores the snapshot bundled with the Docker image, or initializes
+        metadata if there's none. If the metadata is restored, or older than
+        refresh_ttl, it's refreshed in the background; later instances only
+        check its age, at most once per REFRESH_BACKOFF seconds.
+
+        If the database is opened read-only (ILO_PRISM_DB_MODE is 'ro' or
+        'immutable'), the metadata is only validated, since another process is
+        in charge of writing it.
 
         Parameters:
         - language: The language code ('en', 'fr', 'es') for data retrieval.
+        - refresh_ttl: Seconds after which the metadata is checked against
+          ILOSTAT again. None or 0 disables the background refresh.
         """
         if language not in ["en", "fr", "es"]:
             raise ValueError("Language must be one of 'en', 'fr', or 'es'")
 
         self.language = language
 
-        # Validate metadata; refresh if invalid
-        metadata_valid = self.__validate_metadata()
-        if not metadata_valid:
+        global _ready
+        if not _ready:
+            with _ready_lock:
+                if not _ready:
+                    self.__prepare_metadata(refresh_ttl)
+                    _ready = True
+                    return
+
+        # Later instances only check the age of the metadata, now and then
+        refresh_if_stale(refresh_ttl)
+
+    def __prepare_metadata(self, refresh_ttl: float | None):
+        """
+        Validates the metadata, and migrates, restores or builds it if needed.
+        Called by the first ILOStat of the process.
+
+        Parameters:
+        - refresh_ttl: Seconds after which the metadata is checked against
+          ILOSTAT again. None or 0 disables the background refresh.
+        """
+        # Processes that only read rely on another one to keep the metadata valid
+        if READ_ONLY:
+            if not self.__validate_metadata():
+                raise RuntimeError(
+                    f"{DB_PATH} doesn't hold valid metadata and this process opens "
+                    f"it in {DB_MODE!r} mode, so it can't build it"
+                )
+            return
+
+        # Upgrade the schema of an existing database in place
+        migrate_db()
+
+        # Validate metadata; restore the bundled snapshot if invalid
+        manifest = read_manifest()
+        restored = False
+        if not manifest_valid(manifest, latest_version()) and restore_bundle():
+            restored = True
+            manifest = read_manifest()
+            reset_snapshot()
+
+        # Refresh if still invalid. A restored snapshot is brought up to date in
+        # the background, like metadata older than refresh_ttl.
+        if not manifest_valid(manifest, latest_version()):
             print("Refreshing metadata...")
             self.__init_metadata()
+            reset_snapshot()
+        elif restored and refresh_ttl:
+            refresh_in_background()
+        else:
+            refresh_if_stale(refresh_ttl)
 
     def __validate_metadata(self) -> bool:
         """
@@ -46,12 +134,46 @@ class ILOStat:
     def __init_metadata(self):
         """
         Initializes metadata in the database by creating required tables and
-        populating data for areas, dataflows, and area-specific dataflows.
+        populating data for areas, dataflows, codelists and area-specific
+        dataflows.
+        If a previous build was interrupted, it is resumed from its last
+        checkpoint instead.
+
+        The metadata is built in a side file, which replaces the database once
+        it's complete, so the current metadata can be read in the meantime.
+
+        Raises:
+        - RuntimeError: If the side file isn't valid once the build is over, in
+          which case the database is left as it was.
+        """
+        if not build_metadata():
+            raise RuntimeError(
+                f"The metadata built in {SIDE_PATH} wasn't swapped in because "
+                f"{side_file_error()}"
+            )
+
+    def refresh_metadata(self, incremental: bool = True):
         """
-        init_db()
-        get_cl_areas()
-        get_dataflows()
-        get_area_dataflows()
+        Brings the metadata in the database up to date with ILOSTAT.
+
+        Parameters:
+        - incremental (bool): If True, only the dataflows that are new or whose
+          version changed are downloaded again. Otherwise, or if the database
+          isn't valid yet, all of the metadata is downloaded from scratch.
+
+        Raises:
+        - RuntimeError: If the refreshed metadata isn't valid, in which case the
+          database is left as it was.
+        """
+        if incremental and self.__validate_metadata():
+            if not refresh_metadata():
+                raise RuntimeError(
+                    f"The metadata refreshed in {SIDE_PATH} wasn't swapped in "
+                    f"because {side_file_error()}"
+                )
+        else:
+            self.__init_metadata()
+        reset_snapshot()
 
     def get_areas(self) -> list[tuple[str, str]]:
         """
@@ -60,43 +182,11 @@ class ILOStat:
         Returns:
         - list[tuple[str, str]]: A list of area names and their corresponding codes.
         """
-        with sqlite3.connect("store/ilo-prism.db", check_same_thread=False) as conn:
-            cursor = conn.cursor()
-            try:
-                cursor.execute(
-                    """
-                    SELECT cn.name, ca.code
-                    FROM cl_area AS ca
-                    JOIN cl_area_name AS cn ON ca.cl_area_uid = cn.cl_area_uid
-                    JOIN language AS l ON cn.language_uid = l.language_uid
-                    WHERE l.code = ?
-                    """,
-                    (self.language,),
-                )
-                results = cursor.fetchall()
-            finally:
-                cursor.close()  # Ensure cursor is closed
-        return results
+        return list(get_snapshot().areas.get(self.language, ()))
 
     def get_area_label(self, area: str):
         """Retrieves the label of an area based on the code"""
-        with sqlite3.connect("store/ilo-prism.db", check_same_thread=False) as conn:
-            cursor = conn.cursor()
-            try:
-                cursor.execute(
-                    """
-                    SELECT cn.name
-                    FROM cl_area AS ca
-                    JOIN cl_area_name AS cn ON ca.cl_area_uid = cn.cl_area_uid
-                    JOIN language AS l ON cn.language_uid = l.language_uid
-                    WHERE l.code = ? AND ca.code = ?;
-                    """,
-                    (self.language, area),
-                )
-                results = cursor.fetchone()
-                return results[0] if results else None
-            finally:
-                cursor.close()  # Ensure cursor is closed
+        return get_snapshot().area_labels.get((self.language, area))
 
     def get_dataflows(self, country: str):
         """
@@ -109,25 +199,7 @@ class ILOStat:
         - list[tuple[str, str]]: A list of dataflows, each represented by a tuple
                                   containing the name and code.
         """
-        with sqlite3.connect("store/ilo-prism.db", check_same_thread=False) as conn:
-            cursor = conn.cursor()
-            try:
-                cursor.execute(
-                    """
-                    SELECT dn.name, d.code
-                    FROM cl_area AS ca
-                    JOIN cl_area_dataflow AS cad ON ca.cl_area_uid = cad.cl_area_uid
-                    JOIN dataflow AS d ON cad.dataflow_uid = d.dataflow_uid
-                    JOIN dataflow_name AS dn ON d.dataflow_uid = dn.dataflow_uid
-                    JOIN language AS l ON dn.language_uid = l.language_uid
-                    WHERE ca.code = ? AND l.code = ?
-                    ORDER BY dn.name ASC;
-                    """,
-                    (country, self.language),
-                )
-                return cursor.fetchall()
-            finally:
-                cursor.close()  # Ensure cursor is closed
+        return list(get_snapshot().dataflows.get((country, self.language), ()))
 
     def get_dataflow_label(self, dataflow: str):
         """
@@ -139,23 +211,7 @@ class ILOStat:
         Returns:
         - str: The label of the dataflow, if found.
         """
-        with sqlite3.connect("store/ilo-prism.db", check_same_thread=False) as conn:
-            cursor = conn.cursor()
-            try:
-                cursor.execute(
-                    """
-                    SELECT dn.name
-                    FROM dataflow AS d
-                    JOIN dataflow_name AS dn ON d.dataflow_uid = dn.dataflow_uid
-                    JOIN language AS l ON dn.language_uid = l.language_uid
-                    WHERE d.code = ? AND l.code = ?
-                    """,
-                    (dataflow, self.language),
-                )
-                result = cursor.fetchone()
-                return result[0] if result else None
-            finally:
-                cursor.close()  # Ensure cursor is closed
+        return get_snapshot().dataflow_labels.get((dataflow, self.language))
 
     def get_dataflow_description(self, dataflow: str):
         """
@@ -167,27 +223,44 @@ class ILOStat:
         Returns:
         - tuple: The description of the dataflow, if found.
         """
-        with sqlite3.connect("store/ilo-prism.db", check_same_thread=False) as conn:
-            cursor = conn.cursor()
-            try:
-                cursor.execute(
-                    """
-                    SELECT dd.description
-                    FROM dataflow AS d
-                    JOIN dataflow_description AS dd ON d.dataflow_uid = dd.dataflow_uid
-                    JOIN language AS l ON dd.language_uid = l.language_uid
-                    WHERE d.code = ? AND l.code = ?
-                    """,
-                    (dataflow, self.language),
-                )
-                result = cursor.fetchone()
-                return result[0] if result else None
-            finally:
-                cursor.close()  # Ensure cursor is closed
+        return get_snapshot().dataflow_descriptions.get((dataflow, self.language))
+
+    def search_dataflows(self, area: str, text: str, limit: int = 20):
+        """
+        Searches the dataflows of an area by name and description, for
+        type-ahead suggestions.
+
+        Parameters:
+        - area (str): The area code, or None to search all dataflows.
+        - text (str): What the user typed. Every word matches the start of a word.
+        - limit (int): The maximum number of results.
+
+        Returns:
+        - list[tuple[str, str]]: The names and codes of the best matches, best
+          first. If the text is empty, the first dataflows of the area by name.
+        """
+        if not text or not text.strip():
+            return self.get_dataflows(area)[:limit] if area else []
+        return search_dataflows(text, self.language, area=area, limit=limit)
+
+    def search_areas(self, text: str, limit: int = 20):
+        """
+        Searches the areas by name, for type-ahead suggestions.
+
+        Parameters:
+        - text (str): What the user typed. Every word matches the start of a word.
+        - limit (int): The maximum number of results.
+
+        Returns:
+        - list[tuple[str, str]]: The names and codes of the best matches, best first.
+        """
+        return search_areas(text, self.language, limit=limit)
 
     def get_dimensions(self, df: str):
         """
-        Retrieves the dimensions available for a specified dataflow.
+        Retrieves the dimensions available for a specified dataflow. The
+        constraints of every dataflow are stored during ingestion, so this
+        doesn't make any requests to the API.
 
         Parameters:
         - df (str): The dataflow code to retrieve dimensions for.
@@ -198,14 +271,170 @@ class ILOStat:
         return get_dimensions(df, self.language)
 
     def get_area_dimensions(self, area, dataflow):
-        all_dimensions = self.get_dimensions(dataflow)
-        filtered_dimensions = filter_area_dimensions(
-            area=area, all_dimensions=all_dimensions, dataflow=dataflow
+        """
+        Retrieves the dimension values and years that a dataflow has for an
+        area. Only the first and last observation of each series are downloaded
+        when the API allows it. The stored dimensions are looked up while the
+        structure of the dataflow is fetched.
+
+        Parameters:
+        - area (str): The country/area code.
+        - dataflow (str): The dataflow code.
+
+        Returns:
+        - list: The dimensions of get_dimensions() that the area has, followed
+          by its TIME_PERIOD values.
+        """
+        return run_pipeline(self.get_area_dimensions_async(area, dataflow))
+
+    async def get_area_dimensions_async(self, area, dataflow):
+        """
+        Like get_area_dimensions(), for async callers, e.g. async Gradio handlers.
+        The blocking steps run in threads of their own, so the event loop isn't
+        held up.
+
+        Parameters:
+        - area (str): The country/area code.
+        - dataflow (str): The dataflow code.
+
+        Returns:
+        - list: The dimensions of the dataflow that the area has.
+        """
+        return await resolve_area_dimensions(area, dataflow, self.language)
+
+    async def get_many_area_dimensions_async(self, selections):
+        """
+        Retrieves the dimensions of several areas and dataflows concurrently,
+        fetching the structure of each dataflow once.
+
+        Parameters:
+        - selections (list[tuple[str, str]]): (area, dataflow) pairs.
+
+        Returns:
+        - list: The dimensions of each pair, in the same order, or the exception
+          raised while retrieving them.
+        """
+        return await resolve_many_area_dimensions(selections, self.language)
+
+    @property
+    def client(self):
+        """
+        The SDMX client that the ingestion of the process shares, e.g. to build
+        and refresh the metadata. Its responses aren't cached, so it always sees
+        the current metadata, and its requests have bulk priority.
+
+        The queries made on behalf of users go through query_client instead.
+        Both clients keep their connections to the API open between requests.
+
+        Returns:
+        - sdmx.Client: The shared uncached client.
+        """
+        return get_client()
+
+    @property
+    def query_client(self):
+        """
+        The SDMX client that the queries of every ILOStat instance share, e.g.
+        for data, structures and area dimensions. Its responses are cached and
+        its requests go before the ingestion's.
+
+        Returns:
+        - sdmx.Client: The shared cached client.
+        """
+        return get_client(cached=True)
+
+    @staticmethod
+    def configure_client(
+        pool_size: int = None,
+        timeout: float | tuple[float, float] = None,
+        compression: bool = None,
+        url: str = None,
+    ):
+        """
+        Changes the settings of the shared SDMX client. This is best done once,
+        before the first request.
+
+        Parameters:
+        - pool_size (int): Connections to the API kept open for reuse.
+        - timeout (float | tuple[float, float]): Seconds to wait for the API, or
+          for a connection and then for the response.
+        - compression (bool): Whether to ask for compressed responses.
+        - url (str): The SDMX REST API to send requests to instead of ILOSTAT's.
+        """
+        configure_client(
+            pool_size=pool_size, timeout=timeout, compression=compression, url=url
         )
-        return filtered_dimensions
+
+    @staticmethod
+    def cache_stats() -> dict:
+        """
+        Returns the counters of the cache of SDMX responses shared by the process.
+
+        Returns:
+        - dict: Hits in memory and on disk, misses, expired entries, evictions
+          from memory and stored responses, with the entries and bytes in memory.
+        """
+        return get_cache().stats()
+
+    @staticmethod
+    def single_flight_stats() -> dict:
+        """
+        Returns how many identical requests were made at the same time and
+        shared one upstream fetch instead, by kind of request.
+
+        Returns:
+        - dict: The counters of each kind ("data", "area_values", "structure"),
+          e.g. {"data": {"calls": 40, "executions": 3, "coalesced": 37, ...}}
+        """
+        return flight_stats()
+
+    @staticmethod
+    def rate_limit_stats() -> dict:
+        """
+        Returns the counters of the limiter of the requests to the API, shared
+        by the ingestion and the queries of users.
+
+        Returns:
+        - dict: Requests sent, by priority, throttled and failed ones, latency
+          spikes, decreases of the limit and seconds spent waiting, with the
+          current limit of requests in flight.
+        """
+        return get_limiter().stats()
+
+    @staticmethod
+    def configure_rate_limit(
+        rate: float = None, burst: float = None, max_concurrency: int = None
+    ):
+        """
+        Changes the settings of the limiter of the requests to the API.
+
+        Parameters:
+        - rate (float): Requests per second, on average.
+        - burst (float): Requests that can be sent at once after a quiet spell.
+        - max_concurrency (int): The most requests in flight at the same time.
+        """
+        configure_limiter(rate=rate, burst=burst, max_concurrency=max_concurrency)
+
+    def get_dataflow_structure(self, dataflow: str):
+        """
+        Retrieves the parsed structure of a dataflow from the DSD registry shared
+        by the process. It's downloaded the first time only.
+
+        Parameters:
+        - dataflow (str): The dataflow code.
+
+        Returns:
+        - DataflowStructure: The DSD of the dataflow and the codelists of its
+          dimensions.
+        """
+        return get_registry().get(dataflow)
 
     def query(
-        self, dataflow: str, dimensions: dict[str, str], params: dict[str, str] = None
+        self,
+        dataflow: str,
+        dimensions: dict[str, str],
+        params: dict[str, str] = None,
+        data_format: str = DATA_FORMAT,
     ):
         """
         Initializes an ILOStatQuery object with the specified dataflow, dimensions,
@@ -214,6 +443,8 @@ class ILOStat:
         - dataflow (str): The dataflow code to query.
         - dimensions (dict[str, str]): Key-value pairs representing dimension constraints.
         - params (dict[str, str]): Additional parameters for the query.
+        - data_format (str): How to ask for the data: "sdmx-ml", or "csv", which
+          is parsed faster and falls back to SDMX-ML if the API doesn't serve it.
 
         Returns:
         - ILOStatQuery: An ILOStatQuery object
@@ -223,6 +454,41 @@ class ILOStat:
             dimensions=dimensions,
             params=params,
             language=self.language,
+            data_format=data_format,
+        )
+
+    def query_many(
+        self,
+        dataflows: list[str],
+        areas: list[str],
+        dimensions: dict[str, str] = None,
+        params: dict[str, str] = None,
+        data_format: str = DATA_FORMAT,
+    ):
+        """
+        Queries several dataflows for several areas at once, e.g. to compare
+        countries. The areas are grouped into '+'-joined keys, as few as fit in
+        a URL, and the requests are sent concurrently.
+
+        Parameters:
+        - dataflows (list[str]): The dataflow codes to query.
+        - areas (list[str]): The area codes, e.g. ["X01", "ITA", "FRA"].
+        - dimensions (dict[str, str]): Dimension constraints other than REF_AREA,
+          applied to the dataflows that have them.
+        - params (dict[str, str]): Additional parameters for the queries.
+        - data_format (str): How to ask for the data, "sdmx-ml" or "csv".
+
+        Returns:
+        - BatchResult: The merged data frame of every request that succeeded,
+          with a DATAFLOW column, and the errors of those that failed.
+        """
+        return query_many(
+            dataflows,
+            areas,
+            dimensions=dimensions,
+            params=params,
+            language=self.language,
+            data_format=data_format,
         )
 
 
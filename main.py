@@ -26,6 +26,12 @@ areas_dropdown = gr.Dropdown(
     label="Select a geographic region", choices=initial.areas, value=initial.area
 )
 
+# Search box narrowing down the dataflows (indicators) as the user types
+dataflows_search = gr.Textbox(
+    label="Search for an indicator",
+    placeholder="e.g. unemployment rate",
+)
+
 # Dropdown for dataflows (indicators) with dynamic choices
 dataflows_dropdown = gr.Dropdown(
     label="Select an indicator from ILOSTAT",
@@ -91,7 +97,10 @@ with gr.Blocks(fill_height=True) as demo:
             with gr.Row():
                 areas_dropdown.render()
 
-            # Render dropdown for dataflow selection
+            # Render search box and dropdown for dataflow selection
+            with gr.Row():
+                dataflows_search.render()
+
             with gr.Row():
                 dataflows_dropdown.render()
 
@@ -245,7 +254,18 @@ with gr.Blocks(fill_height=True) as demo:
     # ===========================
 
     # Event to populate dataflows based on selected area
-    areas_dropdown.change(control.set_dataflows, areas_dropdown, dataflows_dropdown)
+    areas_dropdown.change(
+        control.set_dataflows, [areas_dropdown, dataflows_search], dataflows_dropdown
+    )
+
+    # Event to suggest the best matching dataflows as the user types
+    dataflows_search.input(
+        control.set_dataflows,
+        [areas_dropdown, dataflows_search],
+        dataflows_dropdown,
+        trigger_mode="always_last",
+        show_progress="hidden",
+    )
 
     # Event to set dimension details based on selected dataflow
     dataflows_dropdown.input(
@@ -0,0 +1,142 @@
+-- Version 1: the tables of the metadata store.
+--
+-- Databases created before schema versions were tracked have user_version 0 and
+-- may lack some of these tables, so they are only created if they don't exist.
+-- Columns added to existing tables are handled by the migration hook in
+-- ilostat/_migrate.py.
+
+-- Table for languages
+CREATE TABLE IF NOT EXISTS language (
+  language_uid INTEGER PRIMARY KEY,
+  code TEXT NOT NULL UNIQUE,
+  name TEXT NOT NULL
+);
+
+-- Insert languages
+INSERT OR IGNORE INTO language (code, name)
+VALUES ('en', 'english'), ('fr', 'français'), ('es', 'español');
+
+-- Main table for areas
+CREATE TABLE IF NOT EXISTS cl_area (
+  cl_area_uid INTEGER PRIMARY KEY,
+  code TEXT NOT NULL UNIQUE
+);
+
+-- Table for area translations
+CREATE TABLE IF NOT EXISTS cl_area_name (
+  cl_area_name_uid INTEGER PRIMARY KEY,
+  cl_area_uid INTEGER NOT NULL,
+  language_uid INTEGER NOT NULL,
+  name TEXT NOT NULL,
+  FOREIGN KEY (cl_area_uid) REFERENCES cl_area(cl_area_uid),
+  FOREIGN KEY (language_uid) REFERENCES language(language_uid)
+);
+
+-- A dataflow in ILOSTAT together with the version and the annotation timestamps
+-- it had when its metadata was last downloaded
+CREATE TABLE IF NOT EXISTS dataflow (
+  dataflow_uid INTEGER PRIMARY KEY,
+  code TEXT NOT NULL UNIQUE,
+  version TEXT,
+  updated TEXT
+);
+
+-- Table for dataflow translations
+CREATE TABLE IF NOT EXISTS dataflow_name (
+  dataflow_name_uid INTEGER PRIMARY KEY,
+  dataflow_uid INTEGER NOT NULL,
+  language_uid INTEGER NOT NULL,
+  name TEXT NOT NULL,
+  FOREIGN KEY (dataflow_uid) REFERENCES dataflow(dataflow_uid),
+  FOREIGN KEY (language_uid) REFERENCES language(language_uid)
+);
+
+-- Table for dataflow descriptions
+CREATE TABLE IF NOT EXISTS dataflow_description (
+  dataflow_description_uid INTEGER PRIMARY KEY,
+  dataflow_uid INTEGER NOT NULL,
+  language_uid INTEGER NOT NULL,
+  description TEXT NOT NULL,
+  FOREIGN KEY (dataflow_uid) REFERENCES dataflow(dataflow_uid),
+  FOREIGN KEY (language_uid) REFERENCES language(language_uid)
+);
+
+-- An area that is included in a dataflow in ILOSTAT
+CREATE TABLE IF NOT EXISTS cl_area_dataflow (
+  area_dataflow_uid INTEGER PRIMARY KEY,
+  cl_area_uid INTEGER NOT NULL,
+  dataflow_uid INTEGER NOT NULL,
+  FOREIGN KEY (cl_area_uid) REFERENCES cl_area(cl_area_uid),
+  FOREIGN KEY (dataflow_uid) REFERENCES dataflow(dataflow_uid)
+);
+
+-- A codelist used by the dimensions of the dataflows, e.g. CL_SEX
+CREATE TABLE IF NOT EXISTS codelist (
+  codelist_uid INTEGER PRIMARY KEY,
+  code TEXT NOT NULL UNIQUE
+);
+
+-- Table for codelist translations
+CREATE TABLE IF NOT EXISTS codelist_name (
+  codelist_name_uid INTEGER PRIMARY KEY,
+  codelist_uid INTEGER NOT NULL,
+  language_uid INTEGER NOT NULL,
+  name TEXT NOT NULL,
+  UNIQUE (codelist_uid, language_uid),
+  FOREIGN KEY (codelist_uid) REFERENCES codelist(codelist_uid),
+  FOREIGN KEY (language_uid) REFERENCES language(language_uid)
+);
+
+-- A code of a codelist, e.g. SEX_F
+CREATE TABLE IF NOT EXISTS code (
+  code_uid INTEGER PRIMARY KEY,
+  codelist_uid INTEGER NOT NULL,
+  code TEXT NOT NULL,
+  UNIQUE (codelist_uid, code),
+  FOREIGN KEY (codelist_uid) REFERENCES codelist(codelist_uid)
+);
+
+-- Table for code translations
+CREATE TABLE IF NOT EXISTS code_name (
+  code_name_uid INTEGER PRIMARY KEY,
+  code_uid INTEGER NOT NULL,
+  language_uid INTEGER NOT NULL,
+  name TEXT NOT NULL,
+  UNIQUE (code_uid, language_uid),
+  FOREIGN KEY (code_uid) REFERENCES code(code_uid),
+  FOREIGN KEY (language_uid) REFERENCES language(language_uid)
+);
+
+-- A dimension of a dataflow that is constrained to some of the codes of its codelist
+CREATE TABLE IF NOT EXISTS dataflow_dimension (
+  dataflow_dimension_uid INTEGER PRIMARY KEY,
+  dataflow_uid INTEGER NOT NULL,
+  dimension TEXT NOT NULL,
+  codelist_uid INTEGER NOT NULL,
+  position INTEGER NOT NULL,
+  UNIQUE (dataflow_uid, dimension),
+  FOREIGN KEY (dataflow_uid) REFERENCES dataflow(dataflow_uid),
+  FOREIGN KEY (codelist_uid) REFERENCES codelist(codelist_uid)
+);
+
+-- A code included in the constraints of a dataflow dimension
+CREATE TABLE IF NOT EXISTS dataflow_dimension_code (
+  dataflow_dimension_uid INTEGER NOT NULL,
+  code_uid INTEGER NOT NULL,
+  position INTEGER NOT NULL,
+  PRIMARY KEY (dataflow_dimension_uid, code_uid),
+  FOREIGN KEY (dataflow_dimension_uid) REFERENCES dataflow_dimension(dataflow_dimension_uid),
+  FOREIGN KEY (code_uid) REFERENCES code(code_uid)
+);
+
+-- Progress of the metadata ingestion, so that an interrupted build can be resumed.
+-- A row with an empty item records that a whole stage ran to completion.
+CREATE TABLE IF NOT EXISTS ingest_checkpoint (
+  stage TEXT NOT NULL,
+  item TEXT NOT NULL DEFAULT '',
+  status TEXT NOT NULL CHECK (status IN ('done', 'failed')),
+  attempts INTEGER NOT NULL DEFAULT 0,
+  error TEXT,
+  updated_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  PRIMARY KEY (stage, item)
+);
@@ -0,0 +1,88 @@
+-- Version 2: uniqueness constraints and covering indexes for the ILOStat getters.
+--
+-- The translation and mapping tables had no UNIQUE constraints, so INSERT OR IGNORE
+-- never deduplicated anything. They are rebuilt with the constraints, keeping the
+-- first copy of any duplicated row.
+
+-- Table for area translations
+CREATE TABLE cl_area_name_new (
+  cl_area_name_uid INTEGER PRIMARY KEY,
+  cl_area_uid INTEGER NOT NULL,
+  language_uid INTEGER NOT NULL,
+  name TEXT NOT NULL,
+  UNIQUE (cl_area_uid, language_uid),
+  FOREIGN KEY (cl_area_uid) REFERENCES cl_area(cl_area_uid),
+  FOREIGN KEY (language_uid) REFERENCES language(language_uid)
+);
+
+INSERT OR IGNORE INTO cl_area_name_new
+SELECT * FROM cl_area_name ORDER BY cl_area_name_uid;
+
+DROP TABLE cl_area_name;
+ALTER TABLE cl_area_name_new RENAME TO cl_area_name;
+
+-- Table for dataflow translations
+CREATE TABLE dataflow_name_new (
+  dataflow_name_uid INTEGER PRIMARY KEY,
+  dataflow_uid INTEGER NOT NULL,
+  language_uid INTEGER NOT NULL,
+  name TEXT NOT NULL,
+  UNIQUE (dataflow_uid, language_uid),
+  FOREIGN KEY (dataflow_uid) REFERENCES dataflow(dataflow_uid),
+  FOREIGN KEY (language_uid) REFERENCES language(language_uid)
+);
+
+INSERT OR IGNORE INTO dataflow_name_new
+SELECT * FROM dataflow_name ORDER BY dataflow_name_uid;
+
+DROP TABLE dataflow_name;
+ALTER TABLE dataflow_name_new RENAME TO dataflow_name;
+
+-- Table for dataflow descriptions
+CREATE TABLE dataflow_description_new (
+  dataflow_description_uid INTEGER PRIMARY KEY,
+  dataflow_uid INTEGER NOT NULL,
+  language_uid INTEGER NOT NULL,
+  description TEXT NOT NULL,
+  UNIQUE (dataflow_uid, language_uid),
+  FOREIGN KEY (dataflow_uid) REFERENCES dataflow(dataflow_uid),
+  FOREIGN KEY (language_uid) REFERENCES language(language_uid)
+);
+
+INSERT OR IGNORE INTO dataflow_description_new
+SELECT * FROM dataflow_description ORDER BY dataflow_description_uid;
+
+DROP TABLE dataflow_description;
+ALTER TABLE dataflow_description_new RENAME TO dataflow_description;
+
+-- An area that is included in a dataflow in ILOSTAT
+CREATE TABLE cl_area_dataflow_new (
+  area_dataflow_uid INTEGER PRIMARY KEY,
+  cl_area_uid INTEGER NOT NULL,
+  dataflow_uid INTEGER NOT NULL,
+  UNIQUE (cl_area_uid, dataflow_uid),
+  FOREIGN KEY (cl_area_uid) REFERENCES cl_area(cl_area_uid),
+  FOREIGN KEY (dataflow_uid) REFERENCES dataflow(dataflow_uid)
+);
+
+INSERT OR IGNORE INTO cl_area_dataflow_new
+SELECT * FROM cl_area_dataflow ORDER BY area_dataflow_uid;
+
+DROP TABLE cl_area_dataflow;
+ALTER TABLE cl_area_dataflow_new RENAME TO cl_area_dataflow;
+
+-- get_areas: the names of all areas in a language
+CREATE INDEX cl_area_name_language ON cl_area_name (language_uid, cl_area_uid, name);
+
+-- get_area_label: the name of an area in a language
+CREATE INDEX cl_area_name_label ON cl_area_name (cl_area_uid, language_uid, name);
+
+-- get_dataflows, get_dataflow_label: the name of a dataflow in a language
+CREATE INDEX dataflow_name_label ON dataflow_name (dataflow_uid, language_uid, name);
+
+-- get_dataflow_description: the description of a dataflow in a language
+CREATE INDEX dataflow_description_label
+ON dataflow_description (dataflow_uid, language_uid, description);
+
+-- Removing the mapping of a dataflow during a refresh
+CREATE INDEX cl_area_dataflow_dataflow ON cl_area_dataflow (dataflow_uid);
@@ -0,0 +1,15 @@
+-- Version 3: a manifest of the metadata, so that it can be validated with a single
+-- primary key lookup instead of counting the rows of every table.
+--
+-- Databases that were already fully ingested get a manifest from the migration hook
+-- in ilostat/_migrate.py.
+
+-- The one row describing the metadata in the database
+CREATE TABLE IF NOT EXISTS metadata_manifest (
+  manifest_uid INTEGER PRIMARY KEY CHECK (manifest_uid = 1),
+  schema_version INTEGER NOT NULL,
+  status TEXT NOT NULL CHECK (status IN ('building', 'complete')),
+  built_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  checked_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  row_counts TEXT NOT NULL DEFAULT '{}'
+);
@@ -0,0 +1,4 @@
+-- Version 4: an identifier of the data in the database, which changes whenever the
+-- ingestion writes the manifest, so that the in-memory snapshot of the metadata
+-- knows when to reload.
+ALTER TABLE metadata_manifest ADD COLUMN build_id TEXT NOT NULL DEFAULT '';
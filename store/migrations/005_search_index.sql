@@ -0,0 +1,23 @@
+-- Version 5: full-text search over the names and descriptions of the dataflows and
+-- the names of the areas, in every language. The indexes are filled by the
+-- ingestion, and by the migration hook in ilostat/_migrate.py for databases that
+-- were already ingested.
+
+-- Search index of the dataflows
+CREATE VIRTUAL TABLE IF NOT EXISTS dataflow_search USING fts5(
+  name,
+  description,
+  language UNINDEXED,
+  dataflow_uid UNINDEXED,
+  tokenize = 'unicode61 remove_diacritics 2',
+  prefix = '2 3'
+);
+
+-- Search index of the areas
+CREATE VIRTUAL TABLE IF NOT EXISTS area_search USING fts5(
+  name,
+  language UNINDEXED,
+  cl_area_uid UNINDEXED,
+  tokenize = 'unicode61 remove_diacritics 2',
+  prefix = '2 3'
+);
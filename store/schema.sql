@@ -2,9 +2,19 @@ DROP TABLE IF EXISTS cl_area_name;
 DROP TABLE IF EXISTS dataflow_name;
 DROP TABLE IF EXISTS dataflow_description;
 DROP TABLE IF EXISTS cl_area_dataflow;
+DROP TABLE IF EXISTS dataflow_dimension_code;
+DROP TABLE IF EXISTS dataflow_dimension;
+DROP TABLE IF EXISTS code_name;
+DROP TABLE IF EXISTS code;
+DROP TABLE IF EXISTS codelist_name;
+DROP TABLE IF EXISTS codelist;
 DROP TABLE IF EXISTS cl_area;
 DROP TABLE IF EXISTS dataflow;
 DROP TABLE IF EXISTS language;
+DROP TABLE IF EXISTS ingest_checkpoint;
+DROP TABLE IF EXISTS metadata_manifest;
+DROP TABLE IF EXISTS dataflow_search;
+DROP TABLE IF EXISTS area_search;
 
 -- Table for languages
 CREATE TABLE language (
@@ -29,14 +39,18 @@ CREATE TABLE cl_area_name (
   cl_area_uid INTEGER NOT NULL,
   language_uid INTEGER NOT NULL,
   name TEXT NOT NULL,
+  UNIQUE (cl_area_uid, language_uid),
   FOREIGN KEY (cl_area_uid) REFERENCES cl_area(cl_area_uid),
   FOREIGN KEY (language_uid) REFERENCES language(language_uid)
 );
 
--- A dataflow in ILOSTAT
+-- A dataflow in ILOSTAT together with the version and the annotation timestamps
+-- it had when its metadata was last downloaded
 CREATE TABLE dataflow (
   dataflow_uid INTEGER PRIMARY KEY,
-  code TEXT NOT NULL UNIQUE
+  code TEXT NOT NULL UNIQUE,
+  version TEXT,
+  updated TEXT
 );
 
 -- Table for dataflow translations
@@ -45,6 +59,7 @@ CREATE TABLE dataflow_name (
   dataflow_uid INTEGER NOT NULL,
   language_uid INTEGER NOT NULL,
   name TEXT NOT NULL,
+  UNIQUE (dataflow_uid, language_uid),
   FOREIGN KEY (dataflow_uid) REFERENCES dataflow(dataflow_uid),
   FOREIGN KEY (language_uid) REFERENCES language(language_uid)
 );
@@ -55,6 +70,7 @@ CREATE TABLE dataflow_description (
   dataflow_uid INTEGER NOT NULL,
   language_uid INTEGER NOT NULL,
   description TEXT NOT NULL,
+  UNIQUE (dataflow_uid, language_uid),
   FOREIGN KEY (dataflow_uid) REFERENCES dataflow(dataflow_uid),
   FOREIGN KEY (language_uid) REFERENCES language(language_uid)
 );
@@ -64,6 +80,123 @@ CREATE TABLE cl_area_dataflow (
   area_dataflow_uid INTEGER PRIMARY KEY,
   cl_area_uid INTEGER NOT NULL,
   dataflow_uid INTEGER NOT NULL,
+  UNIQUE (cl_area_uid, dataflow_uid),
   FOREIGN KEY (cl_area_uid) REFERENCES cl_area(cl_area_uid),
   FOREIGN KEY (dataflow_uid) REFERENCES dataflow(dataflow_uid)
 );
+
+-- A codelist used by the dimensions of the dataflows, e.g. CL_SEX
+CREATE TABLE codelist (
+  codelist_uid INTEGER PRIMARY KEY,
+  code TEXT NOT NULL UNIQUE
+);
+
+-- Table for codelist translations
+CREATE TABLE codelist_name (
+  codelist_name_uid INTEGER PRIMARY KEY,
+  codelist_uid INTEGER NOT NULL,
+  language_uid INTEGER NOT NULL,
+  name TEXT NOT NULL,
+  UNIQUE (codelist_uid, language_uid),
+  FOREIGN KEY (codelist_uid) REFERENCES codelist(codelist_uid),
+  FOREIGN KEY (language_uid) REFERENCES language(language_uid)
+);
+
+-- A code of a codelist, e.g. SEX_F
+CREATE TABLE code (
+  code_uid INTEGER PRIMARY KEY,
+  codelist_uid INTEGER NOT NULL,
+  code TEXT NOT NULL,
+  UNIQUE (codelist_uid, code),
+  FOREIGN KEY (codelist_uid) REFERENCES codelist(codelist_uid)
+);
+
+-- Table for code translations
+CREATE TABLE code_name (
+  code_name_uid INTEGER PRIMARY KEY,
+  code_uid INTEGER NOT NULL,
+  language_uid INTEGER NOT NULL,
+  name TEXT NOT NULL,
+  UNIQUE (code_uid, language_uid),
+  FOREIGN KEY (code_uid) REFERENCES code(code_uid),
+  FOREIGN KEY (language_uid) REFERENCES language(language_uid)
+);
+
+-- A dimension of a dataflow that is constrained to some of the codes of its codelist
+CREATE TABLE dataflow_dimension (
+  dataflow_dimension_uid INTEGER PRIMARY KEY,
+  dataflow_uid INTEGER NOT NULL,
+  dimension TEXT NOT NULL,
+  codelist_uid INTEGER NOT NULL,
+  position INTEGER NOT NULL,
+  UNIQUE (dataflow_uid, dimension),
+  FOREIGN KEY (dataflow_uid) REFERENCES dataflow(dataflow_uid),
+  FOREIGN KEY (codelist_uid) REFERENCES codelist(codelist_uid)
+);
+
+-- A code included in the constraints of a dataflow dimension
+CREATE TABLE dataflow_dimension_code (
+  dataflow_dimension_uid INTEGER NOT NULL,
+  code_uid INTEGER NOT NULL,
+  position INTEGER NOT NULL,
+  PRIMARY KEY (dataflow_dimension_uid, code_uid),
+  FOREIGN KEY (dataflow_dimension_uid) REFERENCES dataflow_dimension(dataflow_dimension_uid),
+  FOREIGN KEY (code_uid) REFERENCES code(code_uid)
+);
+
+-- Covering indexes for the ILOStat getters
+CREATE INDEX cl_area_name_language ON cl_area_name (language_uid, cl_area_uid, name);
+CREATE INDEX cl_area_name_label ON cl_area_name (cl_area_uid, language_uid, name);
+CREATE INDEX dataflow_name_label ON dataflow_name (dataflow_uid, language_uid, name);
+CREATE INDEX dataflow_description_label
+ON dataflow_description (dataflow_uid, language_uid, description);
+CREATE INDEX cl_area_dataflow_dataflow ON cl_area_dataflow (dataflow_uid);
+
+-- Full-text search over the names and descriptions of the dataflows and the names
+-- of the areas, in every language. Rebuilt at the end of every ingestion.
+CREATE VIRTUAL TABLE dataflow_search USING fts5(
+  name,
+  description,
+  language UNINDEXED,
+  dataflow_uid UNINDEXED,
+  tokenize = 'unicode61 remove_diacritics 2',
+  prefix = '2 3'
+);
+
+CREATE VIRTUAL TABLE area_search USING fts5(
+  name,
+  language UNINDEXED,
+  cl_area_uid UNINDEXED,
+  tokenize = 'unicode61 remove_diacritics 2',
+  prefix = '2 3'
+);
+
+-- Progress of the metadata ingestion, so that an interrupted build can be resumed.
+-- A row with an empty item records that a whole stage ran to completion.
+CREATE TABLE ingest_checkpoint (
+  stage TEXT NOT NULL,
+  item TEXT NOT NULL DEFAULT '',
+  status TEXT NOT NULL CHECK (status IN ('done', 'failed')),
+  attempts INTEGER NOT NULL DEFAULT 0,
+  error TEXT,
+  updated_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  PRIMARY KEY (stage, item)
+);
+
+-- The one row describing the metadata in the database: the schema version it was
+-- built for, whether the build completed, when it was built and last checked
+-- against ILOSTAT, the row counts of its tables as JSON, and an identifier that
+-- changes whenever the data does
+CREATE TABLE metadata_manifest (
+  manifest_uid INTEGER PRIMARY KEY CHECK (manifest_uid = 1),
+  schema_version INTEGER NOT NULL,
+  status TEXT NOT NULL CHECK (status IN ('building', 'complete')),
+  built_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  checked_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  row_counts TEXT NOT NULL DEFAULT '{}',
+  build_id TEXT NOT NULL DEFAULT ''
+);
+
+-- The version of the schema. Older databases are upgraded by the migrations in
+-- store/migrations, see ilostat/_migrate.py
+PRAGMA user_version = 5;
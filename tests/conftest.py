@@ -0,0 +1,31 @@
+import os
+import tempfile
+
+# Keep the database, caches and structures of the tests apart from the app's.
+# ilostat reads these when it's imported, so they're set before anything else.
+TMP_DIR = tempfile.mkdtemp(prefix="ilo-prism-tests-")
+os.environ["ILO_PRISM_DB"] = os.path.join(TMP_DIR, "ilo-prism.db")
+os.environ["ILO_PRISM_DB_MODE"] = "rw"
+os.environ["ILO_PRISM_CACHE"] = ""
+os.environ["ILO_PRISM_DSD_DIR"] = os.path.join(TMP_DIR, "dsd")
+
+import pytest  # noqa: E402
+import ilostat.ilostat  # noqa: E402
+import ilostat._refresh  # noqa: E402
+from ilostat._connection import DB_PATH, close_connection  # noqa: E402
+from ilostat._snapshot import reset_snapshot  # noqa: E402
+from ilostat._swap import SIDE_PATH, remove_side_file  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def empty_db(monkeypatch):
+    """Start every test without a database, as a new process would."""
+    close_connection()
+    remove_side_file(DB_PATH)
+    remove_side_file(SIDE_PATH)
+    reset_snapshot()
+    monkeypatch.setattr(ilostat.ilostat, "_ready", False)
+    monkeypatch.setattr(ilostat._refresh, "_last_attempt", None)
+    monkeypatch.setattr(ilostat._refresh, "_last_check", None)
+    yield
+    close_connection()
@@ -0,0 +1,80 @@
+import os
+import sqlite3
+import ilostat.ilostat
+import ilostat._refresh
+from ilostat.ilostat import ILOStat
+from ilostat._connection import DB_PATH
+from ilostat._manifest import manifest_valid, read_manifest
+from ilostat._migrate import latest_version, migrate_db
+
+BASELINE_SCHEMA = os.path.join(os.path.dirname(__file__), "data", "baseline_schema.sql")
+
+
+def build_baseline_db(path: str):
+    """Write a fully ingested database with the schema from before versioning."""
+    con = sqlite3.connect(path)
+    with open(BASELINE_SCHEMA) as f:
+        con.executescript(f.read())
+    languages = [uid for (uid,) in con.execute("SELECT language_uid FROM language")]
+    for code in ["ITA", "FRA", "X01"]:
+        uid = con.execute("INSERT INTO cl_area(code) VALUES(?)", (code,)).lastrowid
+        con.executemany(
+            "INSERT INTO cl_area_name(cl_area_uid, language_uid, name) VALUES(?, ?, ?)",
+            [(uid, language, f"Area {code}") for language in languages],
+        )
+    for code in ["DF_A", "DF_B"]:
+        uid = con.execute("INSERT INTO dataflow(code) VALUES(?)", (code,)).lastrowid
+        for table, column in [
+            ("dataflow_name", "name"),
+            ("dataflow_description", "description"),
+        ]:
+            con.executemany(
+                f"INSERT INTO {table}(dataflow_uid, language_uid, {column}) VALUES(?, ?, ?)",
+                [(uid, language, f"{column} of {code}") for language in languages],
+            )
+        con.execute(
+            "INSERT INTO cl_area_dataflow(cl_area_uid, dataflow_uid) VALUES(1, ?)",
+            (uid,),
+        )
+    con.commit()
+    con.close()
+
+
+def test_migrate_baseline_db_in_place():
+    build_baseline_db(DB_PATH)
+
+    migrate_db()
+
+    con = sqlite3.connect(DB_PATH)
+    assert con.execute("PRAGMA user_version").fetchone()[0] == latest_version()
+    assert manifest_valid(read_manifest(con), latest_version())
+
+    # The dataflows are downloaded again, with their constraints, by the next
+    # refresh
+    versions = con.execute("SELECT version, updated FROM dataflow").fetchall()
+    assert versions == [(None, None), (None, None)]
+    con.close()
+
+
+def test_migrated_baseline_db_isnt_built_again(monkeypatch):
+    build_baseline_db(DB_PATH)
+
+    def build(self):
+        raise AssertionError("the metadata was built again from scratch")
+
+    refreshes = []
+    monkeypatch.setattr(ILOStat, "_ILOStat__init_metadata", build)
+    monkeypatch.setattr(ilostat.ilostat, "restore_bundle", lambda: False)
+    monkeypatch.setattr(
+        ilostat._refresh, "refresh_in_background", lambda: refreshes.append(True)
+    )
+
+    en = ILOStat("en")
+
+    assert sorted(en.get_areas()) == [
+        ("Area FRA", "FRA"),
+        ("Area ITA", "ITA"),
+        ("Area X01", "X01"),
+    ]
+    assert en.get_dataflows("ITA") != []
+    assert refreshes == [True]
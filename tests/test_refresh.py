@@ -0,0 +1,152 @@
+import sqlite3
+import pytest
+import requests
+import ilostat._area_dataflow
+import ilostat._client
+from sdmx.message import StructureMessage
+from sdmx.model import common, v21
+from ilostat._connection import DB_PATH
+from ilostat._refresh import build_metadata, refresh_metadata
+
+LANGUAGES = ["en", "fr", "es"]
+
+
+def localized(text: str) -> dict[str, str]:
+    return {lang: f"{text} ({lang})" for lang in LANGUAGES}
+
+
+class FakeClient:
+    """An SDMX client answering from memory, with the structures ILOSTAT has."""
+
+    def __init__(self):
+        self.session = requests.Session()
+        self.areas = ["ITA", "FRA"]
+        self.sex = common.Codelist(id="CL_SEX", name=localized("Sex"))
+        for code in ["SEX_T", "SEX_M", "SEX_F"]:
+            self.sex.append(common.Code(id=code, name=localized(code)))
+        self.dataflows = {}
+        self.constraints = {}
+        self.failing = set()
+        self.requests = []
+
+    def add_dataflow(self, code: str, areas: list[str], version: str = "1.0"):
+        self.dataflows[code] = v21.DataflowDefinition(
+            id=code,
+            version=version,
+            name=localized(code),
+            description=localized(f"About {code}"),
+        )
+        self.constraints[code] = areas
+
+    def codelist(self, resource_id=None, **kwargs):
+        msg = StructureMessage()
+        if resource_id == "CL_AREA":
+            areas = common.Codelist(id="CL_AREA", name=localized("Area"))
+            for code in self.areas:
+                areas.append(common.Code(id=code, name=localized(code)))
+            msg.codelist["CL_AREA"] = areas
+        else:
+            msg.codelist["CL_SEX"] = self.sex
+        return msg
+
+    def dataflow(self, resource_id=None, **kwargs):
+        msg = StructureMessage()
+        if resource_id is None:
+            msg.dataflow.update(self.dataflows)
+            return msg
+
+        self.requests.append(resource_id)
+        if resource_id in self.failing:
+            raise requests.ConnectionError(f"{resource_id} is unavailable")
+
+        area = v21.Dimension(
+            id="REF_AREA", concept_identity=common.Concept(id="REF_AREA")
+        )
+        sex = v21.Dimension(
+            id="SEX",
+            concept_identity=common.Concept(id="SEX"),
+            local_representation=common.Representation(enumerated=self.sex),
+        )
+        member = {
+            area: v21.MemberSelection(
+                values_for=area,
+                values=[
+                    v21.MemberValue(value=a) for a in self.constraints[resource_id]
+                ],
+            ),
+            sex: v21.MemberSelection(
+                values_for=sex,
+                values=[v21.MemberValue(value=s) for s in ["SEX_T", "SEX_F"]],
+            ),
+        }
+        region = v21.CubeRegion(included=True, member=member)
+        msg.constraint["CC"] = v21.ContentConstraint(
+            id="CC", data_content_region=[region]
+        )
+        return msg
+
+
+@pytest.fixture
+def client(monkeypatch):
+    client = FakeClient()
+    monkeypatch.setitem(ilostat._client._clients, False, client)
+    # Fail right away instead of retrying with a backoff
+    monkeypatch.setattr(ilostat._area_dataflow, "MAX_RETRIES", 1)
+    return client
+
+
+def stored_dataflows() -> dict[str, tuple[str, list[str]]]:
+    """Return the version and the areas of each dataflow in the database."""
+    con = sqlite3.connect(DB_PATH)
+    versions = dict(con.execute("SELECT code, version FROM dataflow"))
+    areas = {code: [] for code in versions}
+    for code, area in con.execute(
+        """SELECT dataflow.code, cl_area.code FROM cl_area_dataflow
+           JOIN dataflow USING (dataflow_uid) JOIN cl_area USING (cl_area_uid)
+           ORDER BY cl_area.code"""
+    ):
+        areas[code].append(area)
+    con.close()
+    return {code: (versions[code], areas[code]) for code in versions}
+
+
+def test_refresh_adds_removes_and_fails_dataflows(client):
+    client.add_dataflow("DF_KEPT", ["ITA"])
+    client.add_dataflow("DF_CHANGED", ["ITA"])
+    client.add_dataflow("DF_REMOVED", ["FRA"])
+    client.add_dataflow("DF_FAILING", ["FRA"])
+
+    assert build_metadata()
+    assert stored_dataflows() == {
+        "DF_KEPT": ("1.0", ["ITA"]),
+        "DF_CHANGED": ("1.0", ["ITA"]),
+        "DF_REMOVED": ("1.0", ["FRA"]),
+        "DF_FAILING": ("1.0", ["FRA"]),
+    }
+
+    client.add_dataflow("DF_CHANGED", ["FRA", "ITA"], version="2.0")
+    client.add_dataflow("DF_FAILING", ["ITA"], version="2.0")
+    client.add_dataflow("DF_ADDED", ["FRA"])
+    del client.dataflows["DF_REMOVED"]
+    client.failing.add("DF_FAILING")
+    client.requests.clear()
+
+    assert refresh_metadata()
+
+    # Only the new and changed dataflows are downloaded again. The one that
+    # failed keeps no version, so that the next refresh tries it again.
+    assert sorted(client.requests) == ["DF_ADDED", "DF_CHANGED", "DF_FAILING"]
+    assert stored_dataflows() == {
+        "DF_KEPT": ("1.0", ["ITA"]),
+        "DF_CHANGED": ("2.0", ["FRA", "ITA"]),
+        "DF_FAILING": (None, ["FRA"]),
+        "DF_ADDED": ("1.0", ["FRA"]),
+    }
+
+    client.failing.clear()
+    client.requests.clear()
+
+    assert refresh_metadata()
+
+    assert client.requests == ["DF_FAILING"]
+    assert stored_dataflows()["DF_FAILING"] == ("2.0", ["ITA"])
@@ -0,0 +1,85 @@
+import os
+import pandas as pd
+import sdmx
+from sdmx.model import v21
+from ilostat._result import ILOStatQueryResult
+from ilostat._stream import iter_observations
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), "data")
+
+# The same observations of DF_TEST, as SDMX-ML and as SDMX-CSV
+MESSAGE = os.path.join(DATA_DIR, "DF_TEST.xml")
+CSV = os.path.join(DATA_DIR, "DF_TEST.csv")
+
+DIMENSIONS = ["REF_AREA", "FREQ", "SEX", "TIME_PERIOD"]
+
+CODELIST = {
+    "REF_AREA": {"name": "Reference area", "codes": {"ITA": "Italy"}},
+    "FREQ": None,
+    "SEX": {"name": "Sex", "codes": {"SEX_T": "Total", "SEX_F": "Female"}},
+    "TIME_PERIOD": None,
+}
+
+
+def make_dsd() -> v21.DataStructureDefinition:
+    dsd = v21.DataStructureDefinition(
+        id="DSD_TEST", version="1.0", maintainer=v21.Agency(id="ILO")
+    )
+    for order, dimension in enumerate(DIMENSIONS[:-1]):
+        dsd.dimensions.append(v21.Dimension(id=dimension, order=order))
+    dsd.dimensions.append(v21.TimeDimension(id="TIME_PERIOD", order=3))
+    dsd.measures.getdefault("OBS_VALUE")
+    for attribute in ["UNIT_MULT", "DECIMALS", "OBS_STATUS"]:
+        dsd.attributes.getdefault(
+            attribute, related_to=v21.PrimaryMeasureRelationship()
+        )
+    return dsd
+
+
+def test_iter_observations():
+    # Feed the message a few bytes at a time, as it would be downloaded
+    with open(MESSAGE, "rb") as f:
+        chunks = iter(lambda: f.read(64), b"")
+        observations = list(iter_observations(chunks))
+
+    assert len(observations) == 6
+    assert observations[0] == {
+        "REF_AREA": "ITA",
+        "FREQ": "A",
+        "SEX": "SEX_T",
+        "TIME_PERIOD": "2021",
+        "OBS_VALUE": "23456.78",
+        "UNIT_MULT": "3",
+        "DECIMALS": "1",
+    }
+    assert observations[1]["OBS_STATUS"] == "P"
+    # The attributes of a series don't leak into the next one
+    assert [(o["REF_AREA"], o["SEX"]) for o in observations[2::2]] == [
+        ("ITA", "SEX_F"),
+        ("FRA", "SEX_T"),
+    ]
+
+
+def test_csv_and_sdmx_ml_give_the_same_dataframe():
+    message = sdmx.read_sdmx(MESSAGE, structure=make_dsd())
+    from_ml = ILOStatQueryResult(message.data[0], CODELIST, "en")
+    from_csv = ILOStatQueryResult.from_csv(CSV, DIMENSIONS, CODELIST, "en")
+
+    pd.testing.assert_frame_equal(from_ml.dataframe, from_csv.dataframe)
+
+    assert list(from_csv.dataframe.columns) == [
+        "Reference area",
+        "Sex",
+        "TIME_PERIOD",
+        "value",
+    ]
+    assert list(from_csv.dataframe["value"]) == [
+        23456780.0,
+        23512300.0,
+        9.88,
+        10.0,
+        29876500.0,
+        30012450.0,
+    ]
+    # Codes without a label keep their code
+    assert list(from_csv.dataframe["Reference area"]) == ["Italy"] * 4 + ["FRA"] * 2